@@ -2,45 +2,368 @@ from mpi4py import MPI
 from PIL import Image
 import os
 import numpy as np
-from scipy import signal
+import sys
 import time
 import csv
+import argparse
+import glob
+import hashlib
+import json
+import queue
+import threading
+import traceback
 import matplotlib.pyplot as plt
 
-def apply_filter(image):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from polyphase_filter import BLUR_SHARP_PHASES, GAUSS_PHASES, fix_blur_sharp_border, upscale_filter
+
+INPUT_DIR = "datas/perroquets/"
+OUTPUT_DIR = "sorties/perroquets/"
+N_IMAGES = 37
+# Manifeste du cache incrémental du mode batch (dans le répertoire de sortie)
+MANIFEST_NAME = ".manifest.json"
+
+# Tags des messages entre le processus 0 (distributeur d'images) et les autres processus en mode pipeline
+TAG_REQUEST = 1
+TAG_FRAME = 2
+
+def image_filename(image_index):
+    return f"Perroquet{image_index:04d}.jpg"
+
+def default_frames(output_dir=OUTPUT_DIR):
+    """
+    Images de la vidéo d'origine : liste de tuples (nom_image, fichier_entrée, fichier_sortie dans output_dir)
+    """
+    return [(image_filename(i), os.path.join(INPUT_DIR, image_filename(i)), os.path.join(output_dir, image_filename(i)))
+            for i in range(1, N_IMAGES + 1)]
+
+def file_sha256(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class FrameCache:
+    """
+    Cache incrémental du mode batch : le manifeste (JSON, dans le répertoire de sortie) associe à chaque image
+    d'entrée la date de modification, la taille et l'empreinte SHA-256 du fichier qui a produit la sortie.
+    Une image est à jour si sa sortie existe et si l'entrée n'a pas changé depuis : sortie plus récente que l'entrée
+    avec même date et même taille que dans le manifeste, ou à défaut même contenu (un fichier recopié ou « touché »
+    n'est pas retraité).
+    """
+    def __init__(self, output_dir):
+        self.filename = os.path.join(output_dir, MANIFEST_NAME)
+        try:
+            with open(self.filename) as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def is_up_to_date(self, image_in, image_out):
+        entry = self.entries.get(os.path.abspath(image_in))
+        if entry is None or not os.path.exists(image_out):
+            return False
+        stat = os.stat(image_in)
+        if os.stat(image_out).st_mtime >= stat.st_mtime and (stat.st_mtime, stat.st_size) == (entry["mtime"], entry["size"]):
+            return True
+        # Date différente : on compare le contenu
+        if stat.st_size != entry["size"] or file_sha256(image_in) != entry["sha256"]:
+            return False
+        entry["mtime"] = stat.st_mtime
+        return True
+
+    def update(self, image_in):
+        stat = os.stat(image_in)
+        self.entries[os.path.abspath(image_in)] = {"mtime": stat.st_mtime, "size": stat.st_size,
+                                                   "sha256": file_sha256(image_in)}
+
+    def save(self):
+        tmp = self.filename + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp, self.filename)
+
+def batch_frames(input_glob, output_dir, force):
+    """
+    Images du mode batch : fichiers correspondant à input_glob (triés), sortie de même nom dans output_dir.
+    Renvoie (images à traiter, nombre d'images à jour ignorées, cache)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache = FrameCache(output_dir)
+    frames, skipped = [], 0
+    for image_in in sorted(glob.glob(input_glob)):
+        image_name = os.path.basename(image_in)
+        image_out = os.path.join(output_dir, image_name)
+        if not force and cache.is_up_to_date(image_in, image_out):
+            skipped += 1
+        else:
+            frames.append((image_name, image_in, image_out))
+    return frames, skipped, cache
+
+# Mêmes noyaux en entiers pour le calcul en arithmétique entière : poids du flou sur 4 par direction (16 en 2D),
+# flou + netteté multipliés par 16 (la somme des coefficients vaut 16)
+GAUSS_PHASES_INT = [np.rint(4 * kernel).astype(np.int64) for kernel in GAUSS_PHASES]
+BLUR_SHARP_PHASES_INT = [[np.rint(16 * kernel).astype(np.int64) for kernel in phases] for phases in BLUR_SHARP_PHASES]
+
+def load_image(image):
+    """
+    Décodage de l'image et passage en HSV.
+    Renvoie un tableau uint8 (3, lignes, colonnes), un plan contigu par composante H, S, V
+    """
     img = Image.open(image)
     print(f"Taille originale {img.size}")
 
     img = img.convert('HSV')
-    img = np.repeat(np.repeat(np.array(img), 2, axis=0), 2, axis=1)
-    img = np.array(img, dtype=np.double) / 255.
-    print(f"Nouvelle taille : {img.shape}")
-
-    mask_gauss = np.array([[1., 2., 1.],
-                           [2., 4., 2.],
-                           [1., 2., 1.]]) / 16.
-    blur_image = np.zeros_like(img, dtype=np.double)
-    for i in range(3):
-        blur_image[:, :, i] = signal.convolve2d(img[:, :, i],
-                                                mask_gauss,
-                                                mode='same')
-
-    mask_sharp = np.array([[ 0., -1.,  0.],
-                           [-1.,  5., -1.],
-                           [ 0., -1.,  0.]])
-    sharpen_image = np.zeros_like(blur_image)
-    sharpen_image[:, :, 0:2] = blur_image[:, :, 0:2]
-    sharpen_image[:, :, 2] = signal.convolve2d(blur_image[:, :, 2],
-                                               mask_sharp,
-                                               mode='same')
-    sharpen_image = np.clip(sharpen_image, 0., 1.)
-
-    sharpen_image *= 255.
-    sharpen_image = sharpen_image.astype(np.uint8)
-    
+    return np.ascontiguousarray(np.array(img).transpose(2, 0, 1))
+
+def weighted_sum(windows, weights, out, scratch):
+    """
+    out = somme des tableaux windows pondérés par les entiers weights (les poids nuls sont ignorés), calculée dans le
+    type entier de out sans autre tableau temporaire que scratch
+    """
+    first = True
+    for window, weight in zip(windows, weights):
+        if weight == 0:
+            continue
+        if first:
+            np.multiply(window, out.dtype.type(weight), out=out)
+            first = False
+        elif weight == 1:
+            out += window
+        elif weight == -1:
+            out -= window
+        else:
+            np.multiply(window, out.dtype.type(weight), out=scratch)
+            out += scratch
+
+def upscale_filter_int(img):
+    """
+    Même calcul que upscale_filter en arithmétique entière, sans passer par les flottants :
+        - flou de H et S : les poids des noyaux polyphasés (1 et 3 par direction) font 16 au total, on accumule
+          en uint16 (au plus 16*255) et on divise par 16 par un décalage de 4 bits ;
+        - flou + netteté sur V : noyaux 3x3 multipliés par 16, accumulés en int16 (au plus 25*255 en valeur
+          absolue), saturés entre 0 et 16*255 puis décalés de 4 bits.
+    Le cadre d'un pixel de V est corrigé comme dans upscale_filter. L'écart avec upscale_filter est d'au plus 1/255.
+    """
+    height, width = img.shape[1:]
+    sharpen_image = np.empty((2 * height, 2 * width, 3), dtype=np.uint8)
+    padded = np.zeros((height + 2, width + 2), dtype=np.uint16)
+    rows = np.empty((height, width + 2), dtype=np.uint16)
+    rows_scratch = np.empty_like(rows)
+    acc = np.empty((height, width), dtype=np.uint16)
+    scratch = np.empty_like(acc)
+    for i in range(2):
+        padded[1:-1, 1:-1] = img[i]
+        for a in range(2):
+            weighted_sum([padded[k:k + height] for k in range(3)], GAUSS_PHASES_INT[a], rows, rows_scratch)
+            for b in range(2):
+                weighted_sum([rows[:, l:l + width] for l in range(3)], GAUSS_PHASES_INT[b], acc, scratch)
+                acc >>= 4
+                sharpen_image[a::2, b::2, i] = acc
+    # Mêmes tampons vus en int16 (les valeurs de l'image tiennent dans les deux types)
+    padded, acc, scratch = padded.view(np.int16), acc.view(np.int16), scratch.view(np.int16)
+    padded[1:-1, 1:-1] = img[2]
+    windows = [padded[k:k + height, l:l + width] for k in range(3) for l in range(3)]
+    for a in range(2):
+        for b in range(2):
+            weighted_sum(windows, BLUR_SHARP_PHASES_INT[a][b].ravel(), acc, scratch)
+            np.clip(acc, 0, 16 * 255, out=acc)
+            acc >>= 4
+            sharpen_image[a::2, b::2, 2] = acc
+    fix_blur_sharp_border(img[2], sharpen_image[:, :, 2], scale=1. / 255.)
+    return sharpen_image
+
+def filter_image(img, integer=False):
+    """
+    Agrandissement et filtrage (voir upscale_filter, ou upscale_filter_int si integer) puis retour en RGB
+    """
+    sharpen_image = upscale_filter_int(img) if integer else upscale_filter(img)
+    print(f"Nouvelle taille : {sharpen_image.shape}")
     return Image.fromarray(sharpen_image, 'HSV').convert('RGB')
 
+def apply_filter(image, integer=False):
+    return filter_image(load_image(image), integer)
+
+def benchmark(frames, repeat=3):
+    """
+    Compare upscale_filter et upscale_filter_int sur les images de frames (meilleur temps sur repeat essais, sans le
+    décodage) et écrit les résultats dans benchmark_int.csv
+    """
+    results = []
+    for image_name, image_in, _ in frames:
+        img = load_image(image_in)
+        times = []
+        for upscale in (upscale_filter, upscale_filter_int):
+            best = float('inf')
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                output = upscale(img)
+                best = min(best, time.perf_counter() - start_time)
+            times.append((best, output))
+        max_diff = int(np.abs(times[0][1].astype(np.int16) - times[1][1]).max())
+        results.append((image_name, times[0][0], times[1][0], max_diff))
+        print(f"{image_name} : float {times[0][0]*1e3:.1f} ms, entier {times[1][0]*1e3:.1f} ms, écart max {max_diff}")
+
+    with open('benchmark_int.csv', 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['Image', 'FloatTime', 'IntTime', 'MaxDiff'])
+        writer.writerows(results)
+    float_total = sum(r[1] for r in results)
+    int_total = sum(r[2] for r in results)
+    print(f"Total : float {float_total:.3f} s, entier {int_total:.3f} s (accélération {float_total / int_total:.2f})")
+
+class FrameDispatcher:
+    """
+    Distribution dynamique des images par le processus 0 : chaque processus demande l'indice de l'image suivante
+    dès qu'il a de la place dans son pipeline, ce qui équilibre la charge quand les images n'ont pas le même coût.
+    Le processus 0 sert les demandes des autres processus dans un thread (serve) et prend lui-même ses images
+    directement dans le compteur partagé (next_index).
+    """
+    def __init__(self, n_images):
+        self.n_images = n_images
+        self.next_image = 1
+        self.lock = threading.Lock()
+
+    def next_index(self):
+        with self.lock:
+            if self.next_image > self.n_images:
+                return None
+            image_index = self.next_image
+            self.next_image += 1
+            return image_index
+
+    def close(self):
+        # Le processus 0 ne passe pas par des messages pour ses propres images
+        pass
+
+    def serve(self, comm):
+        """
+        Répond aux demandes jusqu'à ce que chaque autre processus ait reçu un indice None (plus d'image), soit parce
+        que les images sont épuisées, soit parce qu'il a envoyé une demande d'arrêt (FrameRequester.close)
+        """
+        remaining = comm.Get_size() - 1
+        status = MPI.Status()
+        while remaining > 0:
+            stop = comm.recv(source=MPI.ANY_SOURCE, tag=TAG_REQUEST, status=status)
+            image_index = None if stop else self.next_index()
+            comm.send(image_index, dest=status.Get_source(), tag=TAG_FRAME)
+            if image_index is None:
+                remaining -= 1
+
+class FrameRequester:
+    """
+    Côté des processus autres que 0 : demande au processus 0 l'indice de la prochaine image à traiter (None quand il
+    n'y en a plus). close() prévient le processus 0 qu'un processus qui s'arrête avant d'avoir reçu None ne
+    demandera plus d'image, sans quoi serve l'attendrait indéfiniment.
+    """
+    def __init__(self, comm):
+        self.comm = comm
+        self.finished = False
+
+    def request(self, stop):
+        self.comm.send(stop, dest=0, tag=TAG_REQUEST)
+        image_index = self.comm.recv(source=0, tag=TAG_FRAME)
+        if image_index is None:
+            self.finished = True
+        return image_index
+
+    def next_index(self):
+        return self.request(False)
+
+    def close(self):
+        if not self.finished:
+            self.request(True)
+
+def run_pipeline(frames, source, rank, queue_size, integer=False):
+    """
+    Traitement en pipeline sur un processus : un thread lit et décode les images suivantes pendant que le thread
+    principal filtre l'image courante et qu'un autre thread encode et sauvegarde les résultats. Les files bornées
+    entre les étapes limitent la mémoire utilisée (au plus queue_size images en attente par étape).
+    source (FrameDispatcher ou FrameRequester) donne l'indice (à partir de 1) de la prochaine image de frames à
+    traiter ; source.close() est toujours appelé par le thread de lecture quand il s'arrête, même sur une erreur.
+    Si le filtrage échoue, la lecture est arrêtée et la file des images décodées vidée avant d'attendre les threads.
+    Renvoie la liste des tuples (index_image, nom_image, temps_traitement).
+    """
+    decoded = queue.Queue(maxsize=queue_size)
+    filtered = queue.Queue(maxsize=queue_size)
+    cancelled = threading.Event()
+    errors = []
+
+    def reader():
+        try:
+            while not cancelled.is_set() and (image_index := source.next_index()) is not None:
+                start_time = time.time()
+                img = load_image(frames[image_index - 1][1])
+                decoded.put((image_index, img, time.time() - start_time))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            try:
+                source.close()
+            finally:
+                decoded.put(None)
+
+    def writer():
+        while (item := filtered.get()) is not None:
+            image_index, sharpen_image = item
+            try:
+                sharpen_image.save(frames[image_index - 1][2])
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=reader), threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+
+    processing_times_local = []
+    reader_done = False
+    try:
+        while (item := decoded.get()) is not None:
+            image_index, img, t_load = item
+            start_time = time.time()
+            sharpen_image = filter_image(img, integer)
+            t_image = t_load + time.time() - start_time
+            filtered.put((image_index, sharpen_image))
+            processing_times_local.append((image_index, frames[image_index - 1][0], t_image))
+            print(f"[Rank {rank}] Image {image_index} traitée en {t_image:.2f} sec.")
+        reader_done = True
+    finally:
+        if not reader_done:
+            # Erreur du filtrage : le thread de lecture peut être bloqué sur la file pleine, on l'arrête et on vide
+            # la file jusqu'à sa marque de fin
+            cancelled.set()
+            while decoded.get() is not None:
+                pass
+        filtered.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return processing_times_local
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Doublement de la taille et filtrage des images d'une vidéo avec MPI")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="lecture, filtrage et écriture en parallèle (threads) et distribution dynamique des images")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="nombre maximal d'images en attente entre deux étapes du pipeline")
+    parser.add_argument("--input-glob",
+                        help="mode batch : motif des images à traiter (par exemple 'datas/*.jpg') au lieu de la vidéo "
+                             "des perroquets ; les images dont la sortie est à jour ne sont pas retraitées")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR,
+                        help="répertoire de sortie (même nom de fichier que l'entrée), en mode batch comme pour la "
+                             "vidéo des perroquets")
+    parser.add_argument("--int", dest="integer", action="store_true",
+                        help="filtrage en arithmétique entière (uint16/int16) au lieu de float32")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="compare les temps de filtrage en float32 et en entiers sur les images (processus 0)")
+    parser.add_argument("--force", action="store_true",
+                        help="mode batch : retraite toutes les images sans tenir compte du cache")
+    return parser.parse_args()
+
 def main():
+    args = parse_arguments()
     comm = MPI.COMM_WORLD
     rank = comm.Get_rank()
     size = comm.Get_size()
@@ -49,24 +372,62 @@ def main():
     comm.Barrier()
     global_start = time.time()
 
-    n_images = 37
+    if args.input_glob is None:
+        frames, skipped, cache = default_frames(args.output_dir), 0, None
+        # Tous les processus écrivent des images, chacun s'assure que le répertoire existe
+        os.makedirs(args.output_dir, exist_ok=True)
+    elif rank == 0:
+        frames, skipped, cache = batch_frames(args.input_glob, args.output_dir, args.force)
+        print(f"{len(frames)} images à traiter, {skipped} images déjà à jour")
+    else:
+        frames, skipped, cache = None, 0, None
+    if args.input_glob is not None:
+        frames = comm.bcast(frames, root=0)
+    n_images = len(frames)
+
+    if args.benchmark:
+        if rank == 0:
+            benchmark(frames)
+        return
     # Liste locale pour stocker les tuples (index_image, nom_image, temps_traitement)
     processing_times_local = []
 
-    for i in range(rank, n_images, size):
-        image_index = i + 1
-        image_in = os.path.join("datas/perroquets/", f"Perroquet{image_index:04d}.jpg")
-        
-        start_time = time.time()
-        sharpen_image = apply_filter(image_in)
-        end_time = time.time()
-        t_image = end_time - start_time
-        
-        processing_times_local.append((image_index, f"Perroquet{image_index:04d}.jpg", t_image))
-        
-        image_out = os.path.join("sorties/perroquets/", f"Perroquet{image_index:04d}.jpg")
-        sharpen_image.save(image_out)
-        print(f"[Rank {rank}] Image {image_index} traitée et sauvegardée en {t_image:.2f} sec.")
+    if args.pipeline:
+        if size > 1 and MPI.Query_thread() < MPI.THREAD_MULTIPLE:
+            # Les threads de distribution et de lecture échangent des messages pendant que le thread principal filtre
+            raise RuntimeError("Le mode pipeline demande une bibliothèque MPI initialisée avec MPI_THREAD_MULTIPLE")
+        if size == 1:
+            source = FrameDispatcher(n_images)
+        elif rank == 0:
+            source = FrameDispatcher(n_images)
+            server = threading.Thread(target=source.serve, args=(comm,))
+            server.start()
+        else:
+            source = FrameRequester(comm)
+        try:
+            processing_times_local = run_pipeline(frames, source, rank, args.queue_size, args.integer)
+        except Exception:
+            if size == 1:
+                raise
+            # Les autres processus attendraient celui-ci indéfiniment (distribution des images, barrière finale)
+            traceback.print_exc()
+            comm.Abort(1)
+        if rank == 0 and size > 1:
+            server.join()
+    else:
+        for i in range(rank, n_images, size):
+            image_index = i + 1
+            image_name, image_in, image_out = frames[i]
+
+            start_time = time.time()
+            sharpen_image = apply_filter(image_in, args.integer)
+            end_time = time.time()
+            t_image = end_time - start_time
+
+            processing_times_local.append((image_index, image_name, t_image))
+
+            sharpen_image.save(image_out)
+            print(f"[Rank {rank}] Image {image_index} traitée et sauvegardée en {t_image:.2f} sec.")
 
     comm.Barrier()
     global_end = time.time()
@@ -78,6 +439,10 @@ def main():
     if rank == 0:
         flat_processing_times = [item for sublist in all_processing_times for item in sublist]
         flat_processing_times.sort(key=lambda x: x[0])
+        if cache is not None:
+            for image_name, image_in, image_out in frames:
+                cache.update(image_in)
+            cache.save()
         
         with open('mpi_original_time.csv', 'w', newline='') as csvfile:
             writer = csv.writer(csvfile)
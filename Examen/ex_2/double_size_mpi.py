@@ -1,98 +1,203 @@
 from PIL import Image
 import numpy as np
-from scipy import signal
 from mpi4py import MPI
 import csv
+import os
+import sys
 import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from polyphase_filter import upscale_filter
 
 comm = MPI.COMM_WORLD
 rank = comm.Get_rank()
 size = comm.Get_size()
 
-def upsize_chunk(image_data, start_row, end_row):
-    img_chunk = image_data[start_row:end_row, :, :]
-    img_chunk = np.repeat(np.repeat(img_chunk, 2, axis=0), 2, axis=1) / 255.0
-    return img_chunk
-
-def apply_blur_filter(image_chunk):
-    blur_image = np.zeros_like(image_chunk, dtype=np.float64)
-    blur_mask = np.array([[1., 2., 1.],
-                          [2., 4., 2.],
-                          [1., 2., 1.]]) / 16.
-    for i in range(3):
-        blur_image[:, :, i] = signal.convolve2d(
-            image_chunk[:, :, i], blur_mask, mode='same'
-        )
-    return blur_image
-
-def apply_sharpen_filter(blur_chunk):
-    sharpen_mask = np.array([
-        [ 0., -1.,  0.],
-        [-1.,  5., -1.],
-        [ 0., -1.,  0.]
-    ])
-
-    sharpen_image = np.zeros_like(blur_chunk, dtype=np.float64)
-    sharpen_image[:, :, :2] = blur_chunk[:, :, :2]
-    sharpen_image[:, :, 2] = np.clip(
-        signal.convolve2d(blur_chunk[:, :, 2], sharpen_mask, mode='same'),
-        0.0, 1.0
-    )
-    return sharpen_image
+def planar_chunk(image_data, start_row, end_row):
+    """
+    Lignes start_row..end_row de l'image HSV (uint8), avec un plan contigu par composante comme l'attend
+    upscale_filter
+    """
+    return np.ascontiguousarray(image_data[start_row:end_row, :, :].transpose(2, 0, 1))
+
+def npy_header(f):
+    """
+    Lit l'en-tête d'un fichier .npy de uint8 ouvert en binaire : renvoie (forme, position du début des données)
+    """
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    if dtype != np.uint8 or fortran_order or len(shape) != 3 or shape[2] != 3:
+        raise ValueError("Tableau uint8 (lignes, colonnes, 3) en ordre C attendu")
+    return shape, f.tell()
+
+class StripReader:
+    """
+    Lecture de l'image source par bandes de lignes, dans un fichier .npy (tableau uint8 (lignes, colonnes, 3) en
+    RGB) : seules les lignes demandées sont lues dans le fichier. Les formats compressés (JPEG, ...) ne sont pas
+    acceptés, leur décodeur charge l'image entière sur chaque processus.
+    """
+    def __init__(self, filename):
+        if not filename.endswith(".npy"):
+            raise ValueError(f"Le mode tuilé lit un fichier .npy, pas {filename}")
+        self.file = open(filename, 'rb')
+        shape, self.offset = npy_header(self.file)
+        self.height, self.width = shape[:2]
+
+    def read(self, start_row, end_row):
+        """
+        Lignes start_row..end_row en HSV (uint8)
+        """
+        row_size = 3 * self.width
+        self.file.seek(self.offset + start_row * row_size)
+        strip = np.fromfile(self.file, dtype=np.uint8, count=(end_row - start_row) * row_size)
+        strip = Image.fromarray(strip.reshape(end_row - start_row, self.width, 3), 'RGB')
+        return np.array(strip.convert('HSV'), dtype=np.uint8)
+
+    def close(self):
+        self.file.close()
+
+def tiled_double_size(input_path, output_path, tile_rows):
+    """
+    Mode tuilé : l'image est traitée par bandes de tile_rows lignes (plus une ligne fantôme de chaque côté, comme
+    entre les processus dans main), réparties entre les processus de façon cyclique. Chaque bande agrandie est
+    convertie en RGB et écrite directement à sa place dans le fichier .npy de sortie (créé par
+    np.lib.format.open_memmap sur le processus 0). Les lectures et écritures passent par des accès explicites au
+    fichier plutôt que par une projection en mémoire, dont les pages seraient comptées dans la mémoire résidente :
+    la mémoire utilisée par processus dépend de la largeur de l'image et de tile_rows, pas de sa hauteur.
+    Le résultat est identique à celui de main.
+    """
+    reader = StripReader(input_path)
+    height, width = reader.height, reader.width
+    if rank == 0:
+        output = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.uint8, shape=(2 * height, 2 * width, 3))
+        del output
+    comm.Barrier()
+    output = open(output_path, 'r+b')
+    _, offset = npy_header(output)
+    out_row_size = 2 * width * 3
+
+    n_tiles = (height + tile_rows - 1) // tile_rows
+    for tile in range(rank, n_tiles, size):
+        start_row = tile * tile_rows
+        end_row = min(start_row + tile_rows, height)
+        top = 1 if start_row > 0 else 0
+        bottom = 1 if end_row < height else 0
+        strip = reader.read(start_row - top, end_row + bottom)
+        sharpen_strip = upscale_filter(planar_chunk(strip, 0, strip.shape[0]))
+        sharpen_strip = sharpen_strip[2 * top:2 * (top + end_row - start_row)]
+        output.seek(offset + 2 * start_row * out_row_size)
+        output.write(Image.fromarray(sharpen_strip, 'HSV').convert('RGB').tobytes())
+    output.close()
+    reader.close()
+    comm.Barrier()
+    return height, width
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Doublement de la taille et filtrage d'une image avec MPI")
+    parser.add_argument("--input", default=None,
+                        help="image source (par défaut datas/paysage.jpg ; en mode tuilé, .npy uint8 (lignes, "
+                             "colonnes, 3) en RGB, par défaut datas/paysage.npy)")
+    parser.add_argument("--output", default=None,
+                        help="image de sortie (par défaut sorties/paysage_double.jpg, ou .npy en mode tuilé)")
+    parser.add_argument("--tile-rows", type=int, default=None,
+                        help="mode tuilé : traitement par bandes de ce nombre de lignes, sortie .npy")
+    args = parser.parse_args()
+    if args.tile_rows is not None:
+        if args.tile_rows < 1:
+            parser.error("--tile-rows doit être au moins 1")
+        args.input = args.input or "datas/paysage.npy"
+        if not args.input.endswith(".npy"):
+            parser.error("le mode tuilé ne lit qu'une source .npy, "
+                         "à créer par np.save(..., np.array(Image.open(...).convert('RGB')))")
+    else:
+        args.input = args.input or "datas/paysage.jpg"
+    return args
+
+def main_tiled(args):
+    comm.Barrier()
+    start_time = MPI.Wtime()
+
+    output_path = args.output or "sorties/paysage_double.npy"
+    if not output_path.endswith(".npy"):
+        raise ValueError("Le mode tuilé écrit un fichier .npy")
+    height, width = tiled_double_size(args.input, output_path, args.tile_rows)
+
+    if rank == 0:
+        print(f"Taille originale (width x height): {(width, height)}")
+        print(f"Nouvelle taille (width x height): {(2 * width, 2 * height)}")
+        print(f"Image sauvegardée dans {output_path}")
 
-def main():
+        elapsed_time = MPI.Wtime() - start_time
+        with open("performance_metrics.csv", "w", newline="") as csvfile:
+            csvwriter = csv.writer(csvfile)
+            csvwriter.writerow(["ElapsedTime (s)", "Number of Processors"])
+            csvwriter.writerow([elapsed_time, size])
+        print(f"Performance metrics written: {elapsed_time:.4f} seconds with {size} processes.")
+
+def main(args):
     comm.Barrier()
     start_time = MPI.Wtime()
 
-    path = "datas/"
-    image_path = path + "paysage.jpg"
+    image_path = args.input
 
     if rank == 0:
         img = Image.open(image_path)
         print(f"Taille originale (width x height): {img.size}")
         img = img.convert('HSV')
-        img_array = np.array(img, dtype=np.double)
+        img_array = np.array(img, dtype=np.uint8)
         img_shape = img_array.shape
     else:
         img_array = None
         img_shape = None
 
     img_shape = comm.bcast(img_shape, root=0)
-
-    if rank != 0:
-        img_array = np.empty(img_shape, dtype=np.double)
-
-    comm.Bcast(img_array, root=0)
-
-    rows_per_proc = img_shape[0] // size
-    start_row = rank * rows_per_proc
-    end_row = (rank + 1) * rows_per_proc if rank < size - 1 else img_shape[0]
-
-    upscaled_chunk = upsize_chunk(img_array, start_row, end_row)
-    blur_chunk = apply_blur_filter(upscaled_chunk)
-    sharpen_chunk = apply_sharpen_filter(blur_chunk)
-    sharpen_chunk = (255.0 * sharpen_chunk).astype(np.uint8)
-    
-    local_shape = sharpen_chunk.shape
-    all_shapes = comm.gather(local_shape, root=0)
+    height, width, channels = img_shape
+    if height < size:
+        raise ValueError(f"L'image n'a que {height} lignes pour {size} processus")
+
+    # Découpage en tranches de lignes équilibrées (à une ligne près)
+    rows = [height // size + (1 if r < height % size else 0) for r in range(size)]
+    first_rows = np.cumsum([0] + rows[:-1])
+    row_size = width * channels
+    n_rows = rows[rank]
+
+    # Chaque processus ne reçoit que ses lignes, plus une ligne fantôme de chaque côté reçue de ses voisins : les
+    # noyaux polyphasés n'ont besoin que d'une ligne de l'image d'origine au-delà de la tranche, le résultat est donc
+    # identique à celui du filtrage de l'image entière (pas de raccord visible entre tranches)
+    local = np.empty((n_rows + 2, width, channels), dtype=np.uint8)
+    comm.Scatterv(
+        sendbuf=(img_array, [r * row_size for r in rows], [r * row_size for r in first_rows], MPI.UNSIGNED_CHAR),
+        recvbuf=local[1:-1],
+        root=0
+    )
+    up = rank - 1 if rank > 0 else MPI.PROC_NULL
+    down = rank + 1 if rank < size - 1 else MPI.PROC_NULL
+    comm.Sendrecv(sendbuf=local[-2], dest=down, recvbuf=local[0], source=up)
+    comm.Sendrecv(sendbuf=local[1], dest=up, recvbuf=local[-1], source=down)
+    # Au bord de l'image il n'y a pas de ligne fantôme (le filtre voit des zéros, comme sur l'image entière)
+    top = 1 if rank > 0 else 0
+    bottom = n_rows + 1 if rank < size - 1 else n_rows
+    extended = local[1 - top:bottom + 1]
+
+    sharpen_chunk = upscale_filter(planar_chunk(extended, 0, extended.shape[0]))
+    # On retire les deux lignes produites par chaque ligne fantôme
+    sharpen_chunk = sharpen_chunk[2 * top:2 * (top + n_rows)]
 
     if rank == 0:
-        total_height = sum(shape[0] for shape in all_shapes)
-        full_processed_shape = (total_height, all_shapes[0][1], all_shapes[0][2])
-        full_processed = np.empty(full_processed_shape, dtype=np.uint8)
-
-        recv_counts = [sh[0] * sh[1] * sh[2] for sh in all_shapes]
-        displacements = [0]
-        for i in range(1, len(recv_counts)):
-            displacements.append(displacements[i - 1] + recv_counts[i - 1])
+        full_processed = np.empty((2 * height, 2 * width, channels), dtype=np.uint8)
+        recv_counts = [4 * r * row_size for r in rows]
+        displacements = [4 * r * row_size for r in first_rows]
     else:
         full_processed = None
         recv_counts = None
         displacements = None
 
-    sendbuf = sharpen_chunk.ravel()
     comm.Gatherv(
-        sendbuf=sendbuf,
+        sendbuf=sharpen_chunk,
         recvbuf=(full_processed, recv_counts, displacements, MPI.UNSIGNED_CHAR),
         root=0
     )
@@ -100,7 +205,7 @@ def main():
     if rank == 0:
         final_image = Image.fromarray(full_processed, mode='HSV').convert('RGB')
         print(f"Nouvelle taille (width x height): {final_image.size}")
-        final_image.save("sorties/paysage_double.jpg")
+        final_image.save(args.output or "sorties/paysage_double.jpg")
         print("Image sauvegardée")
 
         end_time = MPI.Wtime()
@@ -113,4 +218,8 @@ def main():
         print(f"Performance metrics written: {elapsed_time:.4f} seconds with {size} processes.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_arguments()
+    if args.tile_rows is not None:
+        main_tiled(args)
+    else:
+        main(args)
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+Agrandissement d'un facteur 2 suivi du flou gaussien (H, S, V) et du filtre de netteté (V) par noyaux polyphasés,
+commun à ex_1/mpi_movie_filter.py et ex_2/double_size_mpi.py (qui ajoutent le répertoire Examen/ à sys.path).
+"""
+import numpy as np
+from scipy import signal, ndimage
+
+MASK_GAUSS = np.array([[1., 2., 1.],
+                       [2., 4., 2.],
+                       [1., 2., 1.]]) / 16.
+MASK_SHARP = np.array([[ 0., -1.,  0.],
+                       [-1.,  5., -1.],
+                       [ 0., -1.,  0.]])
+# Le flou gaussien est séparable : produit extérieur de [1, 2, 1]/4 par lui-même
+GAUSS_1D = np.array([1., 2., 1.]) / 4.
+# Flou puis netteté sur V en une seule convolution 5x5 (composition des deux masques)
+MASK_BLUR_SHARP = signal.convolve2d(MASK_SHARP, MASK_GAUSS)
+
+def phase_matrix(phase, size):
+    """
+    Agrandir l'image d'un facteur 2 au plus proche voisin puis la convoler par un masque de taille size revient, pour
+    les lignes paires (phase 0) ou impaires (phase 1) du résultat, à convoler l'image d'origine par un masque 3 points :
+    la ligne 2i+phase+k de l'image agrandie est la ligne (phase+k)//2 + i de l'image d'origine.
+    Renvoie la matrice (3, size) qui regroupe les coefficients du masque selon la ligne d'origine qu'ils touchent.
+    """
+    radius = size // 2
+    matrix = np.zeros((3, size))
+    for k in range(-radius, radius + 1):
+        matrix[(phase + k) // 2 + 1, k + radius] = 1.
+    return matrix
+
+# Noyaux polyphasés : [1, 3, 0]/4 et [0, 3, 1]/4 pour le flou (par direction), 3x3 pour flou + netteté sur V
+GAUSS_PHASES = [(phase_matrix(a, 3) @ GAUSS_1D).astype(np.float32) for a in range(2)]
+BLUR_SHARP_PHASES = [[(phase_matrix(a, 5) @ MASK_BLUR_SHARP @ phase_matrix(b, 5).T).astype(np.float32)
+                      for b in range(2)] for a in range(2)]
+
+def store_uint8(values, out):
+    """
+    Ecrit values (float32 entre 0 et 1 après écrêtage, modifié en place) dans out en uint8 (troncature comme astype)
+    """
+    np.clip(values, 0., 1., out=values)
+    values *= 255.
+    out[...] = values
+
+def fix_blur_sharp_border(v, sharp_v, scale=1.):
+    """
+    Dans le calcul d'origine, le filtre de netteté voit des zéros autour de l'image floutée, alors que le masque 5x5
+    composé utilise le flou (non nul) de la première ligne/colonne hors de l'image : les deux ne diffèrent que sur le
+    cadre d'un pixel de large de l'image agrandie. On y refait le calcul d'origine (agrandissement puis deux
+    convolutions successives) sur des bandes de 2 pixels de l'image d'origine v (multipliée par scale).
+    """
+    def two_steps(band):
+        band = np.repeat(np.repeat(band.astype(np.float32) * np.float32(scale), 2, axis=0), 2, axis=1)
+        blur = ndimage.correlate(band, MASK_GAUSS, mode='constant')
+        sharp = ndimage.correlate(blur, MASK_SHARP, mode='constant').astype(np.float32)
+        out = np.empty(sharp.shape, dtype=np.uint8)
+        store_uint8(sharp, out)
+        return out
+
+    if min(v.shape) < 2:
+        sharp_v[...] = two_steps(v)
+        return
+    sharp_v[0, :] = two_steps(v[:2, :])[0, :]
+    sharp_v[-1, :] = two_steps(v[-2:, :])[-1, :]
+    sharp_v[:, 0] = two_steps(v[:, :2])[:, 0]
+    sharp_v[:, -1] = two_steps(v[:, -2:])[:, -1]
+
+def upscale_filter(img):
+    """
+    Doublement de la taille de l'image puis flou gaussien sur H, S et V et filtre de netteté sur V, sans construire
+    l'image agrandie : chacune des quatre phases (ligne paire/impaire, colonne paire/impaire) du résultat est une
+    convolution de l'image d'origine par un petit noyau (séparable à 2 points par direction pour le flou, 3x3 pour
+    flou + netteté sur V), écrite directement dans l'image de sortie uint8.
+    img est un tableau uint8 (3, lignes, colonnes), un plan par composante H, S, V ; renvoie un tableau uint8
+    (2*lignes, 2*colonnes, 3). La mémoire utilisée est celle de la sortie plus l'image d'origine et deux plans en
+    float32. L'écart avec le calcul en float64 sur l'image agrandie (quatre convolutions 3x3 par signal.convolve2d)
+    est d'au plus 1/255.
+    """
+    img = img.astype(np.float32)
+    img *= np.float32(1. / 255.)
+    height, width = img.shape[1:]
+    sharpen_image = np.empty((2 * height, 2 * width, 3), dtype=np.uint8)
+    rows = np.empty((height, width), dtype=np.float32)
+    tmp = np.empty((height, width), dtype=np.float32)
+    for i in range(2):
+        for a in range(2):
+            ndimage.correlate1d(img[i], GAUSS_PHASES[a], axis=0, output=rows, mode='constant')
+            for b in range(2):
+                ndimage.correlate1d(rows, GAUSS_PHASES[b], axis=1, output=tmp, mode='constant')
+                store_uint8(tmp, sharpen_image[a::2, b::2, i])
+    for a in range(2):
+        for b in range(2):
+            ndimage.correlate(img[2], BLUR_SHARP_PHASES[a][b], output=tmp, mode='constant')
+            store_uint8(tmp, sharpen_image[a::2, b::2, 2])
+    fix_blur_sharp_border(img[2], sharpen_image[:, :, 2])
+    return sharpen_image
@@ -1,17 +1,23 @@
 #!/usr/bin/env python3
 import matplotlib.pyplot as plt
 import numpy as np
+import csv
+import sys
+
+def load_execution_times(filename):
+    """
+    Read a threads,execution_time CSV (as written by compute_pi_threads.py) into a {threads: seconds} dict
+    """
+    execution_times = {}
+    with open(filename, newline='') as csvfile:
+        for row in csv.DictReader(csvfile):
+            execution_times[int(row['threads'])] = float(row['execution_time'])
+    return execution_times
 
 def main():
-    # Measured execution times (in seconds) for 1e9 samples
-    execution_times = {
-        1: 17.413845397,   # 1 thread
-        2: 8.638714303,    # 2 threads
-        4: 4.735207655,    # 4 threads
-        8: 2.933302587,    # 8 threads
-        16: 3.063921873,   # 16 threads
-        32: 2.893393127,   # 32 threads
-    }
+    # Measured execution times (in seconds): by default the C++ OpenMP version for 1e9 samples
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'openmp_times.csv'
+    execution_times = load_execution_times(filename)
 
     threads = sorted(execution_times.keys())
     times = [execution_times[t] for t in threads]
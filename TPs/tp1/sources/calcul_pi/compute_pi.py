@@ -1,30 +1,251 @@
-from mpi4py import MPI
 import numpy as np
+import argparse
 import time
 
-comm = MPI.COMM_WORLD
-rank = comm.Get_rank()
-size = comm.Get_size()
+# Les tirages sont découpés en blocs de CHUNK_SIZE points, numérotés globalement. Le bloc c utilise son propre
+# générateur Philox (générateur à compteur) : même clé (dérivée de la graine) et compteur initial c dans le mot de
+# poids fort, si bien que les flux des blocs sont disjoints et qu'on peut démarrer directement à n'importe quel bloc.
+# Le résultat ne dépend donc que de la graine et du nombre total de points, pas du nombre de processus ni de la
+# répartition des blocs entre eux.
+CHUNK_SIZE = 1 << 20
+# Nombre de points tirés à la fois dans un bloc : les tampons (environ 25 octets par point, 70 avec --qmc) sont
+# alloués une fois pour toutes, la mémoire utilisée ne dépend donc pas du nombre de points. Par défaut ils
+# tiennent dans le cache L2.
+BLOCK_SIZE = 1 << 15
 
-nb_samples_total = 100_000_000
+def philox_key(seed):
+    """
+    Clé Philox (128 bits) dérivée de la graine
+    """
+    return np.random.SeedSequence(seed).generate_state(2, dtype=np.uint64)
 
-samples_per_process = nb_samples_total // size
-reste = nb_samples_total % size
-if rank < reste:
-    samples_per_process += 1
+def chunk_generator(key, chunk):
+    return np.random.Generator(np.random.Philox(key=key, counter=[0, 0, 0, chunk]))
 
-if rank == 0:
-    start_time = time.time()
+# Suite de Sobol en dimension 2 (quasi Monte Carlo) : nombres directeurs de SOBOL_BITS bits, d'où au plus
+# 2**SOBOL_BITS points
+SOBOL_BITS = 32
 
-x = 2.0 * np.random.random_sample(samples_per_process) - 1.0
-y = 2.0 * np.random.random_sample(samples_per_process) - 1.0
+def sobol_directions():
+    """
+    Nombres directeurs des deux premières dimensions de la suite de Sobol : puissances de 2 (van der Corput en
+    base 2) puis polynôme primitif x + 1 (m_1 = 1, m_k = m_{k-1} xor 2 m_{k-1})
+    """
+    directions = np.empty((2, SOBOL_BITS), dtype=np.uint64)
+    m = 1
+    for j in range(SOBOL_BITS):
+        directions[0, j] = 1 << (SOBOL_BITS - 1 - j)
+        directions[1, j] = m << (SOBOL_BITS - 1 - j)
+        m ^= m << 1
+    return directions
 
-local_count = np.sum(x*x + y*y < 1)
+class SobolSequence:
+    """
+    Suite de Sobol brouillée avec la même graine sur tous les processus (brouillage matriciel linéaire puis
+    décalage digital, comme scipy.stats.qmc.Sobol). Le point d'indice i est le xor des nombres directeurs des bits
+    du code de Gray de i : on démarre donc directement à n'importe quel indice, et les points suivants s'obtiennent
+    par un xor cumulé, x(i) = x(i-1) xor v[nombre de zéros terminaux de i].
+    Le bloc chunk est la tranche de CHUNK_SIZE points de la suite qui commence au point chunk*CHUNK_SIZE.
+    """
+    def __init__(self, key):
+        rng = np.random.default_rng(key)
+        directions = sobol_directions()
+        # Bits des nombres directeurs, du poids fort au poids faible : (dimension, nombre directeur, bit)
+        weights = np.arange(SOBOL_BITS - 1, -1, -1, dtype=np.uint64)
+        bits = (directions[:, :, None] >> weights) & np.uint64(1)
+        # Matrice triangulaire inférieure aléatoire de diagonale 1 : chaque bit est brouillé par les bits de poids
+        # plus fort, ce qui conserve les propriétés de réseau de la suite
+        ltm = np.tril(rng.integers(0, 2, size=(2, SOBOL_BITS, SOBOL_BITS)), -1) + np.eye(SOBOL_BITS, dtype=np.int64)
+        scrambled = np.einsum("drc,djc->djr", ltm, bits.astype(np.int64)) % 2
+        self.directions = (scrambled.astype(np.uint64) << weights).sum(axis=2, dtype=np.uint64)
+        self.shift = rng.integers(0, 1 << SOBOL_BITS, size=2, dtype=np.uint64)
 
-global_count = comm.reduce(local_count, op=MPI.SUM, root=0)
+    def point(self, index):
+        """Coordonnées entières (avant décalage) du point index"""
+        gray = index ^ (index >> 1)
+        x = [0, 0]
+        for j in range(SOBOL_BITS):
+            if gray >> j & 1:
+                x[0] ^= int(self.directions[0, j])
+                x[1] ^= int(self.directions[1, j])
+        return x
 
-if rank == 0:
-    approx_pi = 4.0 * global_count / nb_samples_total
-    end_time = time.time()
-    print(f"Temps pour calculer pi : {end_time - start_time} secondes")
-    print(f"Pi vaut environ {approx_pi}")
+    def fill(self, first, points, buffers):
+        """
+        Ecrit dans points (x et y entrelacés, len(points) // 2 points) les points first, first+1, ... de la suite,
+        dans les tampons préalloués de buffers
+        """
+        n = len(points) // 2
+        if first + n > 1 << SOBOL_BITS:
+            raise ValueError(f"La suite de Sobol est limitée à 2**{SOBOL_BITS} points")
+        # Nombre de zéros terminaux des indices first+1 .. first+n-1 : exposant de leur bit de poids faible
+        indices = np.add(buffers.offsets[:n - 1], np.uint64(first), out=buffers.indices[:n - 1])
+        low_bits = np.invert(indices, out=buffers.low_bits[:n - 1])
+        low_bits += np.uint64(1)
+        np.bitwise_and(low_bits, indices, out=low_bits)
+        _, trailing_zeros = np.frexp(low_bits, out=(buffers.mantissas[:n - 1], buffers.exponents[:n - 1]))
+        trailing_zeros -= 1
+        first_point = self.point(first)
+        for d in range(2):
+            values = buffers.values[:n]
+            values[0] = first_point[d]
+            np.take(self.directions[d], trailing_zeros, out=values[1:])
+            np.bitwise_xor.accumulate(values, out=values)
+            values ^= self.shift[d]
+            np.multiply(values, 2.0 ** -SOBOL_BITS, out=points[d::2])
+
+class SampleBuffers:
+    """
+    Tampons préalloués pour tirer block_size points à la fois (plus ceux de SobolSequence.fill avec qmc)
+    """
+    def __init__(self, block_size=BLOCK_SIZE, qmc=False):
+        self.block_size = block_size
+        self.points = np.empty(2 * block_size)
+        self.squared_norms = np.empty(block_size)
+        self.inside = np.empty(block_size, dtype=bool)
+        if qmc:
+            self.offsets = np.arange(1, block_size, dtype=np.uint64)
+            self.indices = np.empty(block_size - 1, dtype=np.uint64)
+            self.low_bits = np.empty(block_size - 1, dtype=np.uint64)
+            self.mantissas = np.empty(block_size - 1)
+            self.exponents = np.empty(block_size - 1, dtype=np.int32)
+            self.values = np.empty(block_size, dtype=np.uint64)
+
+def count_chunk(key, chunk, n_samples, buffers, sequence=None):
+    """
+    Nombre de points tombés dans le disque unité parmi les n_samples points du bloc chunk, tirés par paquets de
+    buffers.block_size points avec des opérations en place.
+    Les coordonnées x et y des points sont entrelacées dans le flux du bloc : les paquets successifs lisent la
+    suite du même flux, le résultat ne dépend donc pas de block_size.
+    Avec sequence (une SobolSequence), les points sont ceux de la suite quasi aléatoire.
+    """
+    if sequence is None:
+        generator = chunk_generator(key, chunk)
+    count = np.int64(0)
+    for start in range(0, n_samples, buffers.block_size):
+        n = min(buffers.block_size, n_samples - start)
+        points = buffers.points[:2 * n]
+        if sequence is None:
+            generator.random(out=points)
+        else:
+            sequence.fill(chunk * CHUNK_SIZE + start, points, buffers)
+        points *= 2.0
+        points -= 1.0
+        np.multiply(points, points, out=points)
+        squared_norms = np.add(points[0::2], points[1::2], out=buffers.squared_norms[:n])
+        inside = np.less(squared_norms, 1.0, out=buffers.inside[:n])
+        count += np.count_nonzero(inside)
+    return count
+
+def count_chunks(key, first_chunk, end_chunk, nb_samples_total, block_size=BLOCK_SIZE, qmc_method=None):
+    """
+    Nombre de points dans le disque (np.int64) pour les blocs first_chunk..end_chunk (exclu) ; le dernier bloc
+    est incomplet si nb_samples_total n'est pas un multiple de CHUNK_SIZE
+    """
+    sequence = SobolSequence(key) if qmc_method == "sobol" else None
+    buffers = SampleBuffers(block_size, qmc=sequence is not None)
+    count = np.int64(0)
+    for chunk in range(first_chunk, end_chunk):
+        count += count_chunk(key, chunk, min(CHUNK_SIZE, nb_samples_total - chunk * CHUNK_SIZE), buffers,
+                             sequence)
+    return count
+
+def chunk_range(rank, size, n_chunks):
+    """
+    Blocs contigus attribués au processus rank (répartition équilibrée à un bloc près)
+    """
+    chunks_per_process, reste = divmod(n_chunks, size)
+    first_chunk = rank * chunks_per_process + min(rank, reste)
+    return first_chunk, first_chunk + chunks_per_process + (1 if rank < reste else 0)
+
+def standard_error(count, n_samples):
+    """
+    Ecart type de l'estimation 4*count/n_samples de pi (loi binomiale de paramètre p = count/n_samples).
+    Pour les suites quasi aléatoires c'est une borne pessimiste : l'erreur y décroît plus vite qu'en 1/sqrt(n).
+    """
+    p = count / n_samples
+    return 4.0 * np.sqrt(p * (1.0 - p) / n_samples)
+
+def adaptive_count(comm, key, target_stderr, max_samples, round_chunks=1, block_size=BLOCK_SIZE, qmc_method=None):
+    """
+    Tirage par tours jusqu'à ce que l'écart type de l'estimation passe sous target_stderr (ou jusqu'à max_samples
+    points). A chaque tour, chaque processus traite round_chunks blocs ; les comptes du tour sont additionnés par
+    un Iallreduce non bloquant pendant que le tour suivant est calculé, et tous les processus prennent la même
+    décision d'arrêt à partir des totaux. Le tour calculé en avance est abandonné à l'arrêt.
+    Renvoie (nombre de points dans le disque, nombre de points, nombre de tours).
+    """
+    from mpi4py import MPI
+
+    rank, size = comm.Get_rank(), comm.Get_size()
+    totals = np.zeros(2, dtype=np.int64)
+    pending = None
+    n_rounds = 0
+    while True:
+        first_chunk = (n_rounds * size + rank) * round_chunks
+        end_chunk = first_chunk + round_chunks
+        local = np.array([count_chunks(key, first_chunk, end_chunk, end_chunk * CHUNK_SIZE, block_size, qmc_method),
+                          round_chunks * CHUNK_SIZE], dtype=np.int64)
+        if pending is not None:
+            request, _, received = pending
+            request.Wait()
+            totals += received
+            if standard_error(totals[0], totals[1]) <= target_stderr or totals[1] >= max_samples:
+                return int(totals[0]), int(totals[1]), n_rounds
+        received = np.empty(2, dtype=np.int64)
+        pending = (comm.Iallreduce(local, received, op=MPI.SUM), local, received)
+        n_rounds += 1
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Calcul de pi par la méthode de Monte Carlo avec MPI")
+    parser.add_argument("--samples", type=int, default=100_000_000,
+                        help="nombre total de points (nombre maximal de points avec --target-stderr)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="graine (par défaut tirée au hasard et affichée pour pouvoir reproduire le calcul)")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE,
+                        help="nombre de points tirés à la fois (taille des tampons, à ajuster au cache)")
+    parser.add_argument("--target-stderr", type=float, default=None,
+                        help="tirage par tours jusqu'à ce que l'écart type de l'estimation passe sous cette valeur")
+    parser.add_argument("--round-chunks", type=int, default=1,
+                        help=f"nombre de blocs de {CHUNK_SIZE} points par processus et par tour (avec --target-stderr)")
+    parser.add_argument("--qmc", choices=["sobol"], default=None,
+                        help="points tirés dans une suite quasi aléatoire brouillée au lieu de Philox "
+                             f"(au plus 2**{SOBOL_BITS} points)")
+    return parser.parse_args()
+
+# Les fonctions ci-dessus sont aussi utilisées par compute_pi_threads.py : mpi4py n'est importé (et MPI initialisé)
+# que lorsque le script est lancé
+if __name__ == "__main__":
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+
+    args = parse_arguments()
+    nb_samples_total = args.samples
+
+    seed = args.seed
+    if seed is None and rank == 0:
+        seed = np.random.SeedSequence().entropy
+    seed = comm.bcast(seed, root=0)
+    key = philox_key(seed)
+
+    if rank == 0:
+        start_time = time.time()
+
+    if args.target_stderr is not None:
+        global_count, nb_samples_total, n_rounds = adaptive_count(comm, key, args.target_stderr, args.samples,
+                                                                  args.round_chunks, args.block_size, args.qmc)
+    else:
+        n_chunks = (nb_samples_total + CHUNK_SIZE - 1) // CHUNK_SIZE
+        first_chunk, end_chunk = chunk_range(rank, size, n_chunks)
+        local_count = count_chunks(key, first_chunk, end_chunk, nb_samples_total, args.block_size, args.qmc)
+        global_count = comm.reduce(int(local_count), op=MPI.SUM, root=0)
+
+    if rank == 0:
+        approx_pi = 4.0 * global_count / nb_samples_total
+        end_time = time.time()
+        print(f"Temps pour calculer pi : {end_time - start_time} secondes")
+        if args.target_stderr is not None:
+            print(f"{nb_samples_total} points en {n_rounds} tours")
+        print(f"Pi vaut environ {approx_pi} ± {standard_error(global_count, nb_samples_total):.2e} (graine {seed})")
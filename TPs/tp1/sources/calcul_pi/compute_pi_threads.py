@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import argparse
+import csv
+import threading
+import time
+
+from compute_pi import BLOCK_SIZE, CHUNK_SIZE, SampleBuffers, count_chunk, philox_key
+
+# Même découpage et mêmes tirages que compute_pi.py, dont les fonctions sont importées : blocs de CHUNK_SIZE points,
+# le bloc c tiré avec le générateur Philox de clé dérivée de la graine et de compteur initial c. Les blocs sont
+# répartis entre les threads d'un pool : les tirages et les calculs numpy sur des tableaux libèrent le GIL, les
+# threads calculent donc réellement en parallèle (comme la version OpenMP approximate_pi.cpp) et le résultat ne
+# dépend pas du nombre de threads.
+
+# Tampons propres à chaque thread du pool
+_buffers = threading.local()
+
+def thread_buffers(block_size):
+    if getattr(_buffers, "buffers", None) is None or _buffers.buffers.block_size != block_size:
+        _buffers.buffers = SampleBuffers(block_size)
+    return _buffers.buffers
+
+def approximate_pi(nb_samples, n_threads, seed, block_size=BLOCK_SIZE):
+    key = philox_key(seed)
+    n_chunks = (nb_samples + CHUNK_SIZE - 1) // CHUNK_SIZE
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        counts = pool.map(lambda chunk: count_chunk(key, chunk, min(CHUNK_SIZE, nb_samples - chunk * CHUNK_SIZE),
+                                                    thread_buffers(block_size)),
+                          range(n_chunks))
+        return 4.0 * int(sum(counts)) / nb_samples
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Calcul de pi par la méthode de Monte Carlo avec un pool de threads")
+    parser.add_argument("--samples", type=int, default=100_000_000, help="nombre total de points")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32],
+                        help="nombres de threads à mesurer")
+    parser.add_argument("--seed", type=int, default=0, help="graine")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="nombre de points tirés à la fois")
+    parser.add_argument("--output", default="python_threads_times.csv",
+                        help="fichier CSV des temps (même format que openmp_times.csv, lu par approximate_pi_openmp.py)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    print(f"Nombre d'échantillons : {args.samples}")
+    rows = []
+    for n_threads in args.threads:
+        start_time = time.perf_counter()
+        pi = approximate_pi(args.samples, n_threads, args.seed, args.block_size)
+        elapsed = time.perf_counter() - start_time
+        rows.append((n_threads, elapsed))
+        print(f"{n_threads} threads : pi vaut environ {pi} en {elapsed:.3f} secondes")
+
+    with open(args.output, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["threads", "execution_time"])
+        writer.writerows(rows)
+    print(f"Temps écrits dans {args.output}")
@@ -0,0 +1,145 @@
+"""
+Jeu de la vie sur un lot de grilles (recherche dans des soupes aléatoires)
+#########################################################################
+Faire évoluer des milliers de petites grilles une par une avec Grille coûte surtout en surcoût Python (un appel
+numpy par opération et par grille). Ici, les B grilles sont stockées dans un seul tableau (B, lignes, colonnes) et
+une seule application de la règle (voir rules.py) fait avancer toutes les grilles d'une génération.
+
+Pour chaque grille on suit :
+    - la population (nombre de cellules vivantes) à chaque génération ;
+    - la détection de cycle : une empreinte de 64 bits par grille (combinaison linéaire aléatoire des octets de la
+      grille compactée) est gardée pour les max_period dernières générations ; quand l'empreinte courante d'une
+      grille est égale à une empreinte récente, on note son transitoire et sa période et la grille est retirée du
+      lot (elle n'est plus calculée).
+
+Exemple :
+    batch = GrilleBatch(1000, (32, 32))
+    batch.run(max_generations=5000)
+    print(batch.transient, batch.period)
+"""
+import numpy as np
+from rules import Rule, CONWAY
+
+
+class GrilleBatch:
+    """
+    Lot de n_boards grilles toriques de dimensions dim, initialisées au hasard comme dans Grille.
+        - rule est la règle d'évolution (chaîne B/S, voir rules.py)
+        - max_period est la plus grande période détectable
+        - seed permet de reproduire le tirage des soupes
+    Après run() (ou une suite d'appels à step()) :
+        - transient[b] et period[b] valent -1 tant que la grille b n'a pas atteint de cycle
+        - population[g, b] est la population de la grille b à la génération g (-1 une fois la grille retirée)
+        - cells est le tableau (B, lignes, colonnes) des grilles (une grille retirée reste à la génération de détection)
+    """
+    def __init__(self, n_boards, dim, rule=CONWAY, max_period=64, seed=None):
+        if max_period < 1:
+            raise ValueError("max_period doit être strictement positif")
+        rng = np.random.default_rng(seed)
+        self.dimensions = dim
+        self.rule = Rule(rule)
+        self.max_period = max_period
+        self.generation = 0
+        self.transient = np.full(n_boards, -1, dtype=np.int64)
+        self.period = np.full(n_boards, -1, dtype=np.int64)
+        self._all_cells = rng.integers(2, size=(n_boards,) + tuple(dim), dtype=np.uint8)
+        # Grilles encore actives : indices dans le lot et copie compacte de leurs cellules
+        self._ids = np.arange(n_boards)
+        self._cells = self._all_cells
+        # Poids aléatoires (impairs) de l'empreinte et tampon circulaire des empreintes des dernières générations
+        n_bytes = self._packed(self._cells).shape[1]
+        self._weights = rng.integers(1, 2**63, size=n_bytes, dtype=np.uint64) | np.uint64(1)
+        self._hashes = np.zeros((max_period + 1, n_boards), dtype=np.uint64)
+        self._hash_generations = np.full(max_period + 1, -1, dtype=np.int64)
+        self._population = []
+        self._record()
+
+    @property
+    def n_boards(self):
+        return self.transient.size
+
+    @property
+    def n_active(self):
+        """
+        Nombre de grilles qui n'ont pas encore atteint de cycle
+        """
+        return self._ids.size
+
+    @property
+    def cells(self):
+        if self._cells is not self._all_cells:
+            self._all_cells[self._ids] = self._cells
+        return self._all_cells
+
+    @property
+    def population(self):
+        return np.array(self._population)
+
+    def _packed(self, cells):
+        flat = cells.reshape(cells.shape[0], -1)
+        return np.packbits(flat, axis=1) if self.rule.n_states == 2 else flat
+
+    def _record(self):
+        """
+        Enregistre la population et l'empreinte des grilles actives pour la génération courante puis retire du lot
+        celles qui sont entrées dans un cycle
+        """
+        population = np.full(self.n_boards, -1, dtype=np.int64)
+        population[self._ids] = (self._cells == 1).sum(axis=(1, 2))
+        self._population.append(population)
+
+        hashes = (self._packed(self._cells).astype(np.uint64) * self._weights).sum(axis=1, dtype=np.uint64)
+        slot = self.generation % (self.max_period + 1)
+        matches = (self._hashes == hashes) & (self._hash_generations >= 0)[:, None]
+        matches[slot] = False
+        # Période = écart avec la génération la plus récente ayant la même empreinte
+        ages = np.where(matches, (self.generation - self._hash_generations)[:, None], self.max_period + 1)
+        periods = ages.min(axis=0)
+        self._hashes[slot] = hashes
+        self._hash_generations[slot] = self.generation
+
+        settled = periods <= self.max_period
+        if settled.any():
+            ids = self._ids[settled]
+            self.period[ids] = periods[settled]
+            self.transient[ids] = self.generation - periods[settled]
+            self._all_cells[ids] = self._cells[settled]
+            still_active = ~settled
+            self._ids = self._ids[still_active]
+            self._cells = self._cells[still_active]
+            self._hashes = self._hashes[:, still_active]
+
+    def step(self):
+        """
+        Fait avancer toutes les grilles actives d'une génération
+        """
+        self._cells = self.rule.apply(self._cells)
+        self.generation += 1
+        self._record()
+
+    def run(self, max_generations):
+        """
+        Fait évoluer le lot jusqu'à ce que toutes les grilles aient atteint un cycle ou jusqu'à max_generations
+        """
+        while self.n_active > 0 and self.generation < max_generations:
+            self.step()
+        return self
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    # Même interface que cycle_detection.py : python batch.py [nb_soupes] [taille] [max_generations]
+    nb_soups = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    max_generations = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    t1 = time.time()
+    batch = GrilleBatch(nb_soups, (size, size)).run(max_generations)
+    t2 = time.time()
+    print(f"{nb_soups} soupes {size}x{size} en {t2-t1:.2f} secondes ({batch.generation} générations)")
+    periods, counts = np.unique(batch.period, return_counts=True)
+    for period, count in zip(periods, counts):
+        print(f"  période {period if period >= 0 else 'non trouvée'} : {count} soupes")
+    if (batch.transient >= 0).any():
+        print(f"Transitoire moyen : {batch.transient[batch.transient >= 0].mean():.1f} générations")
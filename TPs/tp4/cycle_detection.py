@@ -0,0 +1,134 @@
+"""
+Détection des cycles (oscillateurs et structures stables) dans le jeu de la vie
+###############################################################################
+Sur une grille torique finie, toute partie finit par repasser par un état déjà rencontré : à partir de là, elle
+répète indéfiniment les mêmes générations. On garde une empreinte (hash) des dernières générations et, dès
+qu'une génération a la même empreinte qu'une génération récente, on sait que la partie est entrée dans un cycle.
+On connaît alors :
+    - la longueur du transitoire (numéro de la première génération du cycle) ;
+    - la période du cycle (1 pour une structure stable, 2 pour un blinker, 3 pour un pulsar, ...).
+
+Il est alors inutile de continuer à calculer : la génération n (n >= transitoire) est égale à la génération
+transitoire + (n - transitoire) % période, que l'on a encore en mémoire.
+
+Exemple :
+    grid = Grille((64, 64))
+    transient, period, generations = run_until_cycle(grid, max_generations=10000)
+"""
+import hashlib
+from collections import deque
+import numpy as np
+
+
+class CycleDetector:
+    """
+    Garde l'empreinte des max_period dernières générations et détecte le retour à un état déjà vu.
+        - cells est la grille initiale (génération 0)
+        - max_period est la plus grande période détectable (taille de la fenêtre glissante)
+        - n_states est le nombre d'états des cellules (2 pour le jeu de la vie classique)
+    Les grilles de la fenêtre sont conservées (compactées bit à bit s'il n'y a que deux états) afin de vérifier exactement l'égalité en cas
+    de collision d'empreintes et de pouvoir avancer rapidement une fois le cycle trouvé.
+    """
+    def __init__(self, cells, max_period=64, n_states=2):
+        if max_period < 1:
+            raise ValueError("max_period doit être strictement positif")
+        self.max_period = max_period
+        self.n_states = n_states
+        self.dimensions = cells.shape
+        self.generation = 0
+        self.transient = None
+        self.period = None
+        self._window = deque()
+        self._generations_by_hash = {}
+        self._push(cells)
+
+    @property
+    def found(self):
+        """
+        Vrai si un cycle a été détecté
+        """
+        return self.period is not None
+
+    def _push(self, cells):
+        if self.n_states == 2:
+            packed = np.packbits(cells, axis=None).tobytes()
+        else:
+            packed = np.ascontiguousarray(cells, dtype=np.uint8).tobytes()
+        digest = hashlib.blake2b(packed, digest_size=8).digest()
+        self._window.append((self.generation, digest, packed))
+        self._generations_by_hash.setdefault(digest, []).append(self.generation)
+        if len(self._window) > self.max_period + 1:
+            old_generation, old_digest, _ = self._window.popleft()
+            generations = self._generations_by_hash[old_digest]
+            generations.remove(old_generation)
+            if not generations:
+                del self._generations_by_hash[old_digest]
+        return digest, packed
+
+    def _packed(self, generation):
+        return self._window[generation - self._window[0][0]][2]
+
+    def update(self, cells):
+        """
+        Ajoute la génération suivante et renvoie vrai si un cycle est détecté (ou l'a déjà été)
+        """
+        if self.found:
+            return True
+        self.generation += 1
+        digest, packed = self._push(cells)
+        for generation in self._generations_by_hash[digest][:-1]:
+            if self._packed(generation) == packed:
+                self.transient = generation
+                self.period = self.generation - generation
+                break
+        return self.found
+
+    def fast_forward(self, generation):
+        """
+        Renvoie la grille (uint8) de la génération demandée, sans calcul, une fois le cycle détecté.
+        La génération doit appartenir au cycle ou à la fenêtre encore en mémoire.
+        """
+        if not self.found:
+            raise RuntimeError("Aucun cycle détecté pour l'instant")
+        if generation >= self.transient:
+            generation = self.transient + (generation - self.transient) % self.period
+        elif generation < self._window[0][0]:
+            raise IndexError(f"La génération {generation} n'est plus en mémoire")
+        bits = np.frombuffer(self._packed(generation), dtype=np.uint8)
+        if self.n_states != 2:
+            return bits.reshape(self.dimensions).copy()
+        return np.unpackbits(bits, count=self.dimensions[0]*self.dimensions[1]).reshape(self.dimensions)
+
+
+def run_until_cycle(grid, max_generations, max_period=64):
+    """
+    Fait évoluer grid jusqu'à détection d'un cycle ou jusqu'à max_generations générations.
+    Renvoie (transitoire, période, nombre de générations calculées) ; transitoire et période valent None si
+    aucun cycle n'a été trouvé.
+    """
+    detector = CycleDetector(grid.cells, max_period, grid.rule.n_states)
+    while detector.generation < max_generations:
+        grid.compute_next_iteration()
+        if detector.update(grid.cells):
+            break
+    return detector.transient, detector.period, detector.generation
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+    from game_of_life import Grille
+
+    # Recherche dans des soupes aléatoires : python cycle_detection.py [nb_soupes] [taille] [max_generations]
+    nb_soups = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    max_generations = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    periods = {}
+    t1 = time.time()
+    for _ in range(nb_soups):
+        transient, period, generations = run_until_cycle(Grille((size, size)), max_generations)
+        periods[period] = periods.get(period, 0) + 1
+    t2 = time.time()
+    print(f"{nb_soups} soupes {size}x{size} en {t2-t1:.2f} secondes")
+    for period, count in sorted(periods.items(), key=lambda x: (x[0] is None, x[0])):
+        print(f"  période {period if period is not None else 'non trouvée'} : {count} soupes")
@@ -23,6 +23,8 @@ On itère ensuite pour étudier la façon dont évolue la population des cellule
 """
 import pygame  as pg
 import numpy   as np
+from cycle_detection import CycleDetector
+from rules import Rule, CONWAY
 
 
 class Grille:
@@ -33,13 +35,15 @@ class Grille:
         - init_pattern est une liste de cellules initialement vivantes sur cette grille (les autres sont considérées comme mortes)
         - color_life est la couleur dans laquelle on affiche une cellule vivante
         - color_dead est la couleur dans laquelle on affiche une cellule morte
+        - rule est la règle d'évolution sous forme de chaîne B/S (voir rules.py), par défaut celle de Conway (B3/S23)
     Si aucun pattern n'est donné, on tire au hasard quels sont les cellules vivantes et les cellules mortes
     Exemple :
        grid = Grille( (10,10), init_pattern=[(2,2),(0,2),(4,2),(2,0),(2,4)], color_life=pg.Color("red"), color_dead=pg.Color("black"))
     """
-    def __init__(self, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white")):
+    def __init__(self, dim, init_pattern=None, color_life=pg.Color("black"), color_dead=pg.Color("white"), rule=CONWAY):
         import random
         self.dimensions = dim
+        self.rule = Rule(rule)
         if init_pattern is not None:
             self.cells = np.zeros(self.dimensions, dtype=np.uint8)
             indices_i = [v[0] for v in init_pattern]
@@ -52,10 +56,9 @@ class Grille:
 
     def compute_next_iteration(self):
         """
-        Calcule la prochaine génération de cellules en suivant les règles du jeu de la vie
+        Calcule la prochaine génération de cellules en suivant la règle de la grille (table de correspondance précalculée)
         """
-        neighbours_count = sum(np.roll(np.roll(self.cells, i, 0), j, 1) for i in (-1, 0, 1) for j in (-1, 0, 1) if (i != 0 or j != 0))  
-        next_cells = (neighbours_count == 3) | (self.cells & (neighbours_count == 2))
+        next_cells = self.rule.apply(self.cells)
         diff_cells = (next_cells != self.cells)
         self.cells = next_cells
         return diff_cells
@@ -84,6 +87,12 @@ class App:
         #
         self.canvas_cells = []
         self.colors = np.array([self.grid.col_dead[:-1], self.grid.col_life[:-1]])
+        # Règles à plusieurs états : les cellules mourantes passent progressivement de la couleur de vie à celle de mort
+        n_dying = self.grid.rule.n_states - 2
+        if n_dying > 0:
+            fading = np.linspace(0., 1., n_dying + 2)[1:-1, None]
+            dying_colors = (1. - fading) * self.colors[1] + fading * self.colors[0]
+            self.colors = np.vstack([self.colors, dying_colors.astype(self.colors.dtype)])
 
     def draw(self):
         surface = pg.surfarray.make_surface(self.colors[self.grid.cells.T])
@@ -100,6 +109,13 @@ if __name__ == '__main__':
     import time
     import sys
 
+    # Option --rule=<B/S> (par exemple --rule=B36/S23), les autres arguments restent positionnels
+    rule = CONWAY
+    for arg in sys.argv[1:]:
+        if arg.startswith("--rule="):
+            rule = arg[len("--rule="):]
+    sys.argv = [arg for arg in sys.argv if not arg.startswith("--rule=")]
+
     pg.init()
     dico_patterns = { # Dimension et pattern dans un tuple
         'blinker' : ((5,5),[(2,1),(2,2),(2,3)]),
@@ -125,27 +141,52 @@ if __name__ == '__main__':
     if len(sys.argv) > 3 :
         resx = int(sys.argv[2])
         resy = int(sys.argv[3])
+    record_file = None
+    if len(sys.argv) > 4 :
+        record_file = sys.argv[4]
     print(f"Pattern initial choisi : {choice}")
     print(f"resolution ecran : {resx,resy}")
+    print(f"Règle : {rule}")
     try:
         init_pattern = dico_patterns[choice]
     except KeyError:
         print("No such pattern. Available ones are:", dico_patterns.keys())
         exit(1)
-    grid = Grille(*init_pattern)
+    grid = Grille(*init_pattern, rule=rule)
     appli = App((resx, resy), grid)
+    recorder = None
+    if record_file is not None:
+        from recording import Recorder
+        recorder = Recorder(grid.cells, n_states=grid.rule.n_states)
+    # Une fois un cycle détecté, on ne calcule plus les générations : on les relit depuis le détecteur
+    detector = CycleDetector(grid.cells, n_states=grid.rule.n_states)
+    generation = 0
 
     loop = True
     while loop:
         #time.sleep(0.1) # A régler ou commenter pour vitesse maxi
         t1 = time.time()
-        diff = grid.compute_next_iteration()
+        generation += 1
+        if detector.found:
+            previous_cells = grid.cells
+            grid.cells = detector.fast_forward(generation)
+            diff = (grid.cells != previous_cells)
+        else:
+            diff = grid.compute_next_iteration()
+            if detector.update(grid.cells):
+                print(f"\nCycle détecté : transitoire de {detector.transient} générations, période {detector.period}")
         t2 = time.time()
+        if recorder is not None:
+            recorder.record(grid.cells, diff)
         appli.draw()
         t3 = time.time()
         for event in pg.event.get():
             if event.type == pg.QUIT:
                 loop = False
         print(f"Temps calcul prochaine generation : {t2-t1:2.2e} secondes, temps affichage : {t3-t2:2.2e} secondes\r", end='')
+    if recorder is not None:
+        recorder.save(record_file)
+        print(f"\nPartie enregistrée dans {record_file} : {recorder.n_generations} générations, "
+              f"{recorder.nbytes} octets ({100*recorder.nbytes/recorder.raw_nbytes:.2f}% de la taille brute)")
 
 pg.quit()
@@ -0,0 +1,209 @@
+"""
+Enregistrement et relecture compressés d'une partie du jeu de la vie
+####################################################################
+Plutôt que de stocker chaque génération sous forme d'un tableau uint8 complet, on stocke :
+    - la grille initiale (génération 0) ;
+    - pour chaque génération suivante, le masque des cellules ayant changé d'état (diff_cells renvoyé par
+      Grille.compute_next_iteration), compacté bit à bit (np.packbits) puis compressé avec zlib ;
+    - toutes les keyframe_interval générations, une image clé complète (elle aussi compactée bit à bit), ce qui
+      permet d'accéder à la génération N sans rejouer toute la partie depuis le début.
+
+Lorsque les cellules ne prennent que deux états, la génération n s'obtient à partir de la génération n-1 par un
+simple ou exclusif avec le masque des différences. Pour les règles à plusieurs états (voir rules.py), les images
+clés sont stockées octet par octet et chaque masque est suivi des nouveaux états des cellules qui ont changé.
+
+Exemple :
+    grid = Grille((100, 100))
+    recorder = Recorder(grid.cells, keyframe_interval=64)
+    for _ in range(1000):
+        diff = grid.compute_next_iteration()
+        recorder.record(grid.cells, diff)
+    recorder.save("partie.npz")
+
+    replay = Replayer("partie.npz")
+    cells = replay.seek(500)
+"""
+import zlib
+import numpy as np
+
+# Niveau de compression zlib : 1 est largement suffisant pour des masques très creux et reste rapide
+COMPRESSION_LEVEL = 1
+
+
+def _pack(mask):
+    """
+    Compacte un tableau de booléens (ou de 0/1) bit à bit puis le compresse avec zlib
+    """
+    return zlib.compress(np.packbits(mask, axis=None).tobytes(), COMPRESSION_LEVEL)
+
+
+def _unpack(blob, dimensions):
+    """
+    Opération inverse de _pack : renvoie un tableau uint8 de 0/1 de forme dimensions
+    """
+    count = dimensions[0] * dimensions[1]
+    bits = np.frombuffer(zlib.decompress(blob), dtype=np.uint8)
+    return np.unpackbits(bits, count=count).reshape(dimensions)
+
+
+def _pack_states(cells):
+    """
+    Compresse une grille à plusieurs états (un octet par cellule)
+    """
+    return zlib.compress(np.ascontiguousarray(cells, dtype=np.uint8).tobytes(), COMPRESSION_LEVEL)
+
+
+def _unpack_states(blob, dimensions):
+    """
+    Opération inverse de _pack_states
+    """
+    return np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(dimensions).copy()
+
+
+def _pack_delta(cells, diff_cells):
+    """
+    Masque des différences compacté bit à bit, suivi des nouveaux états des cellules modifiées
+    """
+    mask = np.packbits(diff_cells, axis=None).tobytes()
+    return zlib.compress(mask + cells[diff_cells.astype(bool)].astype(np.uint8).tobytes(), COMPRESSION_LEVEL)
+
+
+def _apply_delta(cells, blob):
+    """
+    Opération inverse de _pack_delta : met à jour cells en place
+    """
+    data = np.frombuffer(zlib.decompress(blob), dtype=np.uint8)
+    n_mask = (cells.size + 7) // 8
+    mask = np.unpackbits(data[:n_mask], count=cells.size).reshape(cells.shape).astype(bool)
+    cells[mask] = data[n_mask:]
+
+
+class Recorder:
+    """
+    Enregistre une partie génération par génération.
+        - cells est la grille initiale (génération 0)
+        - keyframe_interval est le nombre de générations entre deux images clés
+        - n_states est le nombre d'états des cellules (2 pour le jeu de la vie classique)
+    """
+    def __init__(self, cells, keyframe_interval=64, n_states=2):
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval doit être strictement positif")
+        self.dimensions = cells.shape
+        self.keyframe_interval = keyframe_interval
+        self.n_states = n_states
+        self.keyframes = [self._pack_keyframe(cells)]
+        self.deltas = []
+
+    @property
+    def n_generations(self):
+        """
+        Nombre de générations enregistrées (génération initiale comprise)
+        """
+        return len(self.deltas) + 1
+
+    def _pack_keyframe(self, cells):
+        return _pack(cells) if self.n_states == 2 else _pack_states(cells)
+
+    def record(self, cells, diff_cells):
+        """
+        Ajoute une génération : cells est la nouvelle grille et diff_cells le masque renvoyé par
+        compute_next_iteration pour passer de la génération précédente à celle-ci.
+        """
+        if self.n_states == 2:
+            self.deltas.append(_pack(diff_cells))
+        else:
+            self.deltas.append(_pack_delta(cells, diff_cells))
+        if len(self.deltas) % self.keyframe_interval == 0:
+            self.keyframes.append(self._pack_keyframe(cells))
+
+    @property
+    def nbytes(self):
+        """
+        Taille (en octets) des données compressées
+        """
+        return sum(len(b) for b in self.keyframes) + sum(len(b) for b in self.deltas)
+
+    @property
+    def raw_nbytes(self):
+        """
+        Taille (en octets) qu'occuperait la partie stockée sous forme de tableaux uint8 complets
+        """
+        return self.n_generations * self.dimensions[0] * self.dimensions[1]
+
+    def save(self, filename):
+        """
+        Sauvegarde la partie dans un fichier .npz (blobs concaténés et tables d'offsets)
+        """
+        np.savez(filename,
+                 dimensions=np.array(self.dimensions, dtype=np.int64),
+                 keyframe_interval=np.int64(self.keyframe_interval),
+                 n_states=np.int64(self.n_states),
+                 keyframe_offsets=np.cumsum([0] + [len(b) for b in self.keyframes], dtype=np.int64),
+                 keyframes=np.frombuffer(b"".join(self.keyframes), dtype=np.uint8),
+                 delta_offsets=np.cumsum([0] + [len(b) for b in self.deltas], dtype=np.int64),
+                 deltas=np.frombuffer(b"".join(self.deltas), dtype=np.uint8))
+
+
+class Replayer:
+    """
+    Relit une partie enregistrée par Recorder.save sans recalculer les générations.
+    seek(n) part de l'image clé la plus proche précédant n (ou de la génération courante si elle est plus proche)
+    puis applique les masques de différences jusqu'à n.
+    """
+    def __init__(self, filename):
+        with np.load(filename) as data:
+            self.dimensions = tuple(int(d) for d in data["dimensions"])
+            self.keyframe_interval = int(data["keyframe_interval"])
+            self.n_states = int(data["n_states"]) if "n_states" in data else 2
+            self._keyframe_offsets = data["keyframe_offsets"]
+            self._keyframes = data["keyframes"].tobytes()
+            self._delta_offsets = data["delta_offsets"]
+            self._deltas = data["deltas"].tobytes()
+        self.generation = 0
+        self.cells = self._keyframe(0)
+
+    def __len__(self):
+        return len(self._delta_offsets)
+
+    def _keyframe(self, k):
+        blob = self._keyframes[self._keyframe_offsets[k]:self._keyframe_offsets[k+1]]
+        return _unpack(blob, self.dimensions) if self.n_states == 2 else _unpack_states(blob, self.dimensions)
+
+    def _apply_delta(self, generation):
+        blob = self._deltas[self._delta_offsets[generation-1]:self._delta_offsets[generation]]
+        if self.n_states == 2:
+            self.cells ^= _unpack(blob, self.dimensions)
+        else:
+            _apply_delta(self.cells, blob)
+
+    def seek(self, generation):
+        """
+        Renvoie la grille (uint8) de la génération demandée
+        """
+        if not 0 <= generation < len(self):
+            raise IndexError(f"Génération {generation} hors de l'enregistrement (0..{len(self)-1})")
+        k = generation // self.keyframe_interval
+        if not (k * self.keyframe_interval <= self.generation <= generation):
+            self.generation = k * self.keyframe_interval
+            self.cells = self._keyframe(k)
+        while self.generation < generation:
+            self.generation += 1
+            self._apply_delta(self.generation)
+        return self.cells.copy()
+
+    def __iter__(self):
+        for generation in range(len(self)):
+            yield self.seek(generation)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print(f"Usage : python {sys.argv[0]} partie.npz [generation]")
+        exit(1)
+    replay = Replayer(sys.argv[1])
+    generation = int(sys.argv[2]) if len(sys.argv) > 2 else len(replay) - 1
+    cells = replay.seek(generation)
+    print(f"{len(replay)} générations de taille {replay.dimensions}, image clé toutes les {replay.keyframe_interval} générations")
+    print(f"Génération {generation} : {int((cells == 1).sum())} cellules vivantes")
@@ -0,0 +1,110 @@
+"""
+Règles totalistiques extérieures (outer totalistic) pour les automates cellulaires de type jeu de la vie
+#######################################################################################################
+Une règle est donnée sous la forme d'une chaîne B/S :
+    - "B3/S23" : une cellule morte naît avec 3 voisines vivantes, une cellule vivante survit avec 2 ou 3 voisines
+      (règle de Conway)
+    - "B36/S23" (HighLife), "B2/S" (Seeds), "B3678/S34678" (Day & Night), ...
+On accepte aussi les règles "Generations" à plusieurs états avec un suffixe /C<nombre d'états>, par exemple
+"B2/S/C3" (Brian's Brain). L'état 0 est mort, l'état 1 vivant, et une cellule vivante qui ne survit pas passe
+par les états 2, 3, ..., C-1 (cellule mourante, qui ne compte plus comme voisine) avant de revenir à 0.
+
+La règle est compilée en une table de correspondance de taille (nombre d'états) x 9 : la génération suivante
+s'obtient alors par un seul np.take, indexé par état * 9 + nombre de voisines vivantes.
+Pour les règles à deux états, chaque ligne de la table tient dans un entier de 9 bits : on évite alors le np.take
+(un accès indirect par cellule) en décalant le masque de la ligne du nombre de voisines, ce qui est plus rapide que
+le calcul codé en dur de Conway.
+"""
+import re
+import numpy as np
+
+CONWAY = "B3/S23"
+HIGHLIFE = "B36/S23"
+SEEDS = "B2/S"
+DAY_AND_NIGHT = "B3678/S34678"
+BRIANS_BRAIN = "B2/S/C3"
+
+_RULE_PATTERN = re.compile(r"^B([0-8]*)/S([0-8]*)(?:/C(\d+))?$", re.IGNORECASE)
+
+
+class Rule:
+    """
+    Règle compilée à partir d'une chaîne B/S (ou B/S/C pour les règles à plusieurs états).
+    Exemple :
+        rule = Rule("B36/S23")
+        next_cells = rule.apply(cells)
+    """
+    def __init__(self, rule=CONWAY):
+        match = _RULE_PATTERN.match(rule.replace(" ", ""))
+        if match is None:
+            raise ValueError(f"Règle invalide : {rule!r} (attendu par exemple 'B3/S23' ou 'B2/S/C3')")
+        self.birth = frozenset(int(c) for c in match.group(1))
+        self.survival = frozenset(int(c) for c in match.group(2))
+        self.n_states = int(match.group(3)) if match.group(3) is not None else 2
+        if not 2 <= self.n_states <= 256:
+            raise ValueError(f"Le nombre d'états doit être compris entre 2 et 256 (reçu {self.n_states})")
+        self.table = self._compile()
+        # Lignes de la table sous forme de masques de 9 bits (règles à deux états)
+        rows = self.table.reshape(self.n_states, 9)
+        self._birth_mask = np.uint16(sum(1 << n for n in range(9) if rows[0, n]))
+        self._survival_mask = np.uint16(sum(1 << n for n in range(9) if rows[1, n] == 1))
+        # Type suffisant pour l'indice état * 9 + voisines
+        self._index_dtype = np.uint8 if self.n_states * 9 <= 256 else np.uint16
+
+    def __repr__(self):
+        rule = f"B{''.join(map(str, sorted(self.birth)))}/S{''.join(map(str, sorted(self.survival)))}"
+        if self.n_states > 2:
+            rule += f"/C{self.n_states}"
+        return f"Rule({rule!r})"
+
+    def _compile(self):
+        """
+        Construit la table (aplatie) donnant l'état suivant en fonction de l'état courant et du nombre de voisines
+        """
+        table = np.zeros((self.n_states, 9), dtype=np.uint8)
+        dying = 2 if self.n_states > 2 else 0
+        for n in range(9):
+            table[0, n] = 1 if n in self.birth else 0
+            table[1, n] = 1 if n in self.survival else dying
+        for state in range(2, self.n_states):
+            table[state, :] = (state + 1) % self.n_states
+        return table.ravel()
+
+    @staticmethod
+    def count_neighbours(alive):
+        """
+        Nombre de voisines vivantes (uint8) de chaque cellule sur le tore.
+        On recopie la grille dans un tableau avec une couronne de cellules fantômes (bords opposés du tore) puis on
+        fait la somme 3x3 de façon séparable, par tranches, sans les copies qu'imposerait np.roll.
+        Les deux derniers axes sont les lignes et les colonnes : on peut passer une pile de grilles (B, lignes, colonnes).
+        """
+        padded = np.empty(alive.shape[:-2] + (alive.shape[-2] + 2, alive.shape[-1] + 2), dtype=np.uint8)
+        padded[..., 1:-1, 1:-1] = alive
+        padded[..., 0, 1:-1] = alive[..., -1, :]
+        padded[..., -1, 1:-1] = alive[..., 0, :]
+        padded[..., :, 0] = padded[..., :, -2]
+        padded[..., :, -1] = padded[..., :, 1]
+        rows = padded[..., :-2, :] + padded[..., 1:-1, :]
+        rows += padded[..., 2:, :]
+        neighbours = rows[..., :-2] + rows[..., 2:]
+        neighbours += rows[..., 1:-1]
+        neighbours -= alive
+        return neighbours
+
+    def apply(self, cells):
+        """
+        Renvoie la génération suivante (uint8) de cells (une grille ou une pile de grilles)
+        """
+        cells = cells.astype(np.uint8, copy=False)
+        if self.n_states == 2:
+            neighbours = self.count_neighbours(cells)
+            masks = cells.astype(np.uint16)
+            masks *= self._birth_mask ^ self._survival_mask
+            masks ^= self._birth_mask
+            masks >>= neighbours
+            masks &= 1
+            return masks.astype(np.uint8)
+        alive = (cells == 1).view(np.uint8)
+        index = self.count_neighbours(alive).astype(self._index_dtype, copy=False)
+        index += cells.astype(self._index_dtype, copy=False) * self._index_dtype(9)
+        return np.take(self.table, index)
@@ -2,73 +2,54 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 import sys
-import re
 import os
-import glob
 from collections import defaultdict
 
-def extract_metadata_and_data(filename):
-    metadata = {}
-    data_lines = []
-    
-    with open(filename, 'r') as file:
-        for line in file:
-            line = line.strip()
-            
-            # Capture "Taille du terrain : X"
-            if line.startswith("Taille du terrain :"):
-                match = re.search(r"Taille du terrain\s*:\s*(\d+)", line)
-                if match:
-                    metadata['terrain_size'] = int(match.group(1))
-            
-            # Capture "Nombre de cellules par direction : X"
-            elif line.startswith("Nombre de cellules par direction :"):
-                match = re.search(r"Nombre de cellules par direction\s*:\s*(\d+)", line)
-                if match:
-                    metadata['cells'] = int(match.group(1))
-            
-            # Capture "Vecteur vitesse : [x, y]"
-            elif line.startswith("Vecteur vitesse :"):
-                match = re.search(r"Vecteur vitesse\s*:\s*\[(\d+),\s*(\d+)\]", line)
-                if match:
-                    vx, vy = match.groups()
-                    metadata['velocity'] = (int(vx), int(vy))
-            
-            # Capture "Position initiale du foyer (col, ligne) : col, line"
-            elif line.startswith("Position initiale du foyer (col, ligne) :"):
-                match = re.search(r"Position initiale du foyer \(col,\s*ligne\)\s*:\s*(\d+),\s*(\d+)", line)
-                if match:
-                    col, row = match.groups()
-                    metadata['fire_col'] = int(col)
-                    metadata['fire_row'] = int(row)
-            
-            # Capture "OpenMP threads: X"
-            elif line.startswith("OpenMP threads:"):
-                metadata['OpenMP_threads'] = int(line.split(":")[1].strip())
-            
-            # Capture data lines in the form "step,update_time,display_time,total_time"
-            elif re.match(r'^\d+,\d+,\d+,\d+$', line):
-                data_lines.append(line)
-    
-    # Convert data lines into a pandas DataFrame
-    if data_lines:
-        df = pd.DataFrame(
-            [x.split(',') for x in data_lines], 
-            columns=['step', 'update_time', 'display_time', 'total_time']
-        ).astype({'step': int, 'update_time': int, 'display_time': int, 'total_time': int})
-    else:
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from log_reader import LOG_COLUMNS
+from log_store import TIME_COLUMNS, default_store, folder_frames
+from trial_stats import trial_frame
+
+def extract_metadata_and_data(header, values):
+    if len(values) == 0:
         raise ValueError("No valid data found in the file.")
-    
+    df = pd.DataFrame(values, columns=LOG_COLUMNS)
+
+    metadata = {}
+    if header.terrain_size is not None:
+        metadata['terrain_size'] = header.terrain_size
+    if header.cells is not None:
+        metadata['cells'] = header.cells
+    if header.velocity is not None:
+        metadata['velocity'] = header.velocity
+    if header.fire_position is not None:
+        metadata['fire_col'], metadata['fire_row'] = header.fire_position
+    if header.omp_threads is not None:
+        metadata['OpenMP_threads'] = header.omp_threads
+
     return metadata, df
 
-def process_csv_files_by_thread_count(csv_files):
+def read_benchmark_logs(benchmark_folders, logs_folder='logs'):
+    # CSV files of every benchmark folder with their parsed logs, {folder: (csv_files, logs)}: the logs of all the
+    # folders come from a single query of the store (new or modified files are first parsed in its process pool)
+    store = default_store()
+    logs_folders = {folder: os.path.join(folder, logs_folder) for folder in benchmark_folders}
+    frames = folder_frames(list(logs_folders.values()), store)
+    benchmark_logs = {}
+    for folder, path in logs_folders.items():
+        runs = list(frames[path].groupby("path", sort=False))
+        benchmark_logs[folder] = ([log for log, _ in runs],
+                                  [(store.header(log), run[TIME_COLUMNS].to_numpy()) for log, run in runs])
+    return benchmark_logs
+
+def process_csv_files_by_thread_count(csv_files, logs):
     # Dictionary to store DataFrames grouped by thread count
     thread_groups = defaultdict(list)
     
     # Process each CSV file
-    for csv_file in csv_files:
+    for csv_file, (header, values) in zip(csv_files, logs):
         try:
-            metadata, df = extract_metadata_and_data(csv_file)
+            metadata, df = extract_metadata_and_data(header, values)
             thread_count = metadata.get('OpenMP_threads', 'Unknown')
             
             # Store the DataFrame along with its metadata
@@ -96,21 +77,10 @@ def calculate_averages(thread_groups):
         # Get a sample metadata (using the first file's metadata)
         sample_metadata = file_data[0][0]
         
-        # For proper averaging, we need to align the step values
-        # Find the maximum step value that appears in all dataframes
-        min_max_step = min(df['step'].max() for df in all_dfs)
-        
-        # Filter dataframes to include only steps up to min_max_step
-        filtered_dfs = [df[df['step'] <= min_max_step] for df in all_dfs]
-        
-        # Create a new DataFrame to store the average values
-        avg_df = pd.DataFrame()
-        avg_df['step'] = filtered_dfs[0]['step']  # Use steps from the first DataFrame
-        
-        # Calculate averages for each column
-        avg_df['update_time'] = pd.concat([df['update_time'] for df in filtered_dfs], axis=1).mean(axis=1)
-        avg_df['display_time'] = pd.concat([df['display_time'] for df in filtered_dfs], axis=1).mean(axis=1)
-        avg_df['total_time'] = pd.concat([df['total_time'] for df in filtered_dfs], axis=1).mean(axis=1)
+        # Stack the trials aligned on their steps (trials of different lengths are kept: the last steps are
+        # averaged over the trials that reached them) and compute mean, median, std, p5 and p95 per step
+        time_columns = ['update_time', 'display_time', 'total_time']
+        avg_df = trial_frame([df[['step'] + time_columns].to_numpy() for df in all_dfs], time_columns)
         
         # Store the average DataFrame and the sample metadata
         average_results[thread_count] = (sample_metadata, avg_df, len(file_data))
@@ -183,26 +153,26 @@ def plot_average_results(average_results, output_folder='plots'):
         print(f"Plot saved as {output_filename}")
 
 def main():
-    # Specify the logs folder
-    logs_folder = 'logs'
-    
-    # Find all CSV files in the logs folder
-    csv_files = glob.glob(os.path.join(logs_folder, '*.csv'))
-    
-    if not csv_files:
-        print("No CSV files found in the logs folder.")
-        return
-    
-    print(f"Found {len(csv_files)} CSV files.")
-    
-    # Group files by thread count
-    thread_groups = process_csv_files_by_thread_count(csv_files)
-    
-    # Calculate average results for each thread count
-    average_results = calculate_averages(thread_groups)
-    
-    # Plot the average results
-    plot_average_results(average_results)
+    # Benchmark folders holding a logs folder (the current folder by default), plots written to <folder>/plots:
+    #     python csv_plot.py benchmarks/benchmark_*
+    benchmark_folders = sys.argv[1:] or ['.']
+    
+    # Read the logs of all the folders in one batch
+    for folder, (csv_files, logs) in read_benchmark_logs(benchmark_folders).items():
+        if not csv_files:
+            print(f"No CSV files found in the logs folder of {folder}.")
+            continue
+        
+        print(f"Found {len(csv_files)} CSV files in {folder}.")
+        
+        # Group files by thread count
+        thread_groups = process_csv_files_by_thread_count(csv_files, logs)
+        
+        # Calculate average results for each thread count
+        average_results = calculate_averages(thread_groups)
+        
+        # Plot the average results
+        plot_average_results(average_results, os.path.join(folder, 'plots'))
     
     print("All processing completed.")
 
@@ -41,22 +41,10 @@ for N in 50 100 200 400 700 1000; do
     
     cd ..
     
-    echo "Generating graphs for N=$N..."
-    python speedup_plot.py
-    python csv_plot.py
-    
     # Create benchmark_N directory
     echo "Creating benchmark_$N directory..."
     mkdir -p "benchmark_$N"
     
-    # Move plot folder to benchmark_N
-    if [ -d "plots" ]; then
-        echo "Moving plot folder to benchmark_$N directory..."
-        mv plots "benchmark_$N/"
-    else
-        echo "Warning: plots folder not found for N=$N"
-    fi
-    
     # Move logs to benchmark_N folder
     if [ -d "$LOG_DIR" ]; then
         echo "Moving logs to benchmark_$N directory..."
@@ -74,4 +62,11 @@ for N in 50 100 200 400 700 1000; do
     cd "$BUILD_DIR"
 done
 
+cd ..
+
+# The graphs of all the N are generated at once, each in benchmark_N/plots (logs read in a single batch)
+echo "Generating graphs..."
+python speedup_plot.py benchmark_*/
+python csv_plot.py benchmark_*/
+
 echo "Process completed!"
@@ -1,80 +1,73 @@
 import pandas as pd
-import glob
 import os
-from io import StringIO
+import sys
 import matplotlib.pyplot as plt
 import numpy as np
 from collections import defaultdict
 
-# Folder containing all your .csv files
-FOLDER_PATH = "./logs/*.csv"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from log_reader import LOG_COLUMNS
+from log_store import TIME_COLUMNS, default_store, folder_frames
+from trial_stats import bootstrap_speedup, mad_outliers, stack_groups, trial_frame
+
+# Folder of the .csv files, and output folder for plots, in each benchmark folder given on the command line
+# (the current folder by default):
+#     python speedup_plot.py benchmarks/benchmark_*
+LOGS_FOLDER = "logs"
+OUTPUT_FOLDER = "plots"
 
 # Column name to base speedup on (e.g., "update_time" or "total_time").
 TIME_COLUMN = "update_time"
 
-# Output folder for plots
-OUTPUT_FOLDER = "./plots"
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+# Statistic of the trials the speedups are based on ("median", "trimmed_mean" or "mean")
+SPEEDUP_STATISTIC = "median"
+
+# Drop the times flagged by the MAD test before computing the speedups. Off by default: with many threads the
+# times can switch between two regimes, and the test then flags a whole regime rather than one-off spikes (17% of
+# the times at 12 threads for N=200 and N=400)
+REJECT_OUTLIERS = False
+
+# Bootstrap confidence intervals drawn around the speedups
+N_BOOT = 1000
+CONFIDENCE = 0.95
 
-def extract_data_from_file(csv_file):
-    """Extract thread count and timing data from a CSV file."""
-    with open(csv_file, 'r') as f:
-        lines = f.readlines()
-    
-    # Find the "OpenMP threads: <value>" line
-    thread_count = None
-    for line in lines:
-        if line.strip().startswith("OpenMP threads:"):
-            try:
-                thread_count = int(line.strip().split(":")[1])
-                break
-            except ValueError:
-                print(f"Could not parse thread count in file {csv_file}")
-                return None, None
-    
-    if thread_count is None:
+# Position of TIME_COLUMN in the arrays returned by read_benchmark_logs
+TIME_INDEX = LOG_COLUMNS.index(TIME_COLUMN)
+
+def extract_data_from_file(csv_file, header, values):
+    """Extract thread count and timing data from a parsed CSV file."""
+    if header.omp_threads is None:
         print(f"No thread count found in {csv_file}, skipping.")
         return None, None
-    
-    # Identify where the CSV portion starts
-    data_start_idx = None
-    for i, line in enumerate(lines):
-        if line.startswith("step,"):
-            data_start_idx = i
-            break
-    
-    if data_start_idx is None:
-        print(f"No CSV header found in {csv_file}, skipping.")
-        return None, None
 
-    # Extract the CSV portion and parse into a DataFrame
-    csv_data = lines[data_start_idx:]
-    try:
-        df = pd.read_csv(StringIO("".join(csv_data)))
-    except Exception as e:
-        print(f"Error parsing CSV data in {csv_file}: {e}")
-        return None, None
-    
-    if TIME_COLUMN not in df.columns:
-        print(f"Column '{TIME_COLUMN}' not found in {csv_file}. Skipping.")
-        return None, None
-    
-    if "step" not in df.columns:
-        print(f"No 'step' column found in {csv_file}. Skipping.")
+    if len(values) == 0:
+        print(f"No CSV header found in {csv_file}, skipping.")
         return None, None
 
     # Only keep 'step' and the chosen time column
-    df = df[["step", TIME_COLUMN]].copy()
-    df.rename(columns={TIME_COLUMN: "time"}, inplace=True)
+    df = pd.DataFrame({"step": values[:, 0], "time": values[:, TIME_INDEX]})
     
-    return thread_count, df
+    return header.omp_threads, df
 
-def group_data_by_thread_count():
-    """Group all CSV files by thread count and return a dictionary of lists."""
-    csv_files = glob.glob(FOLDER_PATH)
-    
+def read_benchmark_logs(benchmark_folders):
+    """
+    CSV files of every benchmark folder and their parsed logs, {folder: (csv_files, logs)}. The logs of all the
+    folders come from a single query of the store (new or modified files are first parsed in its process pool).
+    """
+    store = default_store()
+    logs_folders = {folder: os.path.join(folder, LOGS_FOLDER) for folder in benchmark_folders}
+    frames = folder_frames(list(logs_folders.values()), store)
+    benchmark_logs = {}
+    for folder, logs_folder in logs_folders.items():
+        runs = list(frames[logs_folder].groupby("path", sort=False))
+        benchmark_logs[folder] = ([path for path, _ in runs],
+                                  [(store.header(path), run[TIME_COLUMNS].to_numpy()) for path, run in runs])
+    return benchmark_logs
+
+def group_data_by_thread_count(csv_files, logs):
+    """Group the parsed CSV files by thread count and return a dictionary of lists."""
     if not csv_files:
-        print(f"No CSV files found in {FOLDER_PATH}")
+        print("No CSV files found")
         return {}
     
     print(f"Found {len(csv_files)} CSV files.")
@@ -82,8 +75,8 @@ def group_data_by_thread_count():
     # Dictionary to store data for each thread count
     data_by_thread_list = defaultdict(list)
     
-    for csv_file in csv_files:
-        thread_count, df = extract_data_from_file(csv_file)
+    for csv_file, (header, values) in zip(csv_files, logs):
+        thread_count, df = extract_data_from_file(csv_file, header, values)
         if thread_count is not None and df is not None:
             data_by_thread_list[thread_count].append(df)
             print(f"Processed {csv_file} - Thread count: {thread_count}")
@@ -98,18 +91,9 @@ def calculate_average_data(data_by_thread_list):
         if not df_list:
             continue
         
-        # Find the maximum step that appears in all dataframes
-        min_max_step = min(df['step'].max() for df in df_list)
-        
-        # Filter dataframes to include only steps up to min_max_step
-        filtered_dfs = [df[df['step'] <= min_max_step] for df in df_list]
-        
-        # Create a new DataFrame for the average values
-        avg_df = pd.DataFrame()
-        avg_df['step'] = filtered_dfs[0]['step']  # Use steps from the first DataFrame
-        
-        # Calculate average time for each step
-        avg_df['time'] = pd.concat([df['time'] for df in filtered_dfs], axis=1).mean(axis=1)
+        # Stack the trials aligned on their steps (trials of different lengths are kept: the last steps are
+        # averaged over the trials that reached them) and compute mean, median, std, p5 and p95 per step
+        avg_df = trial_frame([df[['step', 'time']].to_numpy() for df in df_list], ['time'])
         
         # Store the average DataFrame
         average_data_by_thread[thread_count] = avg_df
@@ -118,43 +102,59 @@ def calculate_average_data(data_by_thread_list):
     
     return average_data_by_thread
 
-def plot_step_by_step_speedup(average_data_by_thread):
-    """Plot speedup vs. step for each thread count."""
-    if 1 not in average_data_by_thread:
+def stack_thread_trials(data_by_thread_list):
+    """
+    Stack the trials of all thread counts into one (threads x trials x steps) array of times, for the speedups.
+    Times flagged by the MAD test are reported, and replaced by NaN if REJECT_OUTLIERS.
+
+    Returns (threads, steps, stack) with the thread counts sorted.
+    """
+    threads = sorted(data_by_thread_list)
+    steps, stack = stack_groups([[df[["step", "time"]].to_numpy() for df in data_by_thread_list[t]]
+                                 for t in threads])
+
+    outliers = mad_outliers(stack)
+    action = "rejected" if REJECT_OUTLIERS else "flagged (kept)"
+    for t, flagged, total in zip(threads, outliers.sum(axis=(1, 2)), (~np.isnan(stack)).sum(axis=(1, 2))):
+        if flagged:
+            print(f"{flagged} outlier times {action} for {t} threads ({flagged / total:.1%} of its times)")
+    if REJECT_OUTLIERS:
+        stack = np.where(outliers, np.nan, stack)
+    return threads, steps, stack
+
+def plot_step_by_step_speedup(threads, steps, stack, output_folder=OUTPUT_FOLDER):
+    """Plot speedup vs. step for each thread count, with its bootstrap confidence band."""
+    if 1 not in threads:
         print("No single-thread (thread_count=1) data found; cannot compute speedup.")
         return
     
-    single_thread_df = average_data_by_thread[1].copy()
-    single_thread_df.rename(columns={"time": "time_1"}, inplace=True)
+    # Speedups of all thread counts against 1 thread, and their confidence intervals, in one pass
+    speedup, low, high = bootstrap_speedup(stack, baseline=threads.index(1), statistic=SPEEDUP_STATISTIC,
+                                           n_boot=N_BOOT, confidence=CONFIDENCE)
     
     plt.figure(figsize=(12, 8))
     
     # Use a colormap for better distinction between lines
-    colors = plt.cm.viridis(np.linspace(0, 1, len(average_data_by_thread) - 1))
+    colors = plt.cm.viridis(np.linspace(0, 1, len(threads) - 1))
     color_idx = 0
     
-    for t, df_t in sorted(average_data_by_thread.items()):
+    for i, t in enumerate(threads):
         if t == 1:
             continue
         
-        # Merge on 'step' so we line up times for the same step
-        merged = pd.merge(single_thread_df, df_t, on="step", how="inner")
-        
-        # Compute speedup = time_1 / time
-        merged["speedup"] = merged["time_1"] / merged["time"]
-        
-        # Plot speedup vs. step
-        plt.plot(merged["step"], merged["speedup"], 
+        # Plot speedup vs. step and its confidence band
+        plt.plot(steps, speedup[i], 
                  label=f"{t} threads", 
                  color=colors[color_idx],
                  linewidth=2)
+        plt.fill_between(steps, low[i], high[i], color=colors[color_idx], alpha=0.2, linewidth=0)
         color_idx += 1
     
     # Add a horizontal red dashed line at y=1 to indicate the baseline
     plt.axhline(y=1, color='red', linestyle='--', label='Baseline (1×)')
     
     # Add a horizontal line at y=t for each thread count t
-    for t in sorted(average_data_by_thread.keys()):
+    for t in threads:
         if t > 1:
             plt.axhline(y=t, color='gray', linestyle=':', alpha=0.5)
     
@@ -162,7 +162,8 @@ def plot_step_by_step_speedup(average_data_by_thread):
     
     plt.xlabel("Step")
     plt.ylabel("Speedup")
-    plt.title(f"Average Speedup vs. Step (based on {TIME_COLUMN})")
+    plt.title(f"Speedup vs. Step ({SPEEDUP_STATISTIC.replace('_', ' ')} of the trials, "
+              f"{CONFIDENCE:.0%} bootstrap CI, based on {TIME_COLUMN})")
     plt.legend()
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
@@ -172,48 +173,45 @@ def plot_step_by_step_speedup(average_data_by_thread):
     span = max(1 - ylim[0], ylim[1] - 1)
     plt.ylim(0,2)
 
-    output_file = os.path.join(OUTPUT_FOLDER, "avg_speedup_vs_step.png")
+    output_file = os.path.join(output_folder, "avg_speedup_vs_step.png")
     plt.savefig(output_file)
     plt.show(block=False)
+    plt.close()
     print(f"Saved step-by-step speedup plot to {output_file}")
 
-def plot_total_speedup(average_data_by_thread):
-    """Plot total speedup as a bar chart."""
+def plot_total_speedup(average_data_by_thread, threads, steps, stack, output_folder=OUTPUT_FOLDER):
+    """Plot total speedup as a bar chart, with bootstrap confidence intervals as error bars."""
     if 1 not in average_data_by_thread:
         print("No single-thread (thread_count=1) data found; cannot compute speedup.")
         return
     
     single_thread_df = average_data_by_thread[1].copy()
     
-    # Compute the 25th and 75th percentiles of the step values
+    # Compute the 40th and 60th percentiles of the step values
     proportional_start = int(single_thread_df["step"].quantile(0.4))
     proportional_end = int(single_thread_df["step"].quantile(0.6))
     
-    # Filter the DataFrame using these dynamic values
-    single_thread_middle = single_thread_df[
-        (single_thread_df["step"] >= proportional_start) & 
-        (single_thread_df["step"] <= proportional_end)
-    ]
+    # Total time of each trial over the proportional step range (steps rejected as outliers are
+    # replaced by the trial's mean over the range)
+    middle = (steps >= proportional_start) & (steps <= proportional_end)
+    middle_stack = stack[:, :, middle]
+    n_times = (~np.isnan(middle_stack)).sum(axis=2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        trial_totals = np.nansum(middle_stack, axis=2) / n_times * middle.sum()
     
-    # Dictionary to store total speedup per thread
+    # Total speedup = single-thread total time / total time for t threads, with its confidence interval
+    speedup, low, high = bootstrap_speedup(trial_totals[:, :, None], baseline=threads.index(1),
+                                           statistic=SPEEDUP_STATISTIC, n_boot=N_BOOT, confidence=CONFIDENCE)
+    
+    # Dictionaries to store total speedup per thread and its interval (for error bars)
     total_speedup = {}
-    speedup_std_dev = {}  # Standard deviation for error bars
+    speedup_interval = {}
     
-    for t, df_t in sorted(average_data_by_thread.items()):
+    for i, t in enumerate(threads):
         if t == 1:
             continue
-        
-        # Filter the DataFrame for the same proportional step range
-        df_t_middle = df_t[
-            (df_t["step"] >= proportional_start) & 
-            (df_t["step"] <= proportional_end)
-        ]
-        
-        # Sum the times over the filtered range
-        total_time_t = df_t_middle["time"].sum()
-        
-        # Compute total speedup = single-thread time sum / time sum for t threads
-        total_speedup[t] = single_thread_middle["time"].sum() / total_time_t if total_time_t > 0 else 0
+        total_speedup[t] = speedup[i, 0]
+        speedup_interval[t] = (low[i, 0], high[i, 0])
     
     # Now plot this total speedup as a bar chart
     plt.figure(figsize=(10, 6))
@@ -223,7 +221,9 @@ def plot_total_speedup(average_data_by_thread):
     # Use a colormap for the bars
     colors = plt.cm.viridis(np.linspace(0, 1, len(threads)))
     
-    bars = plt.bar(threads, speedups, color=colors)
+    errors = np.array([[total_speedup[t] - speedup_interval[t][0] for t in threads],
+                       [speedup_interval[t][1] - total_speedup[t] for t in threads]])
+    bars = plt.bar(threads, speedups, color=colors, yerr=errors, capsize=4)
         
     # Add the red baseline at y=1
     plt.axhline(y=1, color='red', linestyle='--', label='Baseline (1×)')
@@ -241,17 +241,19 @@ def plot_total_speedup(average_data_by_thread):
     
     plt.xlabel("Thread Count")
     plt.ylabel("Total Speedup")
-    plt.title(f"Average Total Speedup (steps {proportional_start}–{proportional_end}, based on {TIME_COLUMN})")
+    plt.title(f"Total Speedup (steps {proportional_start}–{proportional_end}, "
+              f"{SPEEDUP_STATISTIC.replace('_', ' ')} of the trials, {CONFIDENCE:.0%} bootstrap CI, based on {TIME_COLUMN})")
     plt.legend()
     plt.grid(True, axis='y', alpha=0.3)
     plt.tight_layout()
     
-    output_file = os.path.join(OUTPUT_FOLDER, "avg_total_speedup.png")
+    output_file = os.path.join(output_folder, "avg_total_speedup.png")
     plt.savefig(output_file)
     plt.show(block=False)
+    plt.close()
     print(f"Saved total speedup plot to {output_file}")
 
-def plot_efficiency(average_data_by_thread):
+def plot_efficiency(average_data_by_thread, output_folder=OUTPUT_FOLDER):
     """Plot parallel efficiency as a bar chart."""
     if 1 not in average_data_by_thread:
         print("No single-thread (thread_count=1) data found; cannot compute efficiency.")
@@ -319,28 +321,42 @@ def plot_efficiency(average_data_by_thread):
     plt.grid(True, axis='y', alpha=0.3)
     plt.tight_layout()
     
-    output_file = os.path.join(OUTPUT_FOLDER, "avg_efficiency.png")
+    output_file = os.path.join(output_folder, "avg_efficiency.png")
     plt.savefig(output_file)
     plt.show(block=False)
+    plt.close()
     print(f"Saved efficiency plot to {output_file}")
 
-def main():
+def plot_benchmark(csv_files, logs, output_folder):
+    """All the plots of one benchmark folder, from its parsed logs."""
     # Group data by thread count
-    data_by_thread_list = group_data_by_thread_count()
+    data_by_thread_list = group_data_by_thread_count(csv_files, logs)
     
     if not data_by_thread_list:
-        print("No valid data found. Exiting.")
+        print("No valid data found.")
         return
     
+    os.makedirs(output_folder, exist_ok=True)
+    
     # Calculate average data for each thread count
     average_data_by_thread = calculate_average_data(data_by_thread_list)
     
+    # Stack the trials of all thread counts for the speedups and their confidence intervals
+    threads, steps, stack = stack_thread_trials(data_by_thread_list)
+    
     # Plot the results
-    plot_step_by_step_speedup(average_data_by_thread)
-    plot_total_speedup(average_data_by_thread)
-    #plot_efficiency(average_data_by_thread)
+    plot_step_by_step_speedup(threads, steps, stack, output_folder)
+    plot_total_speedup(average_data_by_thread, threads, steps, stack, output_folder)
+    #plot_efficiency(average_data_by_thread, output_folder)
     
-    print(f"All plots saved to {OUTPUT_FOLDER}")
+    print(f"All plots saved to {output_folder}")
+
+def main():
+    benchmark_folders = sys.argv[1:] or ["."]
+    # The logs of all the folders are read in one batch
+    for folder, (csv_files, logs) in read_benchmark_logs(benchmark_folders).items():
+        print(f"Benchmark folder {folder}")
+        plot_benchmark(csv_files, logs, os.path.join(folder, OUTPUT_FOLDER))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,51 +1,31 @@
 import os
 import re
-import glob
+import sys
+import fnmatch
 import pandas as pd
 import matplotlib.pyplot as plt
 
-def load_profiling_csv(filepath):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from log_reader import LOG_COLUMNS
+from log_store import TIME_COLUMNS, folder_frames
+
+def load_profiling_csv(rows):
     """
-    Lê um único arquivo CSV de log.
-    Pula todas as linhas até encontrar o cabeçalho:
-       step,update_time,display_time,total_time
+    Converte as linhas de um único arquivo CSV de log (DataFrame de folder_frames, com as linhas que seguem o
+    cabeçalho step,update_time,display_time,total_time).
     Retorna um DataFrame com as colunas:
        [ 'step', 'update_time', 'display_time', 'total_time' ]
     E converte de microsegundos (µs) para milissegundos (ms).
     """
-    rows = []
-    found_header = False
-    with open(filepath, 'r') as f:
-        for line in f:
-            line = line.strip()
-            # Detecta a linha "step,update_time,display_time,total_time"
-            if not found_header:
-                if line.startswith("step,"):
-                    found_header = True
-                continue  # Pula linhas até encontrar o cabeçalho
-            
-            # A partir daqui, lê as linhas de dados:
-            if line:
-                parts = line.split(',')
-                if len(parts) == 4:
-                    try:
-                        step = int(parts[0])
-                        update = float(parts[1])
-                        disp = float(parts[2])
-                        total = float(parts[3])
-                        rows.append((step, update, disp, total))
-                    except ValueError:
-                        # Caso algum valor não seja numérico, pula
-                        pass
-
-    df = pd.DataFrame(rows, columns=["step", "update_time", "display_time", "total_time"])
-    
+    df = rows[TIME_COLUMNS].set_axis(LOG_COLUMNS, axis=1).reset_index(drop=True)
+
     # Ignora a primeira linha (se houver mais de 1)
     if len(df) > 1:
         df = df.iloc[1:].reset_index(drop=True)
 
     # Converte de microsegundos para milissegundos
     if not df.empty:
+        df = df.astype({"update_time": float, "display_time": float, "total_time": float})
         df["update_time"] = df["update_time"] / 1000.0
         df["display_time"] = df["display_time"] / 1000.0
         df["total_time"] = df["total_time"] / 1000.0
@@ -55,7 +35,10 @@ def load_profiling_csv(filepath):
 def main():
     logs_folder = "logs"   # Pasta contendo os CSVs
     pattern = os.path.join(logs_folder, "rank*.csv")
-    csv_files = glob.glob(pattern)
+    # Lê todos os logs da pasta de uma vez pelo armazenamento projet/log_store.py
+    logs = folder_frames([logs_folder])[logs_folder]
+    csv_files = {path: rows for path, rows in logs.groupby("path", sort=False)
+                 if fnmatch.fnmatch(os.path.basename(path), "rank*.csv")}
 
     if not csv_files:
         print(f"Nenhum arquivo encontrado em: {pattern}")
@@ -71,14 +54,14 @@ def main():
     # Extrai o número do rank dos nomes de arquivos do tipo "rank<rank>.csv"
     rank_pattern = re.compile(r"rank(\d+)")
 
-    for filepath in csv_files:
+    for filepath, rows in csv_files.items():
         filename = os.path.basename(filepath)
         match = rank_pattern.search(filename)
         if not match:
             continue
         rank = int(match.group(1))
 
-        df = load_profiling_csv(filepath)
+        df = load_profiling_csv(rows)
         if df.empty:
             continue
 
@@ -17,41 +17,34 @@ no diretório atual e faz o seguinte em cada pasta:
 
 import os
 import re
+import sys
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from io import StringIO
 
-def read_csv_section(filepath):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from log_reader import LOG_COLUMNS
+from log_store import TIME_COLUMNS, folder_frames
+
+def read_csv_section(logs, filepath):
     """
-    Lê as linhas de `filepath` até encontrar o cabeçalho
-    'step,update_time,display_time,total_time'. Depois disso,
-    usa pandas.read_csv() para carregar (header + linhas subsequentes).
+    Linhas do arquivo `filepath` em `logs` ({caminho real: linhas}, de folder_frames: o armazenamento
+    projet/log_store.py lê cada log uma única vez com o leitor comum projet/log_reader.py,
+    busca do cabeçalho 'step,update_time,display_time,total_time' e leitura das linhas seguintes em int64).
 
     Retorna um DataFrame com colunas:
         step, update_time, display_time, total_time
     ou um DF vazio se não encontrar o cabeçalho.
     """
-    with open(filepath, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    header_index = None
-    for i, line in enumerate(lines):
-        if line.strip().startswith("step,update_time,display_time,total_time"):
-            header_index = i
-            break
-
-    if header_index is None:
+    rows = logs.get(os.path.realpath(filepath))
+    if rows is None:
         print(f"[AVISO] Cabeçalho não encontrado no arquivo: {filepath}")
-        return pd.DataFrame(columns=["step", "update_time", "display_time", "total_time"])
+        return pd.DataFrame(columns=LOG_COLUMNS)
+    return rows[TIME_COLUMNS].set_axis(LOG_COLUMNS, axis=1)
 
-    data_str = "".join(lines[header_index:])
-    df = pd.read_csv(StringIO(data_str))
-    return df
-
-def process_folder(dir_path):
+def process_folder(dir_path, rows):
     """
-    Executa o processo de:
+    Executa, com as linhas `rows` dos logs da pasta (DataFrame de folder_frames), o processo de:
       1) Achar arquivos sequenciais (sem 'rank' no nome) e rank0/rank1
       2) Ler e concatenar DataFrames -> agrupar por 'step' e tirar média
       3) Calcular total_time_mpi = update_time_mpi + display_time_mpi
@@ -60,6 +53,7 @@ def process_folder(dir_path):
       6) Retorna o DataFrame final de comparação (df_compare) ou vazio se falhar.
     """
     all_files = os.listdir(dir_path)
+    logs = {path: log_rows for path, log_rows in rows.groupby("path", sort=False)}
 
     seq_files   = [f for f in all_files if "rank" not in f]            # arquivos sequenciais
     rank0_files = [f for f in all_files if f.startswith("rank0")]      # rank0
@@ -68,7 +62,7 @@ def process_folder(dir_path):
     # Ler e agrupar SEQUENCIAIS
     seq_dfs = []
     for sf in seq_files:
-        df_raw = read_csv_section(os.path.join(dir_path, sf))
+        df_raw = read_csv_section(logs, os.path.join(dir_path, sf))
         if not df_raw.empty:
             df_seq = df_raw[["step","update_time","display_time","total_time"]].copy()
             seq_dfs.append(df_seq)
@@ -90,7 +84,7 @@ def process_folder(dir_path):
     # rank0 => só display_time => display_time_mpi
     r0_dfs = []
     for f0 in rank0_files:
-        df_raw = read_csv_section(os.path.join(dir_path, f0))
+        df_raw = read_csv_section(logs, os.path.join(dir_path, f0))
         if not df_raw.empty:
             df_r0 = df_raw[["step","display_time"]].copy()
             df_r0.rename(columns={"display_time":"display_time_mpi"}, inplace=True)
@@ -108,7 +102,7 @@ def process_folder(dir_path):
     # rank1 => só update_time => update_time_mpi
     r1_dfs = []
     for f1 in rank1_files:
-        df_raw = read_csv_section(os.path.join(dir_path, f1))
+        df_raw = read_csv_section(logs, os.path.join(dir_path, f1))
         if not df_raw.empty:
             df_r1 = df_raw[["step","update_time"]].copy()
             df_r1.rename(columns={"update_time":"update_time_mpi"}, inplace=True)
@@ -174,8 +168,9 @@ def extract_numeric(folder):
 def main():
     """
     1) Procura por todas as pastas que começam com 'benchmarkAnalysis_' no
-       diretório atual, chama process_folder(pasta) para cada uma e gera
-       os gráficos individuais (speedups vs step).
+       diretório atual, lê os logs de todas elas de uma vez, chama
+       process_folder(pasta, linhas) para cada uma e gera os gráficos
+       individuais (speedups vs step).
     2) Cria um gráfico de barras 'global_speedups.png' comparando as
        médias de speedup (update, display, total) de cada pasta, ordenadas
        de forma crescente de N, e com uma linha horizontal em y = 1.
@@ -188,10 +183,12 @@ def main():
         print("Não há pastas iniciando com 'benchmarkAnalysis_' aqui.")
         return
 
+    frames = folder_frames(dirs)
+
     results = []
     for d in dirs:
         print(f"\n>>> Processando pasta: {d}")
-        df_result = process_folder(d)
+        df_result = process_folder(d, frames[d])
         if df_result.empty:
             print(f"[AVISO] A pasta '{d}' não gerou dados válidos.\n")
             continue
@@ -3,84 +3,41 @@
 
 import os
 import re
-import glob
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from io import StringIO
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from log_reader import LOG_COLUMNS
+from log_store import TIME_COLUMNS, folder_frames
 
 ###############################################################################
 # Helper Functions
 ###############################################################################
 
-def read_csv_section(filepath):
-    """
-    Reads lines from `filepath` until finding the header
-    'step,update_time,display_time,total_time'. After that, uses
-    pandas.read_csv() to parse the data.
-
-    Returns a DataFrame with columns [step, update_time, display_time, total_time]
-    or an empty DF if the header was not found.
+def average_rank_logs(rows):
     """
-    if not os.path.isfile(filepath):
-        return pd.DataFrame(columns=["step", "update_time", "display_time", "total_time"])
-
-    with open(filepath, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    header_idx = None
-    for i, line in enumerate(lines):
-        if line.strip().startswith("step,update_time,display_time,total_time"):
-            header_idx = i
-            break
-
-    if header_idx is None:
-        return pd.DataFrame(columns=["step", "update_time", "display_time", "total_time"])
-
-    data_str = "".join(lines[header_idx:])
-    df = pd.read_csv(StringIO(data_str))
-    return df
-
-
-def average_rank_logs(logs_folder):
-    """
-    Inside `logs_folder`, we look for:
-      - rank0*.csv => display_time
-      - rank1*.csv => update_time
+    Averages the logs of one folder (frame of folder_frames):
+      - rank 0 => display_time
+      - rank 1 => update_time
     We average them by step and compute total_time = update + display.
 
     Returns a DataFrame with columns:
       [step, update_time, display_time, total_time]
     or empty if data is missing.
     """
-    if not os.path.isdir(logs_folder):
-        return pd.DataFrame()
-
-    rank0_files = glob.glob(os.path.join(logs_folder, "rank0*.csv"))
-    rank1_files = glob.glob(os.path.join(logs_folder, "rank1*.csv"))
-    if not rank0_files or not rank1_files:
-        return pd.DataFrame()  # missing logs
+    df_all = rows.rename(columns=dict(zip(TIME_COLUMNS, LOG_COLUMNS)))
 
     # Collect rank0 => display_time
-    r0_dfs = []
-    for f0 in rank0_files:
-        df0 = read_csv_section(f0)
-        if not df0.empty:
-            r0_dfs.append(df0[["step", "display_time"]])
+    df_r0_all = df_all[df_all["mpi_rank"] == 0]
 
     # Collect rank1 => update_time
-    r1_dfs = []
-    for f1 in rank1_files:
-        df1 = read_csv_section(f1)
-        if not df1.empty:
-            r1_dfs.append(df1[["step", "update_time"]])
+    df_r1_all = df_all[df_all["mpi_rank"] == 1]
 
-    if not r0_dfs or not r1_dfs:
+    if df_r0_all.empty or df_r1_all.empty:
         return pd.DataFrame()
 
-    df_r0_all = pd.concat(r0_dfs, ignore_index=True)
-    df_r1_all = pd.concat(r1_dfs, ignore_index=True)
-
     # Average times by step
     df_r0_avg = df_r0_all.groupby("step", as_index=False)["display_time"].mean()
     df_r1_avg = df_r1_all.groupby("step", as_index=False)["update_time"].mean()
@@ -135,16 +92,19 @@ def main():
         if d.startswith("benchmark_") and os.path.isdir(os.path.join(script_dir, d))
     ]
 
-    # 2) Build data_dict with keys = (N, T)
-    data_dict = {}
-
+    # 2) Build data_dict with keys = (N, T), from the logs of all the folders read in one batch
+    logs_folders = {}
     for folder_name in subfolders:
         N_val, T_val = parse_omp_folder_name(folder_name)
         if (N_val is not None) and (T_val is not None):
-            logs_folder = os.path.join(script_dir, folder_name, "logs")
-            df_times = average_rank_logs(logs_folder)
-            if not df_times.empty:
-                data_dict[(N_val, T_val)] = df_times
+            logs_folders[(N_val, T_val)] = os.path.join(script_dir, folder_name, "logs")
+    sections = folder_frames(list(logs_folders.values()))
+
+    data_dict = {}
+    for key, logs_folder in logs_folders.items():
+        df_times = average_rank_logs(sections[logs_folder])
+        if not df_times.empty:
+            data_dict[key] = df_times
 
     if not data_dict:
         print("[INFO] Aucun dossier 'benchmark_<N>_omp<T>/logs' contenant rank0/rank1 CSV n'a été trouvé.")
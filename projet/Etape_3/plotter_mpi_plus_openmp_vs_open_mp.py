@@ -3,70 +3,32 @@
 
 import os
 import re
-import glob
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from io import StringIO
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from log_reader import LOG_COLUMNS
+from log_store import TIME_COLUMNS, folder_frames
 
 ###############################################################################
 # Helper functions
 ###############################################################################
 
-def read_csv_section(filepath):
-    """
-    Reads lines from `filepath` until finding the header
-    'step,update_time,display_time,total_time'. After that, uses
-    pandas.read_csv() to parse the data.
-
-    Returns a DataFrame with columns:
-        step, update_time, display_time, total_time
-    or an empty DF if the header was not found.
-    """
-    if not os.path.isfile(filepath):
-        return pd.DataFrame(columns=["step", "update_time", "display_time", "total_time"])
-
-    with open(filepath, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    header_index = None
-    for i, line in enumerate(lines):
-        if line.strip().startswith("step,update_time,display_time,total_time"):
-            header_index = i
-            break
-
-    if header_index is None:
-        # Header not found
-        return pd.DataFrame(columns=["step", "update_time", "display_time", "total_time"])
-
-    data_str = "".join(lines[header_index:])
-    df = pd.read_csv(StringIO(data_str))
-    return df
-
-
-def average_non_mpi_logs(folder_with_logs):
+def average_non_mpi_logs(rows):
     """
-    Reads all .csv files in 'folder_with_logs' (non-MPI logs).
-    Aggregates them by averaging update_time, display_time, and total_time 
-    (grouped by step).
+    Averages the rows of the non-MPI logs of one folder (frame of folder_frames for the *.csv files)
+    by step: update_time, display_time, and total_time.
 
     Returns a DataFrame with columns:
         step, update_time, display_time, total_time  (averaged)
     or an empty DataFrame if not found.
     """
-    if not os.path.isdir(folder_with_logs):
-        return pd.DataFrame()
-
-    csv_files = glob.glob(os.path.join(folder_with_logs, "*.csv"))
-    dfs = []
-    for f in csv_files:
-        df = read_csv_section(f)
-        if not df.empty:
-            dfs.append(df)
-    if not dfs:
+    if rows.empty:
         return pd.DataFrame()
 
-    df_all = pd.concat(dfs, ignore_index=True)
+    df_all = rows.rename(columns=dict(zip(TIME_COLUMNS, LOG_COLUMNS)))
     df_avg = (
         df_all
         .groupby("step", as_index=False)[["update_time", "display_time", "total_time"]]
@@ -75,45 +37,29 @@ def average_non_mpi_logs(folder_with_logs):
     return df_avg
 
 
-def average_omp_logs(folder_with_logs):
+def average_omp_logs(rows):
     """
-    Reads rank0*.csv (display times) and rank1*.csv (update times) from 'folder_with_logs'
-    for the MPI+OpenMP run.
+    Averages the rank 0 (display times) and rank 1 (update times) logs of one folder of the
+    MPI+OpenMP run (frame of folder_frames).
 
     We average them separately and merge into a single DF with columns:
         step, update_time, display_time, total_time
 
     or an empty DataFrame if not found / incomplete.
     """
-    if not os.path.isdir(folder_with_logs):
-        return pd.DataFrame()
+    df_all = rows.rename(columns=dict(zip(TIME_COLUMNS, LOG_COLUMNS)))
+
+    # rank0 => display_time (keep only step and display_time)
+    df_r0_all = df_all[df_all["mpi_rank"] == 0]
 
-    # rank0 => display_time
-    rank0_files = glob.glob(os.path.join(folder_with_logs, "rank0*.csv"))
-    r0_dfs = []
-    for f0 in rank0_files:
-        df_r0 = read_csv_section(f0)
-        if not df_r0.empty:
-            # keep only step and display_time
-            r0_dfs.append(df_r0[["step","display_time"]])
-
-    # rank1 => update_time
-    rank1_files = glob.glob(os.path.join(folder_with_logs, "rank1*.csv"))
-    r1_dfs = []
-    for f1 in rank1_files:
-        df_r1 = read_csv_section(f1)
-        if not df_r1.empty:
-            # keep only step and update_time
-            r1_dfs.append(df_r1[["step","update_time"]])
-
-    if not r0_dfs or not r1_dfs:
+    # rank1 => update_time (keep only step and update_time)
+    df_r1_all = df_all[df_all["mpi_rank"] == 1]
+
+    if df_r0_all.empty or df_r1_all.empty:
         # If we can't find logs for rank0 or rank1, no data.
         return pd.DataFrame()
 
-    df_r0_all = pd.concat(r0_dfs, ignore_index=True)
     df_r0_avg = df_r0_all.groupby("step", as_index=False)["display_time"].mean()
-
-    df_r1_all = pd.concat(r1_dfs, ignore_index=True)
     df_r1_avg = df_r1_all.groupby("step", as_index=False)["update_time"].mean()
 
     # Merge and define total_time
@@ -160,68 +106,72 @@ def main():
     non_mpi_base_path = os.path.join(script_dir, "..", "Etape_1", "benchmarks")
     omp_base_path     = script_dir  # current directory for OMP logs
 
-    # We'll store each baseline in a dict { N: DataFrame_of_averaged_times }
-    baseline_dict = {}
-
-    # 1) Gather baseline (non-MPI) logs from ../Etape_1/benchmarks/benchmark_<N>/logs
-    #    e.g.: .../benchmark_50/logs/*.csv
+    # Baseline (non-MPI) logs: ../Etape_1/benchmarks/benchmark_<N>/logs/*.csv
+    baseline_folders = {}
     for folder_name in os.listdir(non_mpi_base_path):
         if folder_name.startswith("benchmark_"):
             N_val = extract_N_from_name(folder_name)
-            if N_val is None:
-                continue  # skip if we can't parse N
-
-            # Inside this folder, there's a "logs" subfolder
-            logs_path = os.path.join(non_mpi_base_path, folder_name, "logs")
-            df_base = average_non_mpi_logs(logs_path)
-            if not df_base.empty:
-                baseline_dict[N_val] = df_base
+            if N_val is not None:  # skip if we can't parse N
+                baseline_folders[N_val] = os.path.join(non_mpi_base_path, folder_name, "logs")
 
-    # 2) For the hybrid logs, we parse the local "Etape_3" folder for "benchmark_<N>_omp<T>"
-    results = []
+    # Hybrid logs: local "Etape_3" folders "benchmark_<N>_omp<T>/logs"
+    omp_folders = {}
     for folder_name in os.listdir(omp_base_path):
         if folder_name.startswith("benchmark_"):
             N_val = extract_N_from_name(folder_name)
             T_val = extract_threads_from_name(folder_name)
             if N_val is not None and T_val is not None:
-                # We'll look for logs in <folder>/logs
-                logs_path = os.path.join(omp_base_path, folder_name, "logs")
-                df_omp = average_omp_logs(logs_path)
-                if not df_omp.empty and (N_val in baseline_dict):
-                    # Compare with baseline for the same N
-                    df_base = baseline_dict[N_val]
-
-                    # Merge on step
-                    df_compare = pd.merge(
-                        df_base,
-                        df_omp,
-                        on="step",
-                        suffixes=("_base", "_omp"),
-                        how="inner"
-                    )
-                    if not df_compare.empty:
-                        # speedup = base_time / omp_time
-                        df_compare["update_speedup"] = (
-                            df_compare["update_time_base"] / df_compare["update_time_omp"]
-                        )
-                        df_compare["display_speedup"] = (
-                            df_compare["display_time_base"] / df_compare["display_time_omp"]
-                        )
-                        df_compare["total_speedup"] = (
-                            df_compare["total_time_base"] / df_compare["total_time_omp"]
-                        )
-
-                        avg_update_speedup  = df_compare["update_speedup"].mean()
-                        avg_display_speedup = df_compare["display_speedup"].mean()
-                        avg_total_speedup   = df_compare["total_speedup"].mean()
-
-                        results.append({
-                            "N": N_val,
-                            "threads": T_val,
-                            "avg_update_speedup":  avg_update_speedup,
-                            "avg_display_speedup": avg_display_speedup,
-                            "avg_total_speedup":   avg_total_speedup
-                        })
+                omp_folders[(N_val, T_val)] = os.path.join(omp_base_path, folder_name, "logs")
+
+    # All the logs of both trees are read in one batch
+    sections = folder_frames(list(baseline_folders.values()) + list(omp_folders.values()))
+
+    # 1) Baselines in a dict { N: DataFrame_of_averaged_times }
+    baseline_dict = {}
+    for N_val, logs_path in baseline_folders.items():
+        df_base = average_non_mpi_logs(sections[logs_path])
+        if not df_base.empty:
+            baseline_dict[N_val] = df_base
+
+    # 2) Compare the hybrid runs with the baseline of their N
+    results = []
+    for (N_val, T_val), logs_path in omp_folders.items():
+        df_omp = average_omp_logs(sections[logs_path])
+        if not df_omp.empty and (N_val in baseline_dict):
+            # Compare with baseline for the same N
+            df_base = baseline_dict[N_val]
+
+            # Merge on step
+            df_compare = pd.merge(
+                df_base,
+                df_omp,
+                on="step",
+                suffixes=("_base", "_omp"),
+                how="inner"
+            )
+            if not df_compare.empty:
+                # speedup = base_time / omp_time
+                df_compare["update_speedup"] = (
+                    df_compare["update_time_base"] / df_compare["update_time_omp"]
+                )
+                df_compare["display_speedup"] = (
+                    df_compare["display_time_base"] / df_compare["display_time_omp"]
+                )
+                df_compare["total_speedup"] = (
+                    df_compare["total_time_base"] / df_compare["total_time_omp"]
+                )
+
+                avg_update_speedup  = df_compare["update_speedup"].mean()
+                avg_display_speedup = df_compare["display_speedup"].mean()
+                avg_total_speedup   = df_compare["total_speedup"].mean()
+
+                results.append({
+                    "N": N_val,
+                    "threads": T_val,
+                    "avg_update_speedup":  avg_update_speedup,
+                    "avg_display_speedup": avg_display_speedup,
+                    "avg_total_speedup":   avg_total_speedup
+                })
 
     # 3) Create a DataFrame of results
     df_speedups = pd.DataFrame(results)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark driver for the MPI + OpenMP simulation (replaces the loops of run_simulation.sh).
+
+The sweep is described by a JSON or TOML config file (see benchmarks.json):
+
+    build_command   command run once before the sweep (e.g. ["cmake", "--build", "build"]), optional
+    launcher        command prefix of every run, e.g. ["mpirun", "-np", "{mpi_procs}", "--bind-to", "none"]
+    executable      simulation executable (stub_simulation.py stands in for it to test the driver)
+    args            arguments of the executable; "{N}", "{half_N}", "{omp_threads}", "{trial}" are substituted
+    mpi_procs       number of MPI processes of every run
+    grid            {"N": [...], "omp_threads": [...]}: every combination is a configuration
+    trials          number of runs of each configuration
+    max_parallel    number of runs executed at the same time
+    pin_cpus        give every run its own set of mpi_procs * omp_threads CPUs (through taskset)
+    plot_commands   commands run once, at the end of the sweep, from the folder of the config file ("{python}" is
+                    replaced by the interpreter running the driver)
+
+Every trial runs in its own working directory <config>/.trial<i>/build, so the profiler (which writes to ../logs)
+cannot mix the files of concurrent runs. When a trial succeeds its logs are moved to <config>/logs, where the
+plotters look for them, ingested into the projet/log_store.py store, and the trial is recorded in
+benchmark_state.json. Running the driver again resumes the sweep: recorded trials are skipped and the unfinished
+ones start again from a clean directory.
+
+The results go to the folder of the config file unless --output-dir is given (the plotters read the
+benchmark_<N>_omp<T> folders next to them).
+
+Usage:
+    python run_benchmarks.py benchmarks.json [--output-dir DIR] [--max-parallel P] [--no-plot]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from log_store import LogStore
+
+STATE_FILE = "benchmark_state.json"
+
+DEFAULT_CONFIG = {
+    "build_command": None,
+    "launcher": ["mpirun", "-np", "{mpi_procs}", "--bind-to", "none"],
+    "executable": "./simulation.exe",
+    "args": ["-n", "{N}", "-s", "{half_N},{half_N}"],
+    "mpi_procs": 2,
+    "grid": {"N": [50, 100, 200, 400], "omp_threads": [1, 2, 4, 6, 10]},
+    "trials": 5,
+    "max_parallel": 1,
+    "pin_cpus": False,
+    "plot_commands": [],
+}
+
+
+def load_config(path):
+    """Read the JSON or TOML (.toml) config file and fill in the defaults."""
+    if path.endswith(".toml"):
+        import tomllib
+        with open(path, "rb") as f:
+            config = tomllib.load(f)
+    else:
+        with open(path) as f:
+            config = json.load(f)
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown config keys in {path}: {', '.join(sorted(unknown))}")
+    return {**DEFAULT_CONFIG, **config}
+
+
+def config_dir(N, omp_threads):
+    """Folder of a configuration, with the name the plotters expect."""
+    return f"benchmark_{N}_omp{omp_threads}"
+
+
+def trial_key(N, omp_threads, trial):
+    return f"{config_dir(N, omp_threads)}/trial{trial}"
+
+
+def trial_command(config, N, omp_threads, trial, cpus):
+    """Command line of one run (pinned to `cpus` if given)."""
+    fields = {"N": N, "half_N": N // 2, "omp_threads": omp_threads, "trial": trial,
+              "mpi_procs": config["mpi_procs"]}
+    command = [str(part).format(**fields) for part in config["launcher"]]
+    command.append(os.path.abspath(config["executable"]))
+    command += [str(part).format(**fields) for part in config["args"]]
+    if cpus is not None:
+        command = ["taskset", "-c", ",".join(map(str, cpus))] + command
+    return command
+
+
+class SweepState:
+    """Completed trials of the sweep, saved after each of them so an interrupted sweep can be resumed."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.trials = {}
+        if os.path.isfile(path):
+            with open(path) as f:
+                self.trials = json.load(f)["trials"]
+
+    def done(self, key):
+        return self.trials.get(key, {}).get("status") == "done"
+
+    def record(self, key, record):
+        with self.lock:
+            self.trials[key] = record
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"trials": self.trials}, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+class CpuPool:
+    """Hands out disjoint sets of CPUs to the runs in progress (a run waits until enough CPUs are free)."""
+
+    def __init__(self, cpus):
+        self.cpus = sorted(cpus)
+        self.free = list(self.cpus)
+        self.condition = threading.Condition()
+
+    def acquire(self, count):
+        # A run asking for more CPUs than the machine has gets all of them
+        count = min(count, len(self.cpus))
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.free) >= count)
+            cpus, self.free = self.free[:count], self.free[count:]
+            return cpus
+
+    def release(self, cpus):
+        with self.condition:
+            self.free = sorted(self.free + cpus)
+            self.condition.notify_all()
+
+
+class Sweep:
+    def __init__(self, config, output_dir, store=None):
+        self.config = config
+        self.output_dir = output_dir
+        self.state = SweepState(os.path.join(output_dir, STATE_FILE))
+        self.store = store or LogStore()
+        self.store_lock = threading.Lock()
+        self.cpu_pool = CpuPool(os.sched_getaffinity(0)) if config["pin_cpus"] else None
+        self.processes = set()
+        self.processes_lock = threading.Lock()
+        self.interrupted = False
+
+    def trials(self):
+        grid = self.config["grid"]
+        for N, omp_threads in itertools.product(grid["N"], grid["omp_threads"]):
+            for trial in range(1, self.config["trials"] + 1):
+                yield N, omp_threads, trial
+
+    def run_trial(self, N, omp_threads, trial):
+        """Run one trial in a fresh working directory and, if it succeeds, publish its logs."""
+        key = trial_key(N, omp_threads, trial)
+        bench_dir = os.path.join(self.output_dir, config_dir(N, omp_threads))
+        trial_dir = os.path.join(bench_dir, f".trial{trial}")
+        shutil.rmtree(trial_dir, ignore_errors=True)
+        work_dir = os.path.join(trial_dir, "build")
+        os.makedirs(work_dir)
+
+        cpus = self.cpu_pool.acquire(self.config["mpi_procs"] * omp_threads) if self.cpu_pool else None
+        command = trial_command(self.config, N, omp_threads, trial, cpus)
+        env = dict(os.environ, OMP_NUM_THREADS=str(omp_threads))
+        start = time.perf_counter()
+        error = None
+        try:
+            with open(os.path.join(trial_dir, "output.txt"), "w") as output:
+                # No run may start once the sweep has been interrupted
+                with self.processes_lock:
+                    if self.interrupted:
+                        return key, {"status": "interrupted"}
+                    try:
+                        process = subprocess.Popen(command, cwd=work_dir, env=env, stdout=output,
+                                                   stderr=subprocess.STDOUT, start_new_session=True)
+                    except OSError as exception:
+                        # Launcher or executable missing (taskset, mpirun, ...): a failed trial, not a failed sweep
+                        error = str(exception)
+                        output.write(error + "\n")
+                    else:
+                        self.processes.add(process)
+                if error is None:
+                    returncode = process.wait()
+                    with self.processes_lock:
+                        self.processes.discard(process)
+                else:
+                    returncode = None
+        finally:
+            if cpus is not None:
+                self.cpu_pool.release(cpus)
+        elapsed = time.perf_counter() - start
+
+        record = {"N": N, "omp_threads": omp_threads, "trial": trial, "command": command, "cpus": cpus,
+                  "returncode": returncode, "elapsed_s": round(elapsed, 3)}
+        if self.interrupted:
+            return key, record
+        if returncode != 0:
+            record["status"] = "failed"
+            if error is not None:
+                record["error"] = error
+            record["output"] = os.path.relpath(os.path.join(trial_dir, "output.txt"), self.output_dir)
+            self.state.record(key, record)
+            return key, record
+
+        # Publish the logs where the plotters read them, then store them
+        logs_dir = os.path.join(bench_dir, "logs")
+        os.makedirs(logs_dir, exist_ok=True)
+        published = []
+        trial_logs = os.path.join(trial_dir, "logs")
+        for name in sorted(os.listdir(trial_logs)) if os.path.isdir(trial_logs) else []:
+            target = os.path.join(logs_dir, name)
+            if os.path.exists(target):
+                # Two trials started in the same second: keep both files
+                base, extension = os.path.splitext(name)
+                target = os.path.join(logs_dir, f"{base}-trial{trial}{extension}")
+            os.replace(os.path.join(trial_logs, name), target)
+            published.append(target)
+        with self.store_lock:
+            self.store.ingest(published)
+        shutil.rmtree(trial_dir, ignore_errors=True)
+
+        record["status"] = "done"
+        record["logs"] = [os.path.relpath(path, self.output_dir) for path in published]
+        self.state.record(key, record)
+        return key, record
+
+    def run(self, max_parallel):
+        pending = [t for t in self.trials() if not self.state.done(trial_key(*t))]
+        total = len(pending) + sum(1 for t in self.trials() if self.state.done(trial_key(*t)))
+        print(f"{total - len(pending)} of {total} trials already done, {len(pending)} to run "
+              f"({max_parallel} at a time)")
+
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+            futures = [pool.submit(self.run_trial, *t) for t in pending]
+            try:
+                for count, future in enumerate(as_completed(futures), 1):
+                    key, record = future.result()
+                    failed += record["status"] == "failed"
+                    print(f"[{count}/{len(pending)}] {key}: {record['status']} in {record['elapsed_s']:.1f} s")
+            except KeyboardInterrupt:
+                print("Sweep interrupted, stopping the runs in progress...")
+                for future in futures:
+                    future.cancel()
+                with self.processes_lock:
+                    self.interrupted = True
+                    for process in self.processes:
+                        os.killpg(process.pid, signal.SIGTERM)
+                raise
+        return failed
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Run the MPI + OpenMP benchmark sweep described by a config file")
+    parser.add_argument("config", help="JSON or TOML file describing the sweep")
+    parser.add_argument("--output-dir",
+                        help="folder of the benchmark_<N>_omp<T> results (default: folder of the config file)")
+    parser.add_argument("--max-parallel", type=int, help="overrides max_parallel of the config")
+    parser.add_argument("--no-plot", action="store_true", help="do not run the plot commands at the end")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    config = load_config(args.config)
+    config_dir_path = os.path.dirname(os.path.abspath(args.config))
+    output_dir = os.path.abspath(args.output_dir or config_dir_path)
+
+    if config["build_command"]:
+        print("Compiling the project...")
+        subprocess.run(config["build_command"], cwd=config_dir_path, check=True)
+    # Paths of the config are relative to the config file
+    config["executable"] = os.path.join(config_dir_path, config["executable"])
+    if not os.path.isfile(config["executable"]):
+        sys.exit(f"Error: {config['executable']} not found!")
+
+    try:
+        failed = Sweep(config, output_dir).run(args.max_parallel or config["max_parallel"])
+    except KeyboardInterrupt:
+        sys.exit("Sweep interrupted, run again to resume it")
+    if failed:
+        sys.exit(f"{failed} trials failed (see benchmark_state.json), run again to retry them")
+
+    if not args.no_plot:
+        for command in config["plot_commands"]:
+            command = [part.replace("{python}", sys.executable) for part in command]
+            print(f"Running {' '.join(command)}...")
+            subprocess.run(command, cwd=config_dir_path, check=True)
+    print("Process completed!")
+
+
+if __name__ == "__main__":
+    main()
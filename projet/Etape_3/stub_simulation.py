@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stand-in for simulation.exe to test run_benchmarks.py without compiling nor running the simulation.
+
+It takes the same -n N and -s COL,ROW arguments and writes, like the Profiler of profiler.hpp, one log
+../logs/rank<r>-<HH-MM-SS-DD-MM-YYYY>.csv per process (rank and size from mpirun, rank 0 of 1 without it) with
+--steps lines of made-up times. It exits with status 1 without writing any log when STUB_SIMULATION_FAIL holds
+"<N>:<omp_threads>" for its configuration (several configurations separated by spaces).
+
+Usage (in a config file):
+    "launcher": [], "executable": "stub_simulation.py", "args": ["-n", "{N}", "-s", "{half_N},{half_N}"]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Stub of the simulation writing profiler-style logs")
+    parser.add_argument("-n", type=int, default=100, help="number of cells per direction")
+    parser.add_argument("-s", default=None, help="COL,ROW of the initial fire (ignored)")
+    parser.add_argument("--steps", type=int, default=20, help="number of steps logged")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    omp_threads = int(os.environ.get("OMP_NUM_THREADS", "1"))
+    if f"{args.n}:{omp_threads}" in os.environ.get("STUB_SIMULATION_FAIL", "").split():
+        sys.exit(f"Stub failure for N={args.n}, {omp_threads} OpenMP threads")
+    rank = int(os.environ.get("OMPI_COMM_WORLD_RANK", os.environ.get("PMI_RANK", "0")))
+    size = int(os.environ.get("OMPI_COMM_WORLD_SIZE", os.environ.get("PMI_SIZE", "1")))
+
+    os.makedirs("../logs", exist_ok=True)
+    filename = f"../logs/rank{rank}-{time.strftime('%H-%M-%S-%d-%m-%Y')}.csv"
+    with open(filename, "w") as log:
+        log.write(f"Profiling data for rank {rank} of {size}\n")
+        log.write(f"OpenMP threads: {omp_threads}\n")
+        log.write("step,update_time,display_time,total_time\n")
+        for step in range(args.steps):
+            # Times in µs, decreasing with the number of threads
+            update_time = args.n * args.n // omp_threads + step
+            display_time = 400 + step % 7
+            log.write(f"{step},{update_time},{display_time},{update_time + display_time + 3}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Test of run_benchmarks.py on a 2 x 2 sweep of stub_simulation.py: a configuration that fails, the resumed sweep
+that reruns only its trials, and the logs published to benchmark_<N>_omp<T>/logs and to the store.
+
+Run from projet/Etape_3:
+
+    python -m pytest test_run_benchmarks.py    (or python test_run_benchmarks.py)
+"""
+
+import glob
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run_benchmarks import DEFAULT_CONFIG, STATE_FILE, Sweep
+from log_store import LogStore
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_simulation.py")
+
+
+class SweepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.tmp.name, "results")
+        os.makedirs(self.output_dir)
+        self.config = {**DEFAULT_CONFIG, "launcher": [sys.executable], "executable": STUB,
+                       "args": ["-n", "{N}", "-s", "{half_N},{half_N}", "--steps", "10"],
+                       "mpi_procs": 1, "grid": {"N": [20, 40], "omp_threads": [1, 2]}, "trials": 2}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sweep(self):
+        return Sweep(dict(self.config), self.output_dir, LogStore(os.path.join(self.tmp.name, "store")))
+
+    def state(self):
+        with open(os.path.join(self.output_dir, STATE_FILE)) as f:
+            return json.load(f)["trials"]
+
+    def logs(self, name):
+        return sorted(glob.glob(os.path.join(self.output_dir, name, "logs", "*.csv")))
+
+    def test_failure_resume_and_publishing(self):
+        with mock.patch.dict(os.environ, {"STUB_SIMULATION_FAIL": "40:2"}):
+            self.assertEqual(self.sweep().run(max_parallel=2), 2)
+        state = self.state()
+        failed = sorted(key for key, record in state.items() if record["status"] == "failed")
+        self.assertEqual(failed, ["benchmark_40_omp2/trial1", "benchmark_40_omp2/trial2"])
+        self.assertEqual(sum(record["status"] == "done" for record in state.values()), 6)
+        self.assertEqual(self.logs("benchmark_40_omp2"), [])
+        done_logs = {name: self.logs(name) for name in ["benchmark_20_omp1", "benchmark_20_omp2", "benchmark_40_omp1"]}
+        for name, logs in done_logs.items():
+            self.assertEqual(len(logs), 2, name)
+        # The failed trials keep their output, the others leave no working directory behind
+        self.assertTrue(os.path.isfile(os.path.join(self.output_dir, state[failed[0]]["output"])))
+        self.assertEqual(glob.glob(os.path.join(self.output_dir, "benchmark_20_omp1", ".trial*")), [])
+
+        # Resumed sweep: only the two failed trials run again
+        sweep = self.sweep()
+        self.assertEqual(sweep.run(max_parallel=2), 0)
+        state = self.state()
+        self.assertTrue(all(record["status"] == "done" for record in state.values()))
+        self.assertEqual(len(state), 8)
+        self.assertEqual(len(self.logs("benchmark_40_omp2")), 2)
+        for name, logs in done_logs.items():
+            self.assertEqual(self.logs(name), logs)
+
+        # Every published log is in the store, with the metadata of its configuration
+        table = sweep.store.query([self.output_dir])
+        self.assertEqual(table["run_id"].nunique(), 8)
+        self.assertEqual(len(table), 8 * 10)
+        runs = table.groupby("run_id").first()
+        self.assertEqual(sorted(runs.groupby(["N", "omp_threads"]).size().items()),
+                         [((20, 1), 2), ((20, 2), 2), ((40, 1), 2), ((40, 2), 2)])
+
+    def test_missing_launcher_is_a_failed_trial(self):
+        self.config["launcher"] = [os.path.join(self.tmp.name, "no_such_launcher")]
+        self.assertEqual(self.sweep().run(max_parallel=2), 8)
+        state = self.state()
+        self.assertTrue(all(record["status"] == "failed" and "error" in record for record in state.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
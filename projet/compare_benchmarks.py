@@ -0,0 +1,154 @@
+"""
+Compare two benchmark sweeps and flag the significant speedups and regressions.
+
+Each result set is a folder holding profiling logs at any depth (e.g. Etape_3, or a copy of it made before a change
+to model.cpp). Its logs are ingested into the projet/log_store.py store, and every run is summarized by the median
+of one time column over its steps (step 0, which includes the start-up, is skipped by default). Runs are grouped by
+configuration (N, omp_threads, mpi_size) and, for the configurations present in both sets, the run times of the
+baseline and of the candidate are compared with:
+
+    - Welch's t-test and the Mann-Whitney U test (two-sided),
+    - Hedges' g (standardized difference of the means, positive when the candidate is slower),
+    - Cliff's delta (P(candidate > baseline) - P(candidate < baseline), from the U statistic),
+    - the change of the median run time and the corresponding speedup (baseline / candidate).
+
+A configuration is significantly faster or slower when the Mann-Whitney p-value is below --alpha. The exit status is 1
+when a configuration is significantly slower by more than --threshold, so the comparison can gate a change:
+
+    python compare_benchmarks.py baseline/Etape_3 Etape_3 --threshold 0.05
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from log_store import LogStore
+
+CONFIG_COLUMNS = ["N", "omp_threads", "mpi_size"]
+
+
+def run_times(store, folder, column="total_us", mpi_rank=0, skip_steps=1):
+    """
+    Median of `column` over the steps of every run found below `folder` (runs of rank `mpi_rank` only). Only the
+    logs present in `folder` now are queried, not the runs the store still has for deleted or replaced ones.
+    Returns a DataFrame with the columns CONFIG_COLUMNS + ["run_id", "time_us"].
+    """
+    files = glob.glob(os.path.join(folder, "**", "*.csv"), recursive=True)
+    store.ingest(files)
+    table = store.query(files, mpi_rank=mpi_rank)
+    table = table[table["step"] >= skip_steps]
+    times = table.groupby(CONFIG_COLUMNS + ["run_id"], as_index=False)[column].median()
+    return times.rename(columns={column: "time_us"})
+
+
+def hedges_g(baseline, candidate):
+    """Bias-corrected standardized mean difference (candidate - baseline) / pooled std."""
+    n1, n2 = len(baseline), len(candidate)
+    pooled = np.sqrt(((n1 - 1) * np.var(baseline, ddof=1) + (n2 - 1) * np.var(candidate, ddof=1)) / (n1 + n2 - 2))
+    if pooled == 0:
+        return 0.0
+    correction = 1 - 3 / (4 * (n1 + n2) - 9)
+    return correction * (np.mean(candidate) - np.mean(baseline)) / pooled
+
+
+def compare_configuration(baseline, candidate):
+    """Statistics of one configuration (arrays of run times of both sets, at least 2 runs each)."""
+    base_median, cand_median = np.median(baseline), np.median(candidate)
+    welch = stats.ttest_ind(candidate, baseline, equal_var=False)
+    mann_whitney = stats.mannwhitneyu(candidate, baseline, alternative="two-sided")
+    return {
+        "n_base": len(baseline),
+        "n_cand": len(candidate),
+        "base_median_us": base_median,
+        "cand_median_us": cand_median,
+        "change": cand_median / base_median - 1,
+        "speedup": base_median / cand_median,
+        "welch_p": welch.pvalue,
+        "mw_p": mann_whitney.pvalue,
+        "hedges_g": hedges_g(baseline, candidate),
+        "cliffs_delta": 2 * mann_whitney.statistic / (len(baseline) * len(candidate)) - 1,
+    }
+
+
+def compare(base_times, cand_times, alpha=0.05, threshold=0.05):
+    """
+    Align the run times of both sets on CONFIG_COLUMNS and compare every common configuration.
+    The `verdict` column is "slower", "faster" or "" (no significant change); `regression` marks the slower
+    configurations whose median time grew by more than `threshold`.
+    """
+    rows = []
+    base_groups = dict(list(base_times.groupby(CONFIG_COLUMNS)["time_us"]))
+    for config, candidate in cand_times.groupby(CONFIG_COLUMNS)["time_us"]:
+        baseline = base_groups.get(config)
+        if baseline is None or len(baseline) < 2 or len(candidate) < 2:
+            continue
+        rows.append({**dict(zip(CONFIG_COLUMNS, config)),
+                     **compare_configuration(baseline.to_numpy(float), candidate.to_numpy(float))})
+
+    result = pd.DataFrame(rows, columns=CONFIG_COLUMNS + ["n_base", "n_cand", "base_median_us", "cand_median_us",
+                                                          "change", "speedup", "welch_p", "mw_p", "hedges_g",
+                                                          "cliffs_delta"])
+    significant = result["mw_p"] < alpha
+    result["verdict"] = np.where(significant & (result["change"] > 0), "slower",
+                                 np.where(significant & (result["change"] < 0), "faster", ""))
+    result["regression"] = (result["verdict"] == "slower") & (result["change"] > threshold)
+    return result
+
+
+def configurations(times):
+    return set(times[CONFIG_COLUMNS].itertuples(index=False, name=None))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Compare two benchmark sweeps (folders of profiling logs)")
+    parser.add_argument("baseline", help="folder of the reference sweep")
+    parser.add_argument("candidate", help="folder of the sweep to check")
+    parser.add_argument("--column", default="total_us", choices=["update_us", "display_us", "total_us"],
+                        help="time compared")
+    parser.add_argument("--rank", type=int, default=0, help="MPI rank whose logs are compared")
+    parser.add_argument("--skip-steps", type=int, default=1, help="steps ignored at the start of every run")
+    parser.add_argument("--alpha", type=float, default=0.05, help="significance level of the Mann-Whitney test")
+    parser.add_argument("--threshold", type=float, default=0.05,
+                        help="relative slowdown of the median above which a significant change is a regression")
+    parser.add_argument("--all", action="store_true", help="also print the configurations without significant change")
+    parser.add_argument("--output", help="write the full comparison to this CSV file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    store = LogStore()
+    base_times = run_times(store, args.baseline, args.column, args.rank, args.skip_steps)
+    cand_times = run_times(store, args.candidate, args.column, args.rank, args.skip_steps)
+    result = compare(base_times, cand_times, args.alpha, args.threshold)
+
+    unmatched = len(configurations(base_times) ^ configurations(cand_times))
+    print(f"{len(result)} configurations compared on {args.column} (rank {args.rank}), "
+          f"{unmatched} present in a single sweep")
+
+    if args.output:
+        result.to_csv(args.output, index=False)
+        print(f"Comparison written to {args.output}")
+
+    shown = result if args.all else result[result["verdict"] != ""]
+    if shown.empty:
+        print("No significant change.")
+    else:
+        print(shown.to_string(index=False, formatters={
+            "base_median_us": "{:.0f}".format, "cand_median_us": "{:.0f}".format,
+            "change": "{:+.1%}".format, "speedup": "{:.3f}".format, "welch_p": "{:.3g}".format,
+            "mw_p": "{:.3g}".format, "hedges_g": "{:+.2f}".format, "cliffs_delta": "{:+.2f}".format}))
+
+    regressions = result[result["regression"]]
+    if not regressions.empty:
+        print(f"{len(regressions)} regressions beyond {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Python reference engine of the forest-fire model (Etape_3/model.cpp), for what-if studies without SDL, MPI or the
+C++ toolchain. See model.py for the update order, the reproducibility guarantees and the sparse / dense engines
+(python -m firemodel.benchmark times them).
+
+    import sys, os
+    sys.path.insert(0, "path/to/projet")
+    from firemodel import Model
+
+    model = Model(1.0, 100, (0., 0.), (50, 50))
+    while model.update():
+        pass
+"""
+
+from .model import DENSE_DENSITY, ENGINES, LOG_FACTOR, Model, log_factor, pseudo_random
+
+__all__ = ["DENSE_DENSITY", "ENGINES", "LOG_FACTOR", "Model", "log_factor", "pseudo_random"]
@@ -0,0 +1,133 @@
+"""
+Crossover between the sparse and dense engines of firemodel.Model.
+
+For every grid size, a fire started at the centre runs to extinction. At about `--samples` regularly spaced steps
+the state is copied and one step is timed with each engine (best of `--repeat`), together with the size of the
+front, the area of its bounding box and the front density (see Model.front_density). The samples go to a CSV file,
+and for every grid size the density threshold that best separates the steps where the dense engine is faster is
+printed: it is the value to give to DENSE_DENSITY.
+
+Run from projet/:
+
+    python -m firemodel.benchmark --sizes 50 100 200 400 1000 --output engines.csv --plot engines.png
+"""
+
+import argparse
+import copy
+import time
+
+import numpy as np
+import pandas as pd
+
+from .model import DENSE_DENSITY, Model
+
+SIZES = [50, 100, 200, 400, 700, 1000]
+
+
+def time_step(model, engine, repeat):
+    """Best time in ms of one update of a copy of `model` with `engine`."""
+    best = float("inf")
+    for _ in range(repeat):
+        trial = copy.deepcopy(model)
+        trial.engine = engine
+        start = time.perf_counter()
+        trial.update()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def sample_run(n, wind=(0., 0.), stride=None, samples=40, repeat=3):
+    """Samples of one run of size n (about `samples` of them when `stride` is None)."""
+    model = Model(1., n, wind, (n // 2, n // 2))
+    # Runs last about 500 + 1.3 n steps without wind
+    stride = stride or max(1, (500 + 13 * n // 10) // samples)
+    rows = []
+    running = True
+    while running:
+        if model.time_step % stride == 0:
+            rows_window, columns_window = model.front_window()
+            rows.append({
+                "N": n,
+                "step": model.time_step,
+                "front": len(model.front),
+                "window": (rows_window.stop - rows_window.start) * (columns_window.stop - columns_window.start),
+                "density": model.front_density(),
+                "sparse_ms": time_step(model, "sparse", repeat),
+                "dense_ms": time_step(model, "dense", repeat),
+            })
+        running = model.update()
+    return rows
+
+
+def crossover(samples):
+    """
+    Density threshold minimizing the number of samples for which the threshold rule picks the slower engine
+    (midpoint between two consecutive sample densities).
+    """
+    samples = samples.sort_values("density")
+    density = samples["density"].to_numpy()
+    dense_faster = (samples["dense_ms"] < samples["sparse_ms"]).to_numpy()
+    # errors[i]: threshold between sample i-1 and sample i (sparse below, dense from sample i on)
+    errors = (np.concatenate([[0], np.cumsum(dense_faster)])
+              + np.concatenate([np.cumsum((~dense_faster)[::-1])[::-1], [0]]))
+    best = int(np.argmin(errors))
+    if best == 0:
+        return density[0] / 2
+    if best == len(density):
+        return 1.
+    return (density[best - 1] + density[best]) / 2
+
+
+def plot(samples, filename):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 6))
+    for n, group in samples.groupby("N"):
+        plt.scatter(group["density"], group["sparse_ms"] / group["dense_ms"], s=12, label=f"N={n}")
+    plt.axhline(1., color="black", linewidth=0.8)
+    plt.axvline(DENSE_DENSITY, color="gray", linestyle="--", label=f"DENSE_DENSITY={DENSE_DENSITY}")
+    plt.xlabel("Front density in its bounding box")
+    plt.ylabel("Sparse time / dense time")
+    plt.yscale("log")
+    plt.title("Sparse vs dense engine, per step")
+    plt.grid(True, which="both", alpha=0.3)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(filename, dpi=300)
+    plt.close()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Time the sparse and dense engines along fire runs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="grid sizes N")
+    parser.add_argument("--wind", type=float, nargs=2, default=(0., 0.), help="wind vector")
+    parser.add_argument("--samples", type=int, default=40, help="approximate number of timed steps per run")
+    parser.add_argument("--repeat", type=int, default=3, help="timings of each step and engine (best kept)")
+    parser.add_argument("--output", default="engines_benchmark.csv", help="CSV file of the samples")
+    parser.add_argument("--plot", help="PNG file of the speedup of the dense engine against the density")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    rows = []
+    for n in args.sizes:
+        start = time.perf_counter()
+        run = sample_run(n, tuple(args.wind), samples=args.samples, repeat=args.repeat)
+        rows += run
+        print(f"N={n}: {len(run)} steps timed in {time.perf_counter() - start:.1f} s")
+    samples = pd.DataFrame(rows)
+    samples.to_csv(args.output, index=False)
+    print(f"Samples written to {args.output}")
+
+    print("Crossover density (dense engine faster above it):")
+    for n, group in samples.groupby("N"):
+        print(f"  N={n:5d}: {crossover(group):.3f}")
+    print(f"  all    : {crossover(samples):.3f} (DENSE_DENSITY = {DENSE_DENSITY})")
+    if args.plot:
+        plot(samples, args.plot)
+        print(f"Plot saved to {args.plot}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Monte Carlo ensemble of fire simulations over wind and ignition parameters.
+
+Every scenario is one run of firemodel.Model on an N x N grid, from an ignition cell with a wind vector, until the
+fire is out (or --max-steps). The scenarios are the product of the winds (every --wind-speeds for every
+--wind-angles, in degrees counterclockwise from the x axis, a zero speed counted once) and of the ignition cells
+(--ignitions "row,column" and/or --random-ignitions cells drawn with --seed).
+
+The runs are spread over a process pool (each scenario has its own front, so they are not batched in a single
+array) and their results are streamed to two tables in --output, a block of rows every --flush scenarios:
+
+    summaries   one row per scenario: scenario_id, N, wind_x, wind_y, ignition_row, ignition_column,
+                steps (time to extinction), extinct (False when stopped by --max-steps), burned_cells,
+                burned_fraction, peak_front, peak_step
+    series      one row per scenario and step: scenario_id, step, front (burning cells), burned_cells
+
+The tables are Parquet files (one row group per block) when pyarrow is installed, CSV files otherwise. Rows come
+in completion order, a scenario's series rows are written with its summary.
+
+Run from projet/:
+
+    python -m firemodel.ensemble --size 100 --wind-speeds 0 10 30 60 --wind-angles 0 90 180 270 \\
+        --random-ignitions 20 --output ensemble_100
+"""
+
+import argparse
+import itertools
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .model import Model
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    HAVE_PARQUET = True
+except ImportError:
+    HAVE_PARQUET = False
+
+SUMMARY_COLUMNS = ["scenario_id", "N", "wind_x", "wind_y", "ignition_row", "ignition_column", "steps", "extinct",
+                   "burned_cells", "burned_fraction", "peak_front", "peak_step"]
+SERIES_COLUMNS = ["scenario_id", "step", "front", "burned_cells"]
+
+
+class Scenario(NamedTuple):
+    scenario_id: int
+    N: int
+    wind_x: float
+    wind_y: float
+    ignition_row: int
+    ignition_column: int
+
+
+def winds(speeds, angles):
+    """Wind vectors of every speed in every direction (degrees), the zero speed once."""
+    vectors = []
+    for speed in speeds:
+        for angle in ([0.] if speed == 0 else angles):
+            vector = (speed * math.cos(math.radians(angle)), speed * math.sin(math.radians(angle)))
+            # Rounded so that e.g. cos(90°) is exactly 0 (and -0. becomes 0.)
+            vectors.append(tuple(round(component, 9) + 0. for component in vector))
+    return list(dict.fromkeys(vectors))
+
+
+def ignition_cells(n, cells=(), random_cells=0, seed=0):
+    """Given (row, column) cells followed by `random_cells` distinct cells drawn uniformly on the grid."""
+    cells = list(cells)
+    for row, column in cells:
+        if not (0 <= row < n and 0 <= column < n):
+            raise ValueError(f"Ignition cell ({row}, {column}) outside of the {n} x {n} grid")
+    if random_cells:
+        drawn = np.random.default_rng(seed).choice(n * n, size=min(random_cells, n * n), replace=False)
+        cells += [(int(index) // n, int(index) % n) for index in drawn]
+    return cells
+
+
+def scenarios(n, wind_vectors, ignitions):
+    """Scenarios of the product of the winds and the ignition cells."""
+    return [Scenario(scenario_id, n, wind[0], wind[1], row, column)
+            for scenario_id, (wind, (row, column)) in enumerate(itertools.product(wind_vectors, ignitions))]
+
+
+def run_scenario(scenario, max_steps=None):
+    """
+    Run one scenario. Returns (summary, series): the summary row (dict of SUMMARY_COLUMNS) and the int64 array
+    (steps x 3) of step, burning cells and burned cells after each step (step 0 is the initial state).
+    """
+    model = Model(1., scenario.N, (scenario.wind_x, scenario.wind_y),
+                  (scenario.ignition_row, scenario.ignition_column))
+    series = [(0, len(model.front), model.burned_cells)]
+    running = True
+    while running and (max_steps is None or model.time_step < max_steps):
+        running = model.update()
+        series.append((model.time_step, len(model.front), model.burned_cells))
+    series = np.array(series, dtype=np.int64)
+
+    peak = int(np.argmax(series[:, 1]))
+    summary = {**scenario._asdict(), "steps": model.time_step, "extinct": not running,
+               "burned_cells": model.burned_cells, "burned_fraction": model.burned_cells / model.fire_map.size,
+               "peak_front": int(series[peak, 1]), "peak_step": int(series[peak, 0])}
+    return summary, series
+
+
+def _run_job(job):
+    scenario, max_steps = job
+    return run_scenario(scenario, max_steps)
+
+
+class TableWriter:
+    """Appends blocks of rows to a Parquet file (one row group per block) or, without pyarrow, to a CSV file."""
+
+    def __init__(self, path, parquet=None):
+        self.parquet = HAVE_PARQUET if parquet is None else parquet
+        self.path = f"{path}.{'parquet' if self.parquet else 'csv'}"
+        self.rows = 0
+        self._writer = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def write(self, frame):
+        if self.parquet:
+            table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a", header=self.rows == 0, index=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class EnsembleWriter:
+    """The summaries and series tables of an ensemble, written `flush` scenarios at a time."""
+
+    def __init__(self, output, flush=20, parquet=None):
+        os.makedirs(output, exist_ok=True)
+        self.summaries = TableWriter(os.path.join(output, "summaries"), parquet)
+        self.series = TableWriter(os.path.join(output, "series"), parquet)
+        self.flush = flush
+        self._summaries = []
+        self._series = []
+
+    def add(self, summary, series):
+        self._summaries.append(summary)
+        ids = np.full((len(series), 1), summary["scenario_id"], dtype=np.int64)
+        self._series.append(np.hstack([ids, series]))
+        if len(self._summaries) >= self.flush:
+            self.write()
+
+    def write(self):
+        if not self._summaries:
+            return
+        self.summaries.write(pd.DataFrame(self._summaries, columns=SUMMARY_COLUMNS))
+        self.series.write(pd.DataFrame(np.vstack(self._series), columns=SERIES_COLUMNS))
+        self._summaries, self._series = [], []
+
+    def close(self):
+        self.write()
+        self.summaries.close()
+        self.series.close()
+
+
+def run_ensemble(scenario_list, writer, max_steps=None, max_workers=None):
+    """
+    Run the scenarios in a process pool (in this process with a single worker) and hand every result to `writer`
+    as soon as it completes. Yields the summaries in completion order. The caller closes the writer.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    jobs = [(scenario, max_steps) for scenario in scenario_list]
+    if workers == 1:
+        for job in jobs:
+            summary, series = _run_job(job)
+            writer.add(summary, series)
+            yield summary
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_job, job) for job in jobs]
+        try:
+            for future in as_completed(futures):
+                summary, series = future.result()
+                writer.add(summary, series)
+                yield summary
+        except BaseException:
+            # Do not start the remaining scenarios when interrupted
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def parse_cell(text):
+    row, column = text.split(",")
+    return int(row), int(column)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Ensemble of fire simulations over wind and ignition parameters")
+    parser.add_argument("--size", type=int, default=100, help="number of cells per direction N")
+    parser.add_argument("--wind-speeds", type=float, nargs="+", default=[0., 10., 20., 40., 60.],
+                        help="wind speeds (norm of the wind vector)")
+    parser.add_argument("--wind-angles", type=float, nargs="+", default=[0., 45., 90., 135., 180., 225., 270., 315.],
+                        help="wind directions in degrees")
+    parser.add_argument("--ignitions", type=parse_cell, nargs="*", default=[], metavar="ROW,COLUMN",
+                        help="ignition cells (default: the centre when no random ignition is asked)")
+    parser.add_argument("--random-ignitions", type=int, default=0, help="number of random ignition cells")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random ignition cells")
+    parser.add_argument("--max-steps", type=int, help="stop the runs still burning after this many steps")
+    parser.add_argument("--workers", type=int, help="processes of the pool (default: one per core)")
+    parser.add_argument("--flush", type=int, default=20, help="scenarios per block of rows written")
+    parser.add_argument("--output", default="ensemble", help="folder of the summaries and series tables")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    n = args.size
+    cells = args.ignitions or ([] if args.random_ignitions else [(n // 2, n // 2)])
+    scenario_list = scenarios(n, winds(args.wind_speeds, args.wind_angles),
+                              ignition_cells(n, cells, args.random_ignitions, args.seed))
+    writer = EnsembleWriter(args.output, args.flush)
+    print(f"{len(scenario_list)} scenarios on a {n} x {n} grid, results in {writer.summaries.path} "
+          f"and {writer.series.path}")
+
+    start = time.perf_counter()
+    burned = []
+    interrupted = False
+    try:
+        for count, summary in enumerate(run_ensemble(scenario_list, writer, args.max_steps, args.workers), 1):
+            burned.append(summary["burned_fraction"])
+            if count % args.flush == 0 or count == len(scenario_list):
+                print(f"[{count}/{len(scenario_list)}] {time.perf_counter() - start:.1f} s")
+    except KeyboardInterrupt:
+        interrupted = True
+    finally:
+        # The completed scenarios are kept even when the ensemble is interrupted
+        writer.close()
+    if interrupted:
+        sys.exit(f"Ensemble interrupted, {writer.summaries.rows} scenarios written")
+
+    burned = np.array(burned)
+    print(f"Burned fraction: mean {burned.mean():.3f}, "
+          f"p5 {np.percentile(burned, 5):.3f}, median {np.median(burned):.3f}, p95 {np.percentile(burned, 95):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+NumPy port of the forest-fire Model of Etape_3/model.cpp.
+
+The maps are the flat uint8 arrays of the C++ class (index = row * geometry + column). The fire front, a
+std::unordered_map<index, intensity> in C++, is kept as the sorted array of the burning cells: its intensities are
+always those of fire_map (a cell enters the front at 255 and leaves it when its intensity decays to 0).
+
+Two engines compute a step, with identical results:
+
+    - sparse: draws the random numbers and computes the ignitions and the decays of the front cells only, with
+      index arrays. Its cost grows with the size of the front (sorting the new front included).
+    - dense: works on the maps as 2D arrays, restricted to the bounding box of the front (front_window), the
+      ignitions being shifted slices of the maps (a 4-neighbour stencil). Its cost depends only on the area of the
+      box, without any indexing or sorting.
+
+With engine="auto" (the default) every step uses the dense engine when the front fills at least DENSE_DENSITY of
+its bounding box (front_density), the sparse one otherwise. The crossover is measured by
+`python -m firemodel.benchmark`.
+
+Update order
+------------
+Model::update collects, for every cell of the front, the ignition of its south, north, east and west neighbours
+(in this order) then its own decay, and applies all these writes one after the other: when a cell receives
+several writes in the same step (ignited by a neighbour and decaying itself, or ignited twice), the last one wins.
+In C++ the cells are visited in the iteration order of the unordered_map and the writes are merged thread by thread
+after an OpenMP dynamic schedule, so that order, and therefore the outcome of such conflicts, is not specified (it
+depends on the hash table history and, with several threads, on the run). This port fixes it: cells in increasing
+index order, S, N, E, W then decay within a cell, last write wins. It is the order of the C++ code run on one
+thread with the front in an ordered container (std::map), and it gives identical fire_map and vegetation_map at
+every step in that setting.
+
+The random draws reproduce pseudo_random bit for bit as compiled on Linux (glibc), where std::uint_fast32_t is
+64 bits wide: all the products wrap modulo 2**64 like the size_t / uint64 arithmetic of the C++ code. log_factor
+is tabulated with math.log, which calls the same C library log as std::log. Builds that contract
+alpha0 + alpha1 * v + alpha2 * v * v into fused multiply-adds (-march=native on FMA hardware) may round p1
+differently when the wind is not zero.
+"""
+
+import math
+
+import numpy as np
+
+ALPHA0 = 4.52790762e-01
+ALPHA1 = 9.58264437e-04
+ALPHA2 = 3.61499382e-05
+P2 = 0.3
+
+# log_factor(value) = log(1 + value) / log(256) for the 256 possible uint8 values
+LOG_FACTOR = np.array([math.log(1. + value) / math.log(256) for value in range(256)])
+
+_MODULUS = np.uint64(2147483647)
+_MULTIPLIER = np.uint64(48271)
+
+# Multipliers of the cell index in the seed of each draw: south, north, east, west (modulo 2**64 like size_t),
+# then decay
+_DIRECTION_SEEDS = (1, 13427, 13427 ** 2, 13427 ** 3)
+_DECAY_SEED = 52513
+
+ENGINES = ("auto", "sparse", "dense")
+
+# Front density (burning cells / cells of the bounding box of the front) from which engine="auto" uses the dense
+# engine. python -m firemodel.benchmark puts the crossover between 0.4 and 0.55 for N = 400 to 1000 (below N = 200
+# both engines take less than a millisecond per step).
+DENSE_DENSITY = 0.45
+
+
+def pseudo_random(index, time_step):
+    """
+    pseudo_random of model.cpp for an array of indices: uniform number in [0, 1] depending only on the index and
+    the time step.
+    """
+    index = np.asarray(index, dtype=np.uint64)
+    xi = index * np.uint64(10000 + time_step + 1)
+    return ((_MULTIPLIER * xi) % _MODULUS) / 2147483646.
+
+
+def _draw(index, seed, time_step):
+    """
+    pseudo_random(index * seed + time_step, time_step) for a uint64 array of indices. The constant factors are folded
+    (modulo 2**64, like the wrapping products) into a single multiplication and addition.
+    """
+    factor = int(_MULTIPLIER) * (10000 + time_step + 1)
+    values = index * np.uint64(seed * factor % 2 ** 64)
+    values += np.uint64(time_step * factor % 2 ** 64)
+    values %= _MODULUS
+    return values / 2147483646.
+
+
+def log_factor(value):
+    """log_factor of model.cpp, for uint8 values or arrays of them."""
+    return LOG_FACTOR[value]
+
+
+class Model:
+    """
+    Forest-fire model with the interface of the C++ Model class.
+
+    `start_fire_position` is (row, column), like Model::Coordinates (simulation.exe takes "-s column,row").
+    `engine` is "sparse", "dense" or "auto" (see the module docstring).
+    """
+
+    def __init__(self, length, discretization, wind, start_fire_position, max_wind=60., engine="auto"):
+        if discretization == 0:
+            raise ValueError("Le nombre de cases par direction doit être plus grand que zéro.")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {', '.join(ENGINES)}")
+        self.engine = engine
+        self.length = length
+        self.geometry = discretization
+        self.distance = length / float(discretization)
+        self.wind = (float(wind[0]), float(wind[1]))
+        self.wind_speed = math.sqrt(self.wind[0] * self.wind[0] + self.wind[1] * self.wind[1])
+        self.max_wind = max_wind
+        self.time_step = 0
+
+        self.vegetation_map = np.full(discretization * discretization, 255, dtype=np.uint8)
+        self.fire_map = np.zeros(discretization * discretization, dtype=np.uint8)
+        row, column = start_fire_position
+        index = row * discretization + column
+        self.fire_map[index] = 255
+        self.front = np.array([index], dtype=np.int64)
+        # Cells that have caught fire since the start (burned area, a cell that burned out and caught fire again
+        # counted once): the cells whose vegetation is no longer 255 once the step is done
+        self.burned_cells = 1
+        # Cells ignited after their own decay in the current step (scratch of the sparse engine, all False between
+        # steps)
+        self._late = np.zeros(discretization * discretization, dtype=bool)
+        # Cell indices of the dense engine, allocated by its first step
+        self._cells = None
+
+        speed = self.wind_speed if self.wind_speed < max_wind else max_wind
+        self.p1 = ALPHA0 + ALPHA1 * speed + ALPHA2 * (speed * speed)
+        self.p2 = P2
+
+        if self.wind[0] > 0:
+            self.alpha_east_west = abs(self.wind[0] / max_wind) + 1
+            self.alpha_west_east = 1. - abs(self.wind[0] / max_wind)
+        else:
+            self.alpha_west_east = abs(self.wind[0] / max_wind) + 1
+            self.alpha_east_west = 1. - abs(self.wind[0] / max_wind)
+
+        if self.wind[1] > 0:
+            self.alpha_south_north = abs(self.wind[1] / max_wind) + 1
+            self.alpha_north_south = 1. - abs(self.wind[1] / max_wind)
+        else:
+            self.alpha_north_south = abs(self.wind[1] / max_wind) + 1
+            self.alpha_south_north = 1. - abs(self.wind[1] / max_wind)
+
+    @property
+    def fire_front(self):
+        """Burning cells and their intensities, as a dict like the C++ fire_front."""
+        return dict(zip(self.front.tolist(), self.fire_map[self.front].tolist()))
+
+    def update(self):
+        """Compute the next time step. Returns False once the fire is out."""
+        if self.engine == "dense" or (self.engine == "auto" and self.front_density() >= DENSE_DENSITY):
+            self._update_dense()
+        else:
+            self._update_sparse()
+        self.time_step += 1
+        return len(self.front) > 0
+
+    def front_window(self):
+        """
+        (rows, columns) slices of the bounding box of the front, widened by the one cell margin it can ignite: no
+        cell changes outside of it during the next step.
+        """
+        if len(self.front) == 0:
+            return slice(0, 0), slice(0, 0)
+        n = self.geometry
+        column = self.front % n
+        # The front is sorted: its first and last cells are on its first and last rows
+        return (slice(max(self.front[0] // n - 1, 0), min(self.front[-1] // n + 2, n)),
+                slice(max(column.min() - 1, 0), min(column.max() + 2, n)))
+
+    def front_density(self):
+        """Proportion of burning cells in front_window(), the area the dense engine works on."""
+        rows, columns = self.front_window()
+        area = (rows.stop - rows.start) * (columns.stop - columns.start)
+        return len(self.front) / area if area else 0.
+
+    def _update_sparse(self):
+        n = self.geometry
+        front = self.front
+        intensity = self.fire_map[front]
+        row, column = np.divmod(front, n)
+        power = LOG_FACTOR[intensity]
+        time_step = self.time_step
+        seed_index = front.astype(np.uint64)
+
+        # Ignitions of the S, N, E, W neighbours of every front cell
+        ignited = []
+        neighbours = (
+            (row < n - 1, front + n, self.alpha_south_north),
+            (row > 0, front - n, self.alpha_north_south),
+            (column < n - 1, front + 1, self.alpha_east_west),
+            (column > 0, front - 1, self.alpha_west_east),
+        )
+        for k, (inside, neighbour, alpha) in enumerate(neighbours):
+            tirage = _draw(seed_index, _DIRECTION_SEEDS[k], time_step)
+            green_power = self.vegetation_map[np.where(inside, neighbour, front)]
+            correction = power * LOG_FACTOR[green_power]
+            ignited.append(neighbour[inside & (tirage < alpha * self.p1 * correction)])
+
+        # Decay of the front cells (always below 255, with probability p2 at 255)
+        tirage = _draw(seed_index, _DECAY_SEED, time_step)
+        decays = (intensity != 255) | (tirage < self.p2)
+        decayed = front[decays]
+        decayed_values = intensity[decays] >> 1
+
+        # Last write wins. Every ignition writes 255, so a cell ends at 255 unless its own decay is its last write:
+        # the decay of cell X comes after the ignitions from the cells before it (its north neighbour igniting
+        # southwards, its west neighbour igniting eastwards) and before those from the cells after it (its south
+        # neighbour igniting northwards, its east neighbour igniting westwards).
+        late = np.concatenate((ignited[1], ignited[3]))
+        self._late[late] = True
+        decayed_values[self._late[decayed]] = 255
+        self._late[late] = False
+
+        all_ignited = np.concatenate(ignited)
+        new_cells = all_ignited[self.fire_map[all_ignited] == 0]
+        self.fire_map[decayed] = decayed_values
+        self.fire_map[new_cells] = 255
+
+        # Front: the cells still burning, merged with the newly ignited ones (sorted, without duplicates)
+        new_cells.sort()
+        new_cells = new_cells[np.diff(new_cells, prepend=-1) != 0]
+        self.burned_cells += np.count_nonzero(self.vegetation_map[new_cells] == 255)
+        self.front = np.sort(np.concatenate((front[self.fire_map[front] > 0], new_cells)), kind="stable")
+
+        vegetation = self.vegetation_map[self.front]
+        self.vegetation_map[self.front] = vegetation - (vegetation > 0)
+
+    def _update_dense(self):
+        n = self.geometry
+        time_step = self.time_step
+        if self._cells is None:
+            self._cells = np.arange(n * n, dtype=np.uint64).reshape(n, n)
+        window = self.front_window()
+        fire = self.fire_map.reshape(n, n)[window]
+        vegetation = self.vegetation_map.reshape(n, n)[window]
+        cells = self._cells[window]
+        # log_factor(0) = 0: the cells that do not burn ignite nothing
+        power = LOG_FACTOR[fire]
+        green_power = LOG_FACTOR[vegetation]
+
+        def draw(seed):
+            return _draw(cells, seed, time_step)
+
+        # early: ignited by the cell before it (north neighbour igniting southwards, west neighbour igniting
+        # eastwards), late: by the cell after it, see _update_sparse
+        early = np.zeros(fire.shape, dtype=bool)
+        late = np.zeros(fire.shape, dtype=bool)
+        early[1:] = draw(_DIRECTION_SEEDS[0])[:-1] < self.alpha_south_north * self.p1 * (power[:-1] * green_power[1:])
+        late[:-1] = draw(_DIRECTION_SEEDS[1])[1:] < self.alpha_north_south * self.p1 * (power[1:] * green_power[:-1])
+        early[:, 1:] |= (draw(_DIRECTION_SEEDS[2])[:, :-1]
+                         < self.alpha_east_west * self.p1 * (power[:, :-1] * green_power[:, 1:]))
+        late[:, :-1] |= (draw(_DIRECTION_SEEDS[3])[:, 1:]
+                         < self.alpha_west_east * self.p1 * (power[:, 1:] * green_power[:, :-1]))
+
+        decays = (fire > 0) & ((fire != 255) | (draw(_DECAY_SEED) < self.p2))
+        self.burned_cells += np.count_nonzero((early | late) & (vegetation == 255))
+        fire[...] = np.where(decays, np.where(late, 255, fire >> 1), np.where(early | late, 255, fire))
+
+        burning = fire > 0
+        vegetation -= burning & (vegetation > 0)
+        self.front = cells[burning].astype(np.int64)
+
+    def get_geometry(self):
+        return self.geometry
+
+    def vegetal_map(self):
+        return self.vegetation_map.copy()
+
+    def get_fire_map(self):
+        return self.fire_map.copy()
+
+    def get_time_step(self):
+        return self.time_step
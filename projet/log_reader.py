@@ -0,0 +1,119 @@
+"""
+Shared reader for the profiling logs written by the simulation (Profiler, see profiler.hpp).
+
+A log starts with a few optional metadata lines:
+
+    Taille du terrain : 1.000000
+    Nombre de cellules par direction : 100
+    Vecteur vitesse : [0.000000, 0.000000]
+    Position initiale du foyer (col, ligne) : 50, 50
+    Profiling data for rank 0 of 2
+    OpenMP threads: 1
+
+followed by the header `step,update_time,display_time,total_time` and one line of integer times (in µs) per step.
+
+The whole file is read as bytes, the header is located with a single `bytes.find`, and everything after it is
+parsed in one call into an int64 array, without going through `readlines()` or a per-line regex.
+A last line cut short by an interrupted run (missing or empty fields) is dropped.
+
+Plotters living in Etape_*/ import it with:
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from log_reader import read_log
+"""
+
+import re
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+LOG_COLUMNS = ["step", "update_time", "display_time", "total_time"]
+HEADER = b"step,update_time,display_time,total_time"
+
+_METADATA_PATTERNS = {
+    "terrain_size": re.compile(rb"Taille du terrain\s*:\s*([-+\d.eE]+)"),
+    "cells": re.compile(rb"Nombre de cellules par direction\s*:\s*(\d+)"),
+    "velocity": re.compile(rb"Vecteur vitesse\s*:\s*\[\s*([-+\d.eE]+)\s*,\s*([-+\d.eE]+)\s*\]"),
+    "fire_position": re.compile(rb"Position initiale du foyer \(col,\s*ligne\)\s*:\s*(\d+)\s*,\s*(\d+)"),
+    "mpi": re.compile(rb"Profiling data for rank\s+(\d+)\s+of\s+(\d+)"),
+    "omp_threads": re.compile(rb"OpenMP threads:\s*(\d+)"),
+}
+
+
+class LogHeader(NamedTuple):
+    """Metadata found before the CSV header (None when the line is absent)."""
+    terrain_size: Optional[float] = None
+    cells: Optional[int] = None
+    velocity: Optional[Tuple[float, float]] = None
+    fire_position: Optional[Tuple[int, int]] = None  # (col, row)
+    mpi_rank: Optional[int] = None
+    mpi_size: Optional[int] = None
+    omp_threads: Optional[int] = None
+
+
+def parse_header(prefix):
+    """Build a LogHeader from the bytes preceding the CSV header."""
+    fields = {}
+    match = _METADATA_PATTERNS["terrain_size"].search(prefix)
+    if match:
+        fields["terrain_size"] = float(match.group(1))
+    match = _METADATA_PATTERNS["cells"].search(prefix)
+    if match:
+        fields["cells"] = int(match.group(1))
+    match = _METADATA_PATTERNS["velocity"].search(prefix)
+    if match:
+        fields["velocity"] = (float(match.group(1)), float(match.group(2)))
+    match = _METADATA_PATTERNS["fire_position"].search(prefix)
+    if match:
+        fields["fire_position"] = (int(match.group(1)), int(match.group(2)))
+    match = _METADATA_PATTERNS["mpi"].search(prefix)
+    if match:
+        fields["mpi_rank"], fields["mpi_size"] = int(match.group(1)), int(match.group(2))
+    match = _METADATA_PATTERNS["omp_threads"].search(prefix)
+    if match:
+        fields["omp_threads"] = int(match.group(1))
+    return LogHeader(**fields)
+
+
+def read_log_array(filepath):
+    """
+    Read a profiling log.
+
+    Returns (LogHeader, int64 array of shape (n_steps, 4)) with the columns of LOG_COLUMNS.
+    The array is None when the file has no CSV header.
+    """
+    with open(filepath, "rb") as f:
+        data = f.read()
+
+    offset = data.find(HEADER)
+    if offset < 0:
+        return parse_header(data), None
+    header = parse_header(data[:offset])
+
+    body = data[offset + len(HEADER):].replace(b"\r", b"").strip()
+    # Drop a last line cut short by an interrupted run: missing fields, or an empty last one ("2,3,4,")
+    last_fields = body[body.rfind(b"\n") + 1:].split(b",")
+    if len(last_fields) != len(LOG_COLUMNS) or not all(field.strip() for field in last_fields):
+        body = body[:body.rfind(b"\n") + 1].rstrip()
+    if not body:
+        return header, np.empty((0, len(LOG_COLUMNS)), dtype=np.int64)
+    # One flat list of integers: text-mode np.fromstring parses it in C without building Python objects
+    values = np.fromstring(body.replace(b"\n", b","), dtype=np.int64, sep=",")
+    n_lines = body.count(b"\n") + 1
+    if values.size != n_lines * len(LOG_COLUMNS):
+        raise ValueError(f"Malformed profiling data in {filepath}")
+    return header, values.reshape(n_lines, len(LOG_COLUMNS))
+
+
+def read_log(filepath):
+    """
+    Read a profiling log.
+
+    Returns (LogHeader, DataFrame with the int64 columns of LOG_COLUMNS). The DataFrame is empty (same columns)
+    when the file has no CSV header.
+    """
+    header, values = read_log_array(filepath)
+    if values is None:
+        values = np.empty((0, len(LOG_COLUMNS)), dtype=np.int64)
+    return header, pd.DataFrame(values, columns=LOG_COLUMNS)
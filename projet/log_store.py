@@ -0,0 +1,339 @@
+"""
+Columnar store of the profiling logs, filled incrementally from the CSV files read by log_reader.py.
+
+Each log file is parsed once and stored as one run of a single table with the columns of STORE_COLUMNS:
+
+    run_id, N, omp_threads, mpi_rank, mpi_size, step, update_us, display_us, total_us
+
+Runs are written to <store>/runs/<run_id>.parquet when pyarrow is installed, otherwise to <store>/runs/<run_id>.npz.
+<store>/manifest.json maps the real path of every ingested log to its run_id, its header and the (mtime, size) it
+had when it was parsed: a log whose mtime and size did not change is not read again, and the run of a log that
+no longer exists is dropped when a query reaches it.
+
+N, omp_threads, mpi_rank and mpi_size come from the log header. When a line is missing, N is taken from the
+directory name (benchmark_<N>, logs_<N>, benchmarkAnalysis_<N>), omp_threads from a "_omp<T>" directory and
+defaults to 1, and a log without the "Profiling data for rank" line is a sequential run (rank 0 of 1).
+
+Plotters living in Etape_*/ get the rows of the logs of each of their folders with folder_frames, which ingests the
+logs of all the folders (new or modified ones are parsed in a process pool, one worker per core) and queries them at
+once:
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from log_store import folder_frames
+
+    for folder, frame in folder_frames(logs_folders).items():
+        for path, run in frame.groupby("path", sort=False):
+            ...
+
+The whole table can also be queried from the command line:
+
+    python log_store.py ingest Etape_3/benchmark_*_omp*/logs
+    python log_store.py query --N 100 --omp-threads 4
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from log_reader import LOG_COLUMNS, LogHeader, read_log_array
+
+try:
+    import pyarrow  # noqa: F401
+    HAVE_PARQUET = True
+except ImportError:
+    HAVE_PARQUET = False
+
+RUN_COLUMNS = ["run_id", "N", "omp_threads", "mpi_rank", "mpi_size"]
+TIME_COLUMNS = ["step", "update_us", "display_us", "total_us"]
+STORE_COLUMNS = RUN_COLUMNS + TIME_COLUMNS
+
+DEFAULT_STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".log_store")
+MANIFEST = "manifest.json"
+
+_N_FROM_PATH = re.compile(r"(?:benchmark|benchmarkAnalysis|logs)_(\d+)")
+_OMP_FROM_PATH = re.compile(r"_omp(\d+)")
+
+
+def run_columns(path, header):
+    """Values of RUN_COLUMNS (without run_id) for the log at `path` with the given LogHeader."""
+    n = header.cells
+    if n is None:
+        match = _N_FROM_PATH.search(path)
+        n = int(match.group(1)) if match else -1
+    omp_threads = header.omp_threads
+    if omp_threads is None:
+        match = _OMP_FROM_PATH.search(path)
+        omp_threads = int(match.group(1)) if match else 1
+    if header.mpi_rank is None:
+        mpi_rank, mpi_size = 0, 1
+    else:
+        mpi_rank, mpi_size = header.mpi_rank, header.mpi_size
+    return {"N": n, "omp_threads": omp_threads, "mpi_rank": mpi_rank, "mpi_size": mpi_size}
+
+
+def load_run_file(run_file):
+    """int64 array (columns of TIME_COLUMNS) stored in a .parquet or .npz run file."""
+    if run_file.endswith(".parquet"):
+        return pd.read_parquet(run_file).to_numpy(dtype=np.int64)
+    with np.load(run_file) as data:
+        return data["times"]
+
+
+def _load_job(job):
+    """Worker side of ingest and query: (LogHeader, array) for a log to parse, (None, array) for a stored run."""
+    path, run_file = job
+    if run_file is None:
+        return read_log_array(path)
+    return None, load_run_file(run_file)
+
+
+_pool = None
+_pool_workers = None
+
+
+def log_pool(max_workers=None):
+    """
+    Process pool shared by all the loads of a plotter (created on first use, one worker per core by default, and
+    created again when another number of workers is asked for).
+    """
+    global _pool, _pool_workers
+    workers = max_workers or os.cpu_count()
+    if _pool is not None and _pool_workers != workers:
+        _pool.shutdown()
+        _pool = None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def map_jobs(function, jobs, max_workers=None):
+    """list(map(function, jobs)) over log_pool, or in this process when there is a single core or a single job."""
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) < 2:
+        return [function(job) for job in jobs]
+    # A few chunks per worker: enough to balance the load without one round trip per file
+    chunksize = max(1, len(jobs) // (4 * workers))
+    return list(log_pool(workers).map(function, jobs, chunksize=chunksize))
+
+
+class LogStore:
+    """Run table on disk plus the manifest of the logs it was built from."""
+
+    def __init__(self, root=DEFAULT_STORE, parquet=None):
+        self.root = root
+        self.parquet = HAVE_PARQUET if parquet is None else parquet
+        os.makedirs(os.path.join(root, "runs"), exist_ok=True)
+        self.manifest_path = os.path.join(root, MANIFEST)
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        else:
+            manifest = {"next_run_id": 0, "runs": {}}
+        self.next_run_id = manifest["next_run_id"]
+        self.runs = manifest["runs"]
+        self._tables = {}
+
+    def save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"next_run_id": self.next_run_id, "runs": self.runs}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _run_file(self, run_id, parquet):
+        return os.path.join(self.root, "runs", f"{run_id}.{'parquet' if parquet else 'npz'}")
+
+    def _write_run(self, run_id, values):
+        if self.parquet:
+            table = pd.DataFrame(values, columns=TIME_COLUMNS)
+            table.to_parquet(self._run_file(run_id, True), index=False)
+        else:
+            np.savez(self._run_file(run_id, False), times=values)
+        # A run re-ingested with the other backend must not leave its old file behind
+        stale = self._run_file(run_id, not self.parquet)
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    def _stored_run_file(self, run_id):
+        parquet_file = self._run_file(run_id, True)
+        return parquet_file if self.parquet and os.path.exists(parquet_file) else self._run_file(run_id, False)
+
+    @staticmethod
+    def _is_current(entry, stat):
+        return entry is not None and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size
+
+    def _add_run(self, path, stat, header, values):
+        """Store the parsed log `path` (new run, or the run it already had if it was modified)."""
+        if values is None:
+            values = np.empty((0, len(LOG_COLUMNS)), dtype=np.int64)
+        entry = self.runs.get(path)
+        if entry is None:
+            run_id = self.next_run_id
+            self.next_run_id += 1
+        else:
+            run_id = entry["run_id"]
+        self._write_run(run_id, values)
+        self._tables[run_id] = values
+        self.runs[path] = {"run_id": run_id, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+                           "header": header._asdict(), **run_columns(path, header)}
+        return values
+
+    def ingest(self, paths, max_workers=None):
+        """
+        Add the logs in `paths` (files or directories of *.csv) to the store, skipping those already ingested.
+        New logs are parsed in the shared process pool. Returns the number of logs parsed.
+        """
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(sorted(glob.glob(os.path.join(path, "*.csv"))))
+            else:
+                files.append(path)
+        stats = {}
+        for filepath in map(os.path.realpath, files):
+            stat = os.stat(filepath)
+            if not self._is_current(self.runs.get(filepath), stat):
+                stats[filepath] = stat
+        parsed_logs = map_jobs(_load_job, [(filepath, None) for filepath in stats], max_workers)
+        for (filepath, stat), (header, values) in zip(stats.items(), parsed_logs):
+            self._add_run(filepath, stat, header, values)
+        if stats:
+            self.save_manifest()
+        return len(stats)
+
+    def header(self, path):
+        """LogHeader of an ingested log."""
+        fields = dict(self.runs[os.path.realpath(path)]["header"])
+        for name in ("velocity", "fire_position"):
+            if fields[name] is not None:
+                fields[name] = tuple(fields[name])
+        return LogHeader(**fields)
+
+    def _forget(self, path):
+        """Remove the run of the log `path` from the manifest, the loaded runs and the disk."""
+        run_id = self.runs.pop(path)["run_id"]
+        self._tables.pop(run_id, None)
+        for parquet in (True, False):
+            if os.path.exists(self._run_file(run_id, parquet)):
+                os.remove(self._run_file(run_id, parquet))
+
+    def _matching_runs(self, paths=None, filters=None):
+        """
+        (path, entry) of the runs at or below `paths` whose run columns match `filters`, by run_id. The runs of
+        logs deleted since they were ingested are dropped from the store instead.
+        """
+        if paths is not None:
+            exact = {os.path.realpath(p) for p in paths}
+            prefixes = tuple(p + os.sep for p in exact)
+        runs = []
+        deleted = []
+        for path, entry in sorted(self.runs.items(), key=lambda item: item[1]["run_id"]):
+            if paths is not None and path not in exact and not path.startswith(prefixes):
+                continue
+            if not os.path.exists(path):
+                deleted.append(path)
+                continue
+            if filters and any(value is not None and entry[name] != value for name, value in filters.items()):
+                continue
+            runs.append((path, entry))
+        for path in deleted:
+            self._forget(path)
+        if deleted:
+            self.save_manifest()
+        return runs
+
+    def query(self, paths=None, N=None, omp_threads=None, mpi_rank=None, mpi_size=None, max_workers=None):
+        """
+        Rows of the run table (columns STORE_COLUMNS) matching every given filter.
+        `paths` restricts the query to logs at or below these paths; other filters compare the run columns.
+        The stored runs not loaded yet are read in one batch by the shared process pool.
+        """
+        runs = self._matching_runs(paths, {"N": N, "omp_threads": omp_threads, "mpi_rank": mpi_rank,
+                                           "mpi_size": mpi_size})
+        missing = [entry["run_id"] for _, entry in runs if entry["run_id"] not in self._tables]
+        jobs = [(None, self._stored_run_file(run_id)) for run_id in missing]
+        for run_id, (_, values) in zip(missing, map_jobs(_load_job, jobs, max_workers)):
+            self._tables[run_id] = values
+        parts = []
+        for _, entry in runs:
+            values = self._tables[entry["run_id"]]
+            run = np.empty((len(values), len(STORE_COLUMNS)), dtype=np.int64)
+            run[:, :len(RUN_COLUMNS)] = [entry[name] for name in RUN_COLUMNS]
+            run[:, len(RUN_COLUMNS):] = values
+            parts.append(run)
+        if not parts:
+            return pd.DataFrame(np.empty((0, len(STORE_COLUMNS)), dtype=np.int64), columns=STORE_COLUMNS)
+        return pd.DataFrame(np.concatenate(parts), columns=STORE_COLUMNS)
+
+
+_default_store = None
+
+
+def default_store():
+    """Store shared by the plotters, in projet/.log_store."""
+    global _default_store
+    if _default_store is None:
+        _default_store = LogStore()
+    return _default_store
+
+
+def folder_frames(folders, store=None, max_workers=None):
+    """
+    Rows of the *.csv logs of every folder of `folders`: {folder: DataFrame with the columns STORE_COLUMNS and
+    `path`, the real path of the log of each row}, by path then step. The logs of all the folders are ingested into
+    `store` (the default store when None) and queried in a single batch. A log without rows, or a missing folder,
+    gives no rows; LogStore.header(path) gives the header of a log.
+    """
+    store = store or default_store()
+    folder_of = {os.path.realpath(path): folder
+                 for folder in folders for path in glob.glob(os.path.join(folder, "*.csv"))}
+    paths = sorted(folder_of)
+    store.ingest(paths, max_workers)
+    rows = store.query(paths, max_workers=max_workers)
+    run_paths = {store.runs[path]["run_id"]: path for path in paths}
+    rows["path"] = rows["run_id"].map(run_paths)
+    rows = rows.sort_values("path", kind="stable", ignore_index=True)
+    row_folders = rows["path"].map(folder_of)
+    return {folder: rows[(row_folders == folder).to_numpy()].reset_index(drop=True) for folder in folders}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar store of the profiling logs")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="store directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="add log files or directories of logs to the store")
+    ingest_parser.add_argument("paths", nargs="+")
+    query_parser = subparsers.add_parser("query", help="print the runs matching the filters")
+    query_parser.add_argument("paths", nargs="*", help="only logs at or below these paths")
+    query_parser.add_argument("--N", type=int)
+    query_parser.add_argument("--omp-threads", type=int)
+    query_parser.add_argument("--mpi-rank", type=int)
+    query_parser.add_argument("--mpi-size", type=int)
+    query_parser.add_argument("--output", help="write the rows to this CSV file instead of printing a summary")
+    args = parser.parse_args()
+
+    store = LogStore(args.store)
+    if args.command == "ingest":
+        parsed = store.ingest(args.paths)
+        print(f"{parsed} new or modified logs ingested, {len(store.runs)} runs in {store.root}")
+        return
+
+    table = store.query(args.paths or None, N=args.N, omp_threads=args.omp_threads,
+                        mpi_rank=args.mpi_rank, mpi_size=args.mpi_size)
+    if args.output:
+        table.to_csv(args.output, index=False)
+        print(f"{len(table)} rows written to {args.output}")
+    else:
+        summary = table.groupby(RUN_COLUMNS[1:])["run_id"].nunique().rename("runs")
+        print(summary.to_string())
+        print(f"{table['run_id'].nunique()} runs, {len(table)} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Tests of compare_benchmarks.py on two sweeps of logs written to temporary folders, with a temporary store.
+
+Run from projet/:
+
+    python -m pytest test_compare_benchmarks.py    (or python test_compare_benchmarks.py)
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from compare_benchmarks import compare, run_times
+from log_store import LogStore
+from test_log_store import write_log
+
+
+class CompareBenchmarksTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = LogStore(os.path.join(self.tmp.name, "store"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sweep(self, name, update_times):
+        """Folder `name` with one rank 0 log of N=100, 2 threads per update time (and its rank 1 log)."""
+        folder = os.path.join(self.tmp.name, name)
+        logs = os.path.join(folder, "benchmark_100_omp2", "logs")
+        os.makedirs(logs)
+        for trial, time in enumerate(update_times):
+            write_log(os.path.join(logs, f"rank0-{trial}.csv"), 0, 2, [5000, time, time, time])
+            write_log(os.path.join(logs, f"rank1-{trial}.csv"), 1, 2, [5000, 1, 1, 1])
+        return folder
+
+    def test_slower_candidate_is_a_regression(self):
+        baseline = self.sweep("baseline", [1000, 1010, 1020, 1030])
+        candidate = self.sweep("candidate", [1500, 1510, 1520, 1530])
+        base_times = run_times(self.store, baseline, column="update_us")
+        self.assertEqual(sorted(base_times["time_us"]), [1000, 1010, 1020, 1030])
+
+        result = compare(base_times, run_times(self.store, candidate, column="update_us"))
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result["verdict"][0], "slower")
+        self.assertTrue(result["regression"][0])
+        self.assertAlmostEqual(result["speedup"][0], 1015 / 1515)
+
+    def test_deleted_logs_are_not_compared(self):
+        baseline = self.sweep("baseline", [1000, 1010, 1020, 1030])
+        candidate = self.sweep("candidate", [1000, 1010, 1020, 1030])
+        compare(run_times(self.store, baseline), run_times(self.store, candidate))
+        deleted = os.path.join(candidate, "benchmark_100_omp2", "logs", "rank0-3.csv")
+        deleted_run = self.store.runs[os.path.realpath(deleted)]["run_id"]
+
+        os.remove(deleted)
+        cand_times = run_times(self.store, candidate, column="update_us")
+        self.assertNotIn(deleted_run, cand_times["run_id"].tolist())
+        self.assertEqual(sorted(cand_times["time_us"]), [1000, 1010, 1020])
+        self.assertEqual(compare(run_times(self.store, baseline), run_times(self.store, candidate))["n_cand"][0], 3)
+
+    def test_logs_outside_the_sweep_are_not_compared(self):
+        candidate = self.sweep("candidate", [1000, 1010])
+        # Log of a failed trial, kept in its hidden working directory, that the store ingested anyway
+        kept = os.path.join(candidate, "benchmark_100_omp2", ".trial3", "logs")
+        os.makedirs(kept)
+        write_log(os.path.join(kept, "rank0-3.csv"), 0, 2, [5000, 9999, 9999, 9999])
+        self.store.ingest([kept])
+
+        self.assertEqual(sorted(run_times(self.store, candidate, column="update_us")["time_us"]), [1000, 1010])
+
+
+if __name__ == "__main__":
+    unittest.main()
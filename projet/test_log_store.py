@@ -0,0 +1,89 @@
+"""
+Tests of log_store.py on logs written to a temporary folder, with a temporary store.
+
+Run from projet/:
+
+    python -m pytest test_log_store.py    (or python test_log_store.py)
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from log_store import LogStore, folder_frames
+
+
+def write_log(path, rank, size, times):
+    """Profiler-style log of rank `rank` of `size` with one line per step of the update times `times`."""
+    with open(path, "w") as log:
+        log.write(f"Profiling data for rank {rank} of {size}\nOpenMP threads: 2\n")
+        log.write("step,update_time,display_time,total_time\n")
+        for step, time in enumerate(times):
+            log.write(f"{step},{time},400,{time + 400}\n")
+
+
+class LogStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.logs = os.path.join(self.tmp.name, "benchmark_100_omp2", "logs")
+        os.makedirs(self.logs)
+        self.store = LogStore(os.path.join(self.tmp.name, "store"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_query_reads_the_ingested_logs(self):
+        write_log(os.path.join(self.logs, "rank0-a.csv"), 0, 2, [100, 110, 120])
+        write_log(os.path.join(self.logs, "rank1-a.csv"), 1, 2, [200, 210])
+        self.assertEqual(self.store.ingest([self.logs]), 2)
+        self.assertEqual(self.store.ingest([self.logs]), 0)
+
+        table = self.store.query([self.logs], mpi_rank=0)
+        self.assertEqual(table["update_us"].tolist(), [100, 110, 120])
+        self.assertEqual(set(table["N"]), {100})
+        self.assertEqual(set(table["omp_threads"]), {2})
+        # A new store on the same folder serves the runs without parsing them again
+        store = LogStore(self.store.root)
+        self.assertEqual(len(store.query([self.logs])), 5)
+
+    def test_deleted_logs_are_dropped(self):
+        old_log = os.path.join(self.logs, "rank0-old.csv")
+        write_log(old_log, 0, 2, [100, 110])
+        write_log(os.path.join(self.logs, "rank0-new.csv"), 0, 2, [90, 95])
+        self.store.ingest([self.logs])
+        self.assertEqual(self.store.query([self.logs])["run_id"].nunique(), 2)
+        old_run = self.store.runs[os.path.realpath(old_log)]["run_id"]
+
+        os.remove(old_log)
+        table = self.store.query([self.logs])
+        self.assertEqual(table["update_us"].tolist(), [90, 95])
+        self.assertNotIn(os.path.realpath(old_log), self.store.runs)
+        self.assertEqual([name for name in os.listdir(os.path.join(self.store.root, "runs"))
+                          if name.startswith(f"{old_run}.")], [])
+        # The manifest on disk no longer has it either
+        self.assertEqual(len(LogStore(self.store.root).runs), 1)
+
+    def test_folder_frames(self):
+        other = os.path.join(self.tmp.name, "benchmark_50_omp1", "logs")
+        os.makedirs(other)
+        write_log(os.path.join(self.logs, "rank1-a.csv"), 1, 2, [200, 210])
+        write_log(os.path.join(self.logs, "rank0-a.csv"), 0, 2, [100, 110, 120])
+        write_log(os.path.join(other, "seq.csv"), 0, 1, [300])
+        missing = os.path.join(self.tmp.name, "missing")
+
+        frames = folder_frames([self.logs, other, missing], self.store)
+        self.assertEqual(list(frames), [self.logs, other, missing])
+        # Rows by path, then step
+        self.assertEqual([os.path.basename(path) for path in frames[self.logs]["path"].unique()],
+                         ["rank0-a.csv", "rank1-a.csv"])
+        self.assertEqual(frames[self.logs]["update_us"].tolist(), [100, 110, 120, 200, 210])
+        self.assertEqual(frames[other]["N"].tolist(), [50])
+        self.assertTrue(frames[missing].empty)
+        self.assertEqual(self.store.header(frames[other]["path"][0]).mpi_size, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,229 @@
+"""
+Per-step statistics over repeated runs (trials) of the same benchmark.
+
+Trials are aligned on their `step` values, not on row positions: they are stacked into one
+(trials x steps x metrics) float64 array over the union of their steps, padded with NaN where a trial has no
+row for a step, together with the (trials x steps) validity mask. Trials of different lengths are therefore
+all kept: the last steps are averaged over the trials that reached them.
+
+The statistics come from a single sort of the stack along the trial axis (NaN padding is sorted last), from which
+the mean, the TRIM-trimmed mean, sample standard deviation (ddof=1) and the 5th/50th/95th percentiles (linear
+interpolation, like np.percentile) are read for every step and metric at once.
+
+For speedups, the trials of several configurations (thread counts, ...) are stacked into one (groups x trials x steps)
+array by stack_groups. mad_outliers flags the one-off spikes of a trial against the neighbouring steps of all the
+trials (modified z-score of Iglewicz and Hoaglin, based on the median absolute deviation), and bootstrap_speedup
+gives the per-step speedup of every group against a baseline group with a bootstrap confidence interval, resampling
+the trials of all groups in the same vectorized pass.
+
+Plotters living in Etape_*/ import it with:
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from trial_stats import trial_frame
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+STATISTICS = ["mean", "median", "trimmed_mean", "std", "p5", "p95"]
+
+# Proportion of the trials cut at each end by the trimmed mean (1 of 5 trials, like scipy.stats.trim_mean)
+TRIM = 0.2
+
+# Modified z-score above which a value is flagged as an outlier, against the values of the MAD_WINDOW steps
+# around it (in all the trials of its group)
+MAD_THRESHOLD = 3.5
+MAD_WINDOW = 10
+
+
+class TrialStats(NamedTuple):
+    """Per-step statistics: `steps` and `count` have shape (steps,), the others (steps, metrics)."""
+    steps: np.ndarray
+    count: np.ndarray  # number of trials having each step
+    mean: np.ndarray
+    median: np.ndarray
+    trimmed_mean: np.ndarray
+    std: np.ndarray  # NaN where a single trial has the step
+    p5: np.ndarray
+    p95: np.ndarray
+
+
+def stack_trials(trials):
+    """
+    Stack trials given as arrays of shape (n_i, 1 + metrics) whose first column is the step.
+
+    Returns (steps, stack, valid): the sorted union of the steps, the float64 (trials x steps x metrics) array
+    with NaN where a trial has no row for a step, and the boolean (trials x steps) mask of the filled rows.
+    """
+    steps = np.unique(np.concatenate([np.asarray(trial)[:, 0] for trial in trials]))
+    n_metrics = np.asarray(trials[0]).shape[1] - 1
+    stack = np.full((len(trials), len(steps), n_metrics), np.nan)
+    valid = np.zeros((len(trials), len(steps)), dtype=bool)
+    for i, trial in enumerate(trials):
+        trial = np.asarray(trial)
+        rows = np.searchsorted(steps, trial[:, 0])
+        stack[i, rows] = trial[:, 1:]
+        valid[i, rows] = True
+    return steps, stack, valid
+
+
+def _sorted_quantile(ordered, count, q):
+    """q-quantile along axis 0 of `ordered` (sorted, NaN last) using the first `count` values of each column."""
+    position = q * np.maximum(count - 1, 0)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, np.maximum(count - 1, 0))
+    low_values = np.take_along_axis(ordered, lower[None], axis=0)[0]
+    high_values = np.take_along_axis(ordered, upper[None], axis=0)[0]
+    values = low_values + (position - lower) * (high_values - low_values)
+    return np.where(count > 0, values, np.nan)
+
+
+def _sorted_trimmed_mean(ordered, count, trim=TRIM):
+    """
+    Mean along axis 0 of `ordered` (sorted, NaN last) of its first `count` values, without the int(trim * count)
+    lowest and highest ones.
+    """
+    cut = np.floor(trim * count).astype(np.intp)
+    cumulative = np.concatenate([np.zeros_like(ordered[:1]), np.cumsum(np.nan_to_num(ordered), axis=0)])
+    kept = count - 2 * cut
+    total = (np.take_along_axis(cumulative, (count - cut)[None], axis=0)[0]
+             - np.take_along_axis(cumulative, cut[None], axis=0)[0])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(kept > 0, total / kept, np.nan)
+
+
+def _sorted_statistic(ordered, count, statistic):
+    """"mean", "median" or "trimmed_mean" along axis 0 of `ordered` (sorted, NaN last)."""
+    if statistic == "median":
+        return _sorted_quantile(ordered, count, 0.5)
+    if statistic == "trimmed_mean":
+        return _sorted_trimmed_mean(ordered, count)
+    if statistic == "mean":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.nansum(ordered, axis=0) / count
+    raise ValueError(f"Unknown statistic {statistic!r}")
+
+
+def trial_statistics(trials):
+    """TrialStats of the trials (arrays whose first column is the step, see stack_trials)."""
+    steps, stack, valid = stack_trials(trials)
+    count = valid.sum(axis=0)
+    counts = np.broadcast_to(count[:, None], stack.shape[1:])
+
+    ordered = np.sort(stack, axis=0)
+    total = np.nansum(ordered, axis=0)
+    mean = total / counts
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt(np.nansum((ordered - mean) ** 2, axis=0) / (counts - 1))
+
+    return TrialStats(steps=steps, count=count, mean=mean,
+                      median=_sorted_quantile(ordered, counts, 0.5),
+                      trimmed_mean=_sorted_trimmed_mean(ordered, counts), std=std,
+                      p5=_sorted_quantile(ordered, counts, 0.05), p95=_sorted_quantile(ordered, counts, 0.95))
+
+
+def trial_frame(trials, columns):
+    """
+    DataFrame of the per-step statistics of the trials, for plotting.
+
+    `columns` names the metrics (the columns after the step). The frame has the columns `step`, `n_trials`, one
+    column per metric holding its mean, and `<metric>_<statistic>` for the other STATISTICS.
+    """
+    stats = trial_statistics(trials)
+    frame = {"step": stats.steps, "n_trials": stats.count}
+    for j, column in enumerate(columns):
+        frame[column] = stats.mean[:, j]
+        for name in STATISTICS[1:]:
+            frame[f"{column}_{name}"] = getattr(stats, name)[:, j]
+    return pd.DataFrame(frame)
+
+
+def stack_groups(groups):
+    """
+    Stack the trials of several groups, given as lists of arrays of shape (n_i, 2) (step, time).
+
+    Returns (steps, stack): the sorted union of the steps of all trials and the float64
+    (groups x max trials x steps) array of the times, NaN where a group has fewer trials or a trial has no row
+    for a step.
+    """
+    steps = np.unique(np.concatenate([np.asarray(trial)[:, 0] for trials in groups for trial in trials]))
+    stack = np.full((len(groups), max(len(trials) for trials in groups), len(steps)), np.nan)
+    for g, trials in enumerate(groups):
+        for i, trial in enumerate(trials):
+            trial = np.asarray(trial)
+            stack[g, i, np.searchsorted(steps, trial[:, 0])] = trial[:, 1]
+    return steps, stack
+
+
+def mad_outliers(stack, window=MAD_WINDOW, threshold=MAD_THRESHOLD):
+    """
+    Boolean mask of the outliers of `stack` (... x trials x steps).
+
+    A value is compared with every trial of the same group at the steps within `window` of its own (the times
+    drift slowly along a run, a spike lasts one step): it is flagged when its modified z-score
+    0.6745 * |x - median| / MAD against them exceeds `threshold`. A zero MAD flags nothing.
+    """
+    padded = np.pad(stack, [(0, 0)] * (stack.ndim - 1) + [(window, window)], constant_values=np.nan)
+    # (... x trials x steps x 2*window+1) -> references of each step first: (trials * (2*window+1)) x ... x steps
+    neighbours = np.lib.stride_tricks.sliding_window_view(padded, 2 * window + 1, axis=-1)
+    neighbours = np.moveaxis(neighbours, (-3, -1), (0, 1))
+    neighbours = neighbours.reshape((-1,) + neighbours.shape[2:])
+
+    count = (~np.isnan(neighbours)).sum(axis=0)
+    median = _sorted_quantile(np.sort(neighbours, axis=0), count, 0.5)
+    mad = _sorted_quantile(np.sort(np.abs(neighbours - median), axis=0), count, 0.5)
+    median, mad = median[..., None, :], mad[..., None, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        score = np.where(mad > 0, 0.6745 * np.abs(stack - median) / mad, 0.0)
+    return score > threshold
+
+
+def bootstrap_speedup(stack, baseline=0, statistic="median", n_boot=1000, confidence=0.95, seed=0,
+                      block=100):
+    """
+    Per-step speedup statistic(baseline times) / statistic(group times) of every group of `stack`
+    (groups x trials x steps, NaN padded, see stack_groups) with a bootstrap confidence interval.
+
+    Each of the n_boot replicates resamples with replacement as many trials as every group has (among its own
+    trials, the remaining rows being NaN) and recomputes the speedups; the interval is given by the percentiles of
+    the replicates. All groups and steps are handled together, `block` replicates at a time to bound the memory.
+
+    Returns (speedup, low, high), each of shape (groups x steps).
+    """
+    n_groups, n_trials, _ = stack.shape
+    n_valid = np.maximum((~np.isnan(stack)).any(axis=2).sum(axis=1), 1)
+    # Trials first, so the statistics reduce along axis 0, plus a NaN trial (index n_trials) for the padding
+    trials_first = np.moveaxis(stack, 1, 0)
+    trials_first = np.concatenate([trials_first, np.full_like(trials_first[:1], np.nan)])
+    padding = np.arange(n_trials)[:, None, None] >= n_valid[None, :, None]
+
+    def group_statistic(values):
+        ordered = np.sort(values, axis=0)
+        return _sorted_statistic(ordered, (~np.isnan(ordered)).sum(axis=0), statistic)
+
+    observed = group_statistic(trials_first)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        speedup = observed[baseline] / observed
+
+    rng = np.random.default_rng(seed)
+    replicates = []
+    for start in range(0, n_boot, block):
+        size = min(block, n_boot - start)
+        # Trial indices drawn among the valid trials of each group: (trials x groups x replicates), n_valid[g]
+        # draws for group g, the NaN trial after them
+        picks = (rng.random((n_trials, n_groups, size)) * n_valid[None, :, None]).astype(np.intp)
+        picks[np.broadcast_to(padding, picks.shape)] = n_trials
+        resampled = trials_first[picks, np.arange(n_groups)[None, :, None]]
+        values = group_statistic(resampled)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            replicates.append(values[baseline] / values)
+    # Replicates first, sorted once for both percentiles
+    replicates = np.sort(np.moveaxis(np.concatenate(replicates, axis=1), 1, 0), axis=0)
+    count = (~np.isnan(replicates)).sum(axis=0)
+
+    alpha = (1 - confidence) / 2
+    low = _sorted_quantile(replicates, count, alpha)
+    high = _sorted_quantile(replicates, count, 1 - alpha)
+    return speedup, low, high